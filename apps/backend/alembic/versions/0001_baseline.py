@@ -0,0 +1,94 @@
+"""Esquema base: users y outbox_events
+
+Revision ID: 0001_baseline
+Revises:
+Create Date: 2026-10-19 00:00:00
+
+Hasta ahora las tablas se creaban con `Base.metadata.create_all` (app/db/init_db.py). Esta
+revisión crea el mismo esquema y es segura sobre una base de datos creada así: solo crea lo que
+falta (incluida la columna `token_version`, que create_all no añade a una tabla existente).
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "0001_baseline"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+user_role = postgresql.ENUM("USER", "ADMIN", name="userrole", create_type=False)
+user_status = postgresql.ENUM("active", "inactive", "suspended", "deleted", name="userstatus", create_type=False)
+auth_provider = postgresql.ENUM("local", "google", "github", name="authprovider", create_type=False)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    # Con --sql no hay conexión que inspeccionar: se genera el esquema completo
+    offline = op.get_context().as_sql
+    existing_tables = set() if offline else set(sa.inspect(bind).get_table_names())
+
+    for enum in (user_role, user_status, auth_provider):
+        enum.create(bind, checkfirst=not offline)
+
+    if "users" not in existing_tables:
+        op.create_table(
+            "users",
+            sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+            sa.Column("email", sa.String(), nullable=False),
+            sa.Column("password", sa.String(), nullable=True),
+            sa.Column("full_name", sa.String(), nullable=True),
+            sa.Column("role", user_role, nullable=True),
+            sa.Column("bio", sa.String(), nullable=True),
+            sa.Column("avatar_url", sa.String(), nullable=True),
+            sa.Column("is_verified", sa.Boolean(), nullable=True),
+            sa.Column("status", user_status, nullable=True),
+            sa.Column("provider", auth_provider, nullable=True),
+            sa.Column("provider_id", sa.String(), nullable=True),
+            sa.Column("last_login_at", sa.DateTime(timezone=True), nullable=True),
+            sa.Column("token_version", sa.Integer(), nullable=False, server_default=sa.text("0")),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.text("CURRENT_TIMESTAMP")),
+            sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.text("CURRENT_TIMESTAMP")),
+        )
+        op.create_index("ix_users_email", "users", ["email"], unique=True)
+    elif "token_version" not in {column["name"] for column in sa.inspect(bind).get_columns("users")}:
+        op.add_column(
+            "users", sa.Column("token_version", sa.Integer(), nullable=False, server_default=sa.text("0"))
+        )
+
+    if "outbox_events" not in existing_tables:
+        op.create_table(
+            "outbox_events",
+            sa.Column("id", sa.BigInteger(), primary_key=True, autoincrement=True),
+            sa.Column("event_type", sa.String(), nullable=False),
+            sa.Column("aggregate_id", postgresql.UUID(as_uuid=True), nullable=True),
+            sa.Column("payload", postgresql.JSONB(), nullable=False, server_default=sa.text("'{}'::jsonb")),
+            sa.Column("attempts", sa.Integer(), nullable=False, server_default=sa.text("0")),
+            sa.Column("last_error", sa.String(), nullable=True),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.text("CURRENT_TIMESTAMP")),
+            sa.Column(
+                "available_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.text("CURRENT_TIMESTAMP")
+            ),
+            sa.Column("processed_at", sa.DateTime(timezone=True), nullable=True),
+            sa.Column("failed_at", sa.DateTime(timezone=True), nullable=True),
+        )
+        op.create_index(
+            "ix_outbox_events_pending",
+            "outbox_events",
+            ["available_at", "id"],
+            postgresql_where=sa.text("processed_at IS NULL AND failed_at IS NULL"),
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("outbox_events")
+    op.drop_table("users")
+    bind = op.get_bind()
+    for enum in (auth_provider, user_status, user_role):
+        enum.drop(bind, checkfirst=True)
@@ -0,0 +1,75 @@
+"""Índices de users para búsquedas por proveedor, estado y limpieza de no verificados
+
+Revision ID: 0002_users_perf_indexes
+Revises: 0001_baseline
+Create Date: 2026-10-19 00:00:01
+
+- ux_users_provider_provider_id: único en (provider, provider_id) para las cuentas sociales;
+  parcial porque los usuarios locales no tienen provider_id.
+- ix_users_unverified_created_at: parcial sobre created_at de los usuarios no verificados, el
+  predicado del barrido de limpieza. Solo contiene las filas que el barrido puede borrar.
+- ix_users_status: filtros por estado.
+
+Los índices se crean con CREATE INDEX CONCURRENTLY, fuera de la transacción de la migración,
+para no bloquear escrituras en users mientras se construyen. Si una construcción concurrente
+falla deja un índice INVALID; se elimina antes de reintentar.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.db.migrations import drop_if_invalid, is_offline
+
+# revision identifiers, used by Alembic.
+revision: str = "0002_users_perf_indexes"
+down_revision: Union[str, None] = "0001_baseline"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = {
+    "ux_users_provider_provider_id": (
+        "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS ux_users_provider_provider_id "
+        "ON users (provider, provider_id) WHERE provider_id IS NOT NULL"
+    ),
+    "ix_users_unverified_created_at": (
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_unverified_created_at "
+        "ON users (created_at) WHERE is_verified = false"
+    ),
+    "ix_users_status": "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_status ON users (status)",
+}
+
+
+def _check_no_duplicate_provider_ids() -> None:
+    duplicates = op.get_bind().execute(
+        sa.text(
+            "SELECT provider, provider_id, count(*) FROM users WHERE provider_id IS NOT NULL "
+            "GROUP BY provider, provider_id HAVING count(*) > 1 LIMIT 10"
+        )
+    ).all()
+    if duplicates:
+        listed = ", ".join(f"{provider}:{provider_id} ({count})" for provider, provider_id, count in duplicates)
+        raise RuntimeError(
+            f"Hay cuentas sociales duplicadas que impiden crear ux_users_provider_provider_id: {listed}. "
+            "Hay que fusionarlas o limpiar provider_id antes de aplicar la migración."
+        )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if not is_offline():
+        _check_no_duplicate_provider_ids()
+
+    with op.get_context().autocommit_block():
+        for name, statement in INDEXES.items():
+            if not is_offline():
+                drop_if_invalid(name)
+            op.execute(statement)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name in reversed(list(INDEXES)):
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
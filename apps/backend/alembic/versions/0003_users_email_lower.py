@@ -0,0 +1,72 @@
+"""Unicidad de email sin distinguir mayúsculas: índice único sobre lower(email)
+
+Revision ID: 0003_users_email_lower
+Revises: 0002_users_perf_indexes
+Create Date: 2026-10-19 00:00:02
+
+Las búsquedas por email pasan a ser `lower(email) = :email` (User.email_matches) y los emails se
+guardan normalizados. Esta revisión:
+
+1. Deduplica las cuentas cuyo email solo difiere en mayúsculas. De cada grupo se conserva una
+   cuenta, por orden de preferencia: no eliminada, verificada, con login más reciente y, a
+   igualdad, la más antigua. Las demás se copian a `users_email_duplicates` antes de borrarlas,
+   para poder revisarlas o fusionarlas a mano.
+2. Normaliza a minúsculas los emails guardados.
+3. Crea ux_users_email_lower con CONCURRENTLY y elimina el índice único ix_users_email, que
+   ya no usa ninguna consulta y solo encarece las escrituras.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+from app.db.migrations import drop_if_invalid, is_offline
+
+# revision identifiers, used by Alembic.
+revision: str = "0003_users_email_lower"
+down_revision: Union[str, None] = "0002_users_perf_indexes"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+DUPLICATES_TABLE = "users_email_duplicates"
+
+# Filas a descartar: todas menos la primera de cada lower(email) según la preferencia descrita arriba
+RANKED_DUPLICATES = """
+    SELECT id FROM (
+        SELECT id, row_number() OVER (
+            PARTITION BY lower(email)
+            ORDER BY status = 'deleted', is_verified IS NOT TRUE, last_login_at DESC NULLS LAST, created_at, id
+        ) AS position
+        FROM users
+        WHERE lower(email) IN (SELECT lower(email) FROM users GROUP BY lower(email) HAVING count(*) > 1)
+    ) ranked
+    WHERE position > 1
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(
+        f"CREATE TABLE IF NOT EXISTS {DUPLICATES_TABLE} "
+        "(LIKE users INCLUDING DEFAULTS, archived_at timestamptz NOT NULL DEFAULT CURRENT_TIMESTAMP)"
+    )
+    op.execute(f"INSERT INTO {DUPLICATES_TABLE} SELECT u.* FROM users u WHERE u.id IN ({RANKED_DUPLICATES})")
+    op.execute(f"DELETE FROM users WHERE id IN (SELECT id FROM {DUPLICATES_TABLE})")
+    # Solo toca las filas que no están ya en minúsculas
+    op.execute("UPDATE users SET email = lower(email) WHERE email <> lower(email)")
+
+    with op.get_context().autocommit_block():
+        if not is_offline():
+            drop_if_invalid("ux_users_email_lower")
+        op.execute("CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS ux_users_email_lower ON users (lower(email))")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_users_email")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Las cuentas archivadas en users_email_duplicates no se restauran
+    with op.get_context().autocommit_block():
+        if not is_offline():
+            drop_if_invalid("ix_users_email")
+        op.execute("CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS ix_users_email ON users (email)")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ux_users_email_lower")
@@ -0,0 +1,60 @@
+"""Índices de cobertura para el directorio de usuarios (/admin/users)
+
+Revision ID: 0004_users_directory_idx
+Revises: 0003_users_email_lower
+Create Date: 2026-10-19 00:00:03
+
+El directorio pagina por (created_at, id) con un cursor. Para que cada página sea un index-only
+scan que arranca en el cursor, los índices llevan en INCLUDE el resto de columnas del listado:
+
+- ix_users_created_at_id: orden del directorio; los filtros por rol, proveedor o verificación se
+  evalúan sobre las columnas incluidas sin visitar la tabla.
+- ix_users_status_created_at_id: el mismo orden por estado, para filtros selectivos como los
+  usuarios suspendidos. Sustituye a ix_users_status (sirve igual para filtrar o contar por estado).
+
+last_login_at queda fuera a propósito: se actualiza en cada login y, si estuviera indexada,
+esas actualizaciones dejarían de ser HOT.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+from app.db.migrations import drop_if_invalid, is_offline
+
+# revision identifiers, used by Alembic.
+revision: str = "0004_users_directory_idx"
+down_revision: Union[str, None] = "0003_users_email_lower"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INCLUDED_COLUMNS = "email, full_name, role, provider, is_verified"
+
+INDEXES = {
+    "ix_users_created_at_id": (
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_created_at_id "
+        f"ON users (created_at, id) INCLUDE (status, {INCLUDED_COLUMNS})"
+    ),
+    "ix_users_status_created_at_id": (
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_status_created_at_id "
+        f"ON users (status, created_at, id) INCLUDE ({INCLUDED_COLUMNS})"
+    ),
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, statement in INDEXES.items():
+            if not is_offline():
+                drop_if_invalid(name)
+            op.execute(statement)
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_users_status")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.execute("CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_status ON users (status)")
+        for name in reversed(list(INDEXES)):
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
@@ -0,0 +1,50 @@
+"""Índices de trigramas para la búsqueda de usuarios por fragmento de email o nombre
+
+Revision ID: 0005_users_trgm_search
+Revises: 0004_users_directory_idx
+Create Date: 2026-10-19 00:00:04
+
+Índices GIN con gin_trgm_ops sobre email y full_name, que resuelven `ILIKE '%fragmento%'` sin
+recorrer la tabla (/admin/users/search). Requiere la extensión pg_trgm; crearla necesita permisos
+de CREATE en la base de datos (en servicios gestionados suele estar en la lista permitida).
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+from app.db.migrations import drop_if_invalid, is_offline
+
+# revision identifiers, used by Alembic.
+revision: str = "0005_users_trgm_search"
+down_revision: Union[str, None] = "0004_users_directory_idx"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = {
+    "ix_users_email_trgm": (
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_email_trgm ON users USING gin (email gin_trgm_ops)"
+    ),
+    "ix_users_full_name_trgm": (
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_full_name_trgm ON users USING gin (full_name gin_trgm_ops)"
+    ),
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    with op.get_context().autocommit_block():
+        for name, statement in INDEXES.items():
+            if not is_offline():
+                drop_if_invalid(name)
+            op.execute(statement)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # La extensión se conserva: puede estar en uso fuera de estos índices
+    with op.get_context().autocommit_block():
+        for name in reversed(list(INDEXES)):
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
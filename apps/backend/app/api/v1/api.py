@@ -1,6 +1,7 @@
 from fastapi import APIRouter
-from app.api.v1.endpoints import auth
+from app.api.v1.endpoints import admin, auth
 
 api_router = APIRouter()
 
 api_router.include_router(auth.router, tags=["auth"])
+api_router.include_router(admin.router, tags=["admin"])
@@ -0,0 +1,251 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as Base64Error
+from datetime import datetime
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Float, func, or_, select, text, tuple_
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+import logging
+
+from app.core.config import settings
+from app.core.keyspace_audit import audit_keyspace, export_report_metrics
+from app.core.redis import RedisWorkload, get_redis_client
+from app.core.utils.deps import require_admin
+from app.core.utils.enums import AuthProvider, UserRole, UserStatus
+from app.db.base import AsyncSessionLocal
+from app.db.deps import get_db
+from app.db.models.user import User as UserModel
+from app.schemas.admin import AdminUser, AdminUserPage, AdminUserSearchPage, AdminUserSearchResult, KeyspaceReport
+
+router = APIRouter(prefix="/admin")
+
+logger = logging.getLogger(__name__)
+
+# Límite de claves por petición: recorrer más conviene hacerlo con la CLI (python -m app.core.keyspace_audit)
+MAX_AUDIT_KEYS = 100_000
+
+MAX_PAGE_SIZE = 200
+EXPORT_BATCH_SIZE = 1000
+MAX_SEARCH_RESULTS = 100
+# Los trigramas solo acotan la búsqueda con al menos 3 caracteres; con menos sería un recorrido completo
+MIN_SEARCH_LENGTH = 3
+QUERY_CANCELED = "57014"
+
+# Columnas del directorio de usuarios. Todas están en los índices de listado (migración 0004), así que
+# cada página se resuelve con un index-only scan que empieza justo después del cursor
+DIRECTORY_COLUMNS = (
+    UserModel.id,
+    UserModel.email,
+    UserModel.full_name,
+    UserModel.role,
+    UserModel.status,
+    UserModel.provider,
+    UserModel.is_verified,
+    UserModel.created_at,
+)
+
+
+@router.get("/redis/keyspace", response_model=KeyspaceReport)
+async def redis_keyspace_audit(
+    workload: RedisWorkload = RedisWorkload.SESSIONS,
+    match: str | None = None,
+    sample_rate: float = Query(0.1, gt=0, le=1),
+    max_keys: int = Query(20_000, gt=0, le=MAX_AUDIT_KEYS),
+    admin: dict = Depends(require_admin),
+):
+    """
+    Audita memoria y TTL del keyspace de una carga de Redis, por prefijo. Solo accesible para
+    administradores. El resultado también se publica en /metrics.
+    """
+    try:
+        report = await audit_keyspace(
+            get_redis_client(workload),
+            workload=workload.value,
+            match=match,
+            sample_rate=sample_rate,
+            max_keys=max_keys,
+        )
+    except Exception as e:
+        logger.error(f"Error al auditar el keyspace de Redis ({workload}): {str(e)}")
+        raise HTTPException(status_code=500, detail="Error inesperado al auditar el keyspace de Redis")
+
+    export_report_metrics(report)
+    logger.info(
+        f"Auditoría del keyspace ({workload}) solicitada por {admin['sub']}: "
+        f"{report.scanned_keys} claves en {report.duration_seconds}s"
+    )
+    return report.to_dict()
+
+
+def _pack_cursor(position: str, user_id: UUID) -> str:
+    return urlsafe_b64encode(f"{position}|{user_id}".encode()).decode().rstrip("=")
+
+
+def _unpack_cursor(cursor: str) -> tuple[str, UUID]:
+    try:
+        raw = urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        position, user_id = raw.split("|", 1)
+        return position, UUID(user_id)
+    except (Base64Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=400, detail="Cursor de paginación inválido")
+
+
+def encode_cursor(created_at: datetime, user_id: UUID) -> str:
+    return _pack_cursor(created_at.isoformat(), user_id)
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, UUID]:
+    created_at, user_id = _unpack_cursor(cursor)
+    try:
+        return datetime.fromisoformat(created_at), user_id
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Cursor de paginación inválido")
+
+
+def directory_filters(
+    role: UserRole | None = None,
+    status: UserStatus | None = None,
+    provider: AuthProvider | None = None,
+    is_verified: bool | None = None,
+) -> list:
+    """Condiciones del directorio de usuarios a partir de los filtros de la petición."""
+    conditions = []
+    if role is not None:
+        conditions.append(UserModel.role == role)
+    if status is not None:
+        conditions.append(UserModel.status == status)
+    if provider is not None:
+        conditions.append(UserModel.provider == provider)
+    if is_verified is not None:
+        conditions.append(UserModel.is_verified == is_verified)
+    return conditions
+
+
+def directory_query(conditions: list, after: tuple[datetime, UUID] | None, limit: int):
+    """
+    Página del directorio en orden (created_at, id) descendente. En lugar de OFFSET se busca
+    directamente la posición siguiente al cursor, así que una página profunda cuesta lo mismo que
+    la primera.
+    """
+    stmt = select(*DIRECTORY_COLUMNS).where(*conditions)
+    if after is not None:
+        stmt = stmt.where(tuple_(UserModel.created_at, UserModel.id) < tuple_(*after))
+    return stmt.order_by(UserModel.created_at.desc(), UserModel.id.desc()).limit(limit)
+
+
+@router.get("/users", response_model=AdminUserPage)
+async def list_users(
+    cursor: str | None = None,
+    limit: int = Query(50, gt=0, le=MAX_PAGE_SIZE),
+    conditions: list = Depends(directory_filters),
+    db: AsyncSession = Depends(get_db),
+    admin: dict = Depends(require_admin),
+):
+    """
+    Lista los usuarios, del más reciente al más antiguo, con filtros por rol, estado, proveedor y
+    verificación. Para la página siguiente se pasa `cursor=next_cursor`. Solo para administradores.
+    """
+    after = decode_cursor(cursor) if cursor else None
+    # Una fila de más indica si hay página siguiente
+    rows = (await db.execute(directory_query(conditions, after, limit + 1))).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+
+    return AdminUserPage(items=[AdminUser.model_validate(row) for row in rows], next_cursor=next_cursor)
+
+
+async def _stream_directory(conditions: list):
+    after = None
+    while True:
+        # Una sesión corta por lote: no se retiene una conexión mientras el cliente descarga
+        async with AsyncSessionLocal() as db:
+            rows = (await db.execute(directory_query(conditions, after, EXPORT_BATCH_SIZE))).all()
+        if rows:
+            yield "".join(AdminUser.model_validate(row).model_dump_json() + "\n" for row in rows)
+        if len(rows) < EXPORT_BATCH_SIZE:
+            return
+        after = (rows[-1].created_at, rows[-1].id)
+
+
+@router.get("/users/export")
+async def export_users(conditions: list = Depends(directory_filters), admin: dict = Depends(require_admin)):
+    """
+    Exporta el directorio filtrado como NDJSON (un usuario por línea), recorriéndolo por lotes con
+    el mismo cursor que /admin/users. Solo para administradores.
+    """
+    logger.info(f"Exportación del directorio de usuarios solicitada por {admin['sub']}")
+    return StreamingResponse(_stream_directory(conditions), media_type="application/x-ndjson")
+
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def search_score(q: str):
+    """Relevancia de un usuario para `q`: la mayor similitud por trigramas entre email y nombre."""
+    return func.greatest(func.similarity(UserModel.email, q), func.similarity(UserModel.full_name, q), type_=Float)
+
+
+def search_query(q: str, after: tuple[float, UUID] | None, limit: int):
+    """
+    Usuarios cuyo email o nombre contiene `q`, de más a menos relevante. Los dos ILIKE se resuelven
+    con los índices GIN de trigramas (migración 0005) y se combinan con un BitmapOr; la
+    continuación usa (score, id) como cursor.
+    """
+    pattern = f"%{_escape_like(q)}%"
+    score = search_score(q)
+    stmt = select(*DIRECTORY_COLUMNS, score.label("score")).where(
+        or_(UserModel.email.ilike(pattern, escape="\\"), UserModel.full_name.ilike(pattern, escape="\\"))
+    )
+    if after is not None:
+        stmt = stmt.where(tuple_(score, UserModel.id) < tuple_(*after))
+    return stmt.order_by(score.desc(), UserModel.id.desc()).limit(limit)
+
+
+@router.get("/users/search", response_model=AdminUserSearchPage)
+async def search_users(
+    q: str = Query(..., min_length=MIN_SEARCH_LENGTH, max_length=100),
+    cursor: str | None = None,
+    limit: int = Query(20, gt=0, le=MAX_SEARCH_RESULTS),
+    db: AsyncSession = Depends(get_db),
+    admin: dict = Depends(require_admin),
+):
+    """
+    Busca usuarios por fragmento de email o de nombre, ordenados por relevancia. Para seguir con
+    los siguientes resultados se pasa `cursor=next_cursor`. Solo para administradores.
+    """
+    after = None
+    if cursor:
+        score, user_id = _unpack_cursor(cursor)
+        try:
+            after = (float(score), user_id)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Cursor de paginación inválido")
+
+    try:
+        # SET LOCAL: el límite solo afecta a esta transacción, no a la conexión del pool
+        await db.execute(text(f"SET LOCAL statement_timeout = {int(settings.USER_SEARCH_STATEMENT_TIMEOUT_MS)}"))
+        rows = (await db.execute(search_query(q, after, limit + 1))).all()
+    except DBAPIError as e:
+        if getattr(e.orig, "sqlstate", None) != QUERY_CANCELED:
+            raise
+        logger.warning(f"Búsqueda de usuarios cancelada por tiempo ({admin['sub']}): {q!r}")
+        raise HTTPException(
+            status_code=503, detail="La búsqueda ha tardado demasiado; prueba con un texto más concreto"
+        )
+    finally:
+        await db.rollback()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _pack_cursor(repr(rows[-1].score), rows[-1].id)
+
+    items = [AdminUserSearchResult.model_validate(row) for row in rows]
+    return AdminUserSearchPage(items=items, next_cursor=next_cursor)
@@ -1,10 +1,29 @@
 from fastapi import APIRouter, Depends, HTTPException, Response, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 from redis.asyncio import Redis
-from app.db.deps import get_db
+from app.db.deps import get_db, release_db
 from app.core.utils.deps import verify_token_not_blacklisted
 from app.core.auth.social_auth import verify_social_token
 from app.core.auth.temp_auth import generate_temporary_auth_code, get_temp_auth_data
+from app.core.auth.one_time_tokens import oauth_states, TooManyAttemptsError
+from app.core.auth.denylist import deny_token
+from app.core.auth.activity import discard_pending_activity, record_user_activity
+from app.core.auth.token_epochs import (
+    epoch_claims,
+    token_epochs_valid,
+    bump_token_version,
+    publish_token_version,
+    bump_global_epoch,
+)
+from app.core.auth.sessions import (
+    adopt_legacy_session,
+    create_session,
+    rotate_session,
+    list_user_sessions,
+    revoke_session,
+    revoke_all_user_sessions,
+    iter_all_sessions,
+)
 from app.schemas.user import (
     UserCreate,
     EmailRequest,
@@ -16,6 +35,8 @@ from app.schemas.user import (
     RevokeAllSessions,
     ActiveSessionsList,
     ActiveSession,
+    DeviceSession,
+    DeviceSessionsList,
     SocialLoginRequest,
     UserStatus,
     AuthProvider,
@@ -27,25 +48,35 @@ from app.core.auth.security import (
     get_password_hash,
     verify_password,
     create_access_token,
-    create_refresh_token,
     decode_token,
     get_token_expiration,
 )
 from app.db.models.user import User as UserModel
+from app.db.queries import (
+    get_user_by_email,
+    get_user_by_id,
+    get_user_by_provider_id,
+    get_user_record_by_email,
+    get_user_record_by_id,
+)
 from fastapi.responses import JSONResponse, RedirectResponse
-from app.core.redis import get_redis
+from app.core.redis import get_redis, get_cache_redis, get_ephemeral_redis, get_queue_redis
 from app.core.email.email_verification import (
     generate_verification_token,
     verify_email_token,
     cleanup_expired_unverified_users,
+    cancel_unverified_expiry,
 )
 from app.core.email.email import send_verification_email, send_password_reset_email
+from app.core.events.outbox import add_outbox_event, notify_outbox, outbox_event_insert
+from app.core.utils.enums import OutboxEventType
 from app.core.auth.password_recovery import (
     generate_password_reset_token,
-    verify_password_reset_token,
-    invalidate_password_reset_token,
+    consume_password_reset_token,
+    password_reset_token_matches,
 )
-from sqlalchemy import select, update
+from sqlalchemy import func, literal, select, update
+from sqlalchemy.dialects.postgresql import insert
 from datetime import datetime, UTC, timedelta
 from uuid import UUID
 import logging
@@ -65,68 +96,111 @@ class ExchangeCodeRequest(BaseModel):
     temp_code: str
 
 
+def _too_many_attempts() -> HTTPException:
+    return HTTPException(status_code=429, detail="Demasiados intentos fallidos. Inténtalo de nuevo más tarde.")
+
+
+def _client_device(request: Request) -> dict[str, str | None]:
+    """Datos del dispositivo que se guardan junto a la sesión."""
+    return {
+        "device": request.headers.get("user-agent"),
+        "ip_address": request.client.host if request.client else None,
+    }
+
+
+async def _find_social_user(db: AsyncSession, provider: AuthProvider, social_profile) -> UserModel | None:
+    """
+    Busca la cuenta de un login social: primero por (provider, provider_id), que sigue a la cuenta
+    aunque cambie su email en el proveedor, y si aún no está vinculada, por email.
+    """
+    if social_profile.provider_id:
+        user = await get_user_by_provider_id(db, provider, social_profile.provider_id)
+        if user:
+            return user
+
+    return await get_user_by_email(db, social_profile.email)
+
+
+# Columnas que devuelve el registro; se leen del propio INSERT, sin recargar el usuario
+REGISTER_COLUMNS = (
+    UserModel.id,
+    UserModel.email,
+    UserModel.full_name,
+    UserModel.role,
+    UserModel.bio,
+    UserModel.avatar_url,
+    UserModel.is_verified,
+    UserModel.status,
+    UserModel.provider,
+)
+
+
+def _register_statement(user_in: UserCreate, password_hash: str):
+    """
+    Alta del usuario y su evento user.registered en una sola sentencia:
+
+        WITH new_user AS (INSERT INTO users ... ON CONFLICT (lower(email)) DO NOTHING RETURNING ...),
+             registered AS (INSERT INTO outbox_events SELECT ... FROM new_user)
+        SELECT * FROM new_user
+
+    Si el email ya existe no se devuelve ninguna fila y tampoco se crea el evento. La unicidad la
+    garantiza el índice, así que dos registros simultáneos del mismo email no pueden colarse.
+    """
+    new_user = (
+        insert(UserModel)
+        .values(
+            email=user_in.email,
+            full_name=user_in.full_name,
+            password=password_hash,
+            role=user_in.role,
+            bio=user_in.bio,
+            avatar_url=user_in.avatar_url,
+            is_verified=False,
+            status=UserStatus.INACTIVE,
+            provider=AuthProvider.LOCAL,
+        )
+        .on_conflict_do_nothing(index_elements=[func.lower(UserModel.email)])
+        .returning(*REGISTER_COLUMNS)
+        .cte("new_user")
+    )
+    registered = outbox_event_insert(
+        OutboxEventType.USER_REGISTERED,
+        new_user.c.id,
+        {
+            "email": new_user.c.email,
+            "full_name": new_user.c.full_name,
+            "provider": literal(AuthProvider.LOCAL.value),
+            "is_verified": literal(False),
+        },
+    ).cte("registered")
+    return select(new_user).add_cte(registered)
+
+
 @router.post("/register")
-async def create_user(user_in: UserCreate, db: AsyncSession = Depends(get_db), redis: Redis = Depends(get_redis)):
+async def create_user(user_in: UserCreate, db: AsyncSession = Depends(get_db)):
     """Endpoint para registrar un nuevo usuario."""
     logger.info(f"Iniciando proceso de registro para {user_in.email}")
 
     try:
-        # 1. Verificar si el email ya existe
-        logger.debug(f"Verificando si el email {user_in.email} ya existe")
-        result = await db.execute(UserModel.__table__.select().where(UserModel.email == user_in.email))
-        if result.scalar_one_or_none():
-            logger.warning(f"Intento de registro con email existente: {user_in.email}")
-            raise HTTPException(status_code=400, detail="El correo electrónico ya está registrado")
-
-        # 2. Generar token de verificación
-        logger.debug("Generando token de verificación")
-        verification_token = await generate_verification_token(redis, user_in.email)
-        logger.info(f"Token de verificación generado para {user_in.email}")
-
-        # 3. Crear el usuario primero
+        # 1. Crear el usuario y el evento user.registered, salvo que el email ya exista
         logger.debug("Creando usuario en la base de datos")
         try:
-            db_user = UserModel(
-                email=user_in.email,
-                full_name=user_in.full_name,
-                password=get_password_hash(user_in.password),
-                role=user_in.role,
-                bio=user_in.bio,
-                avatar_url=user_in.avatar_url,
-                is_verified=False,
-                status=UserStatus.INACTIVE,
-                provider=AuthProvider.LOCAL,
-            )
-
-            db.add(db_user)
+            result = await db.execute(_register_statement(user_in, get_password_hash(user_in.password)))
+            db_user = result.first()
             await db.commit()
-            await db.refresh(db_user)
-            logger.info(f"Usuario creado exitosamente: {db_user.id}")
-
         except Exception as db_error:
             logger.error(f"Error al crear usuario en la base de datos: {str(db_error)}")
-            await redis.delete(f"email_verification:{verification_token}")
             raise HTTPException(
                 status_code=500, detail=f"Error al crear el usuario en la base de datos: {str(db_error)}"
             )
 
-        # 4. Intentar enviar el correo después de crear el usuario
-        logger.debug(f"Intentando enviar correo de verificación a {user_in.email}")
-        email_sent = False
-        try:
-            await send_verification_email(user_in.email, verification_token, db)
-            email_sent = True
-            logger.info(f"Correo de verificación enviado exitosamente a {user_in.email}")
-        except Exception as e:
-            logger.error(f"Error al enviar correo de verificación: {str(e)}")
-            # No eliminamos el usuario creado, solo el token
-            await redis.delete(f"email_verification:{verification_token}")
-            raise HTTPException(status_code=500, detail=f"Error al enviar el correo de verificación: {str(e)}")
-
-        if not email_sent:
-            logger.error("El correo no se envió pero no se detectó ninguna excepción")
-            await redis.delete(f"email_verification:{verification_token}")
-            raise HTTPException(status_code=500, detail="No se pudo enviar el correo de verificación")
+        if db_user is None:
+            logger.warning(f"Intento de registro con email existente: {user_in.email}")
+            raise HTTPException(status_code=400, detail="El correo electrónico ya está registrado")
+        logger.info(f"Usuario creado exitosamente: {db_user.id}")
+
+        # 2. El relay del outbox genera el código y envía el correo de verificación
+        notify_outbox()
 
         return JSONResponse(
             content={
@@ -155,8 +229,20 @@ async def create_user(user_in: UserCreate, db: AsyncSession = Depends(get_db), r
 
 
 @router.post("/verify-email/{token}")
-async def verify_email(token: str, db: AsyncSession = Depends(get_db), redis: Redis = Depends(get_redis)):
-    email = await verify_email_token(redis, token)
+async def verify_email(
+    token: str,
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    redis: Redis = Depends(get_redis),
+    ephemeral_redis: Redis = Depends(get_ephemeral_redis),
+    queue_redis: Redis = Depends(get_queue_redis),
+):
+    try:
+        email = await verify_email_token(
+            ephemeral_redis, token, subject=request.client.host if request.client else None
+        )
+    except TooManyAttemptsError:
+        raise _too_many_attempts()
 
     if not email:
         raise HTTPException(status_code=400, detail="Token de verificación inválido o expirado")
@@ -164,42 +250,35 @@ async def verify_email(token: str, db: AsyncSession = Depends(get_db), redis: Re
     # Actualizar el estado de verificación del usuario
     stmt = (
         update(UserModel)
-        .where(UserModel.email == email)
+        .where(UserModel.email_matches(email))
         .values(is_verified=True, status=UserStatus.ACTIVE, updated_at=datetime.now(UTC))
     )
     await db.execute(stmt)
 
     # Obtener el usuario actualizado
-    stmt = select(UserModel).where(UserModel.email == email)
-    result = await db.execute(stmt)
-    user = result.scalar_one_or_none()
+    user = await get_user_record_by_email(db, email)
 
     if not user:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
 
+    await discard_pending_activity(queue_redis, user.id)
     await db.commit()
+    await cancel_unverified_expiry(queue_redis, user.id)
 
-    # Generar tokens de sesión
-    access_token_data = {"sub": str(user.id), "email": user.email, "role": user.role, "type": "access"}
-    refresh_token_data = {"sub": str(user.id), "type": "refresh"}
-
-    access_token = create_access_token(access_token_data)
-    refresh_token = create_refresh_token(refresh_token_data)
-
-    # Almacenar información del refresh token en Redis
-    user_refresh_data = {
-        "refresh_token": refresh_token,
-        "user_id": str(user.id),
+    # Crear la sesión del dispositivo y el token de acceso
+    claims = await epoch_claims(redis, user.id, user.token_version)
+    session = await create_session(
+        redis, user.id, user.email, user.full_name, user.role, user.status, **_client_device(request), claims=claims
+    )
+    access_token_data = {
+        "sub": str(user.id),
         "email": user.email,
-        "full_name": user.full_name,
-        "role": str(user.role),
-        "status": user.status,
-        "created_at": datetime.now(UTC).isoformat(),
+        "role": user.role,
+        "type": "access",
+        "sid": session.sid,
+        **claims,
     }
-
-    redis_key = f"refresh_token:{user.id}"
-    await redis.hset(redis_key, mapping=user_refresh_data)
-    await redis.expire(redis_key, 7 * 24 * 60 * 60)  # 7 días
+    access_token = create_access_token(access_token_data)
 
     return JSONResponse(
         content={
@@ -220,7 +299,7 @@ async def verify_email(token: str, db: AsyncSession = Depends(get_db), redis: Re
 
 
 @router.delete("/unverified")
-async def cleanup_expired_users(db: AsyncSession = Depends(get_db), redis: Redis = Depends(get_redis)):
+async def cleanup_expired_users(db: AsyncSession = Depends(get_db), redis: Redis = Depends(get_queue_redis)):
     """Elimina todos los usuarios no verificados que hayan expirado."""
     count = await cleanup_expired_unverified_users(db, redis)
     return JSONResponse(
@@ -230,16 +309,11 @@ async def cleanup_expired_users(db: AsyncSession = Depends(get_db), redis: Redis
 
 @router.post("/resend-verification")
 async def resend_verification_email(
-    email_request: EmailRequest, db: AsyncSession = Depends(get_db), redis: Redis = Depends(get_redis)
+    email_request: EmailRequest, db: AsyncSession = Depends(get_db), redis: Redis = Depends(get_ephemeral_redis)
 ):
     """Reenvía el email de verificación para un usuario no verificado."""
     # Verificar si el usuario existe y no está verificado
-    result = await db.execute(
-        select(UserModel).where(
-            UserModel.email == email_request.email,
-        )
-    )
-    user = result.scalar_one_or_none()
+    user = await get_user_record_by_email(db, email_request.email)
 
     if not user:
         raise HTTPException(status_code=404, detail="No se encontró un usuario con este correo electrónico")
@@ -247,11 +321,14 @@ async def resend_verification_email(
     if user.is_verified:
         raise HTTPException(status_code=400, detail="Este usuario ya está verificado")
 
+    # Devolver la conexión antes del envío del correo
+    await release_db(db)
+
     # Generar nuevo token de verificación
     verification_token = await generate_verification_token(redis, email_request.email)
 
     # Enviar nuevo email de verificación
-    await send_verification_email(email_request.email, verification_token, db)
+    await send_verification_email(email_request.email, verification_token, full_name=user.full_name)
 
     return JSONResponse(
         content={"message": "Se ha enviado un nuevo correo de verificación", "email": email_request.email},
@@ -261,12 +338,16 @@ async def resend_verification_email(
 
 @router.post("/login")
 async def login(
-    response: Response, user_in: UserLogin, db: AsyncSession = Depends(get_db), redis: Redis = Depends(get_redis)
+    request: Request,
+    response: Response,
+    user_in: UserLogin,
+    db: AsyncSession = Depends(get_db),
+    redis: Redis = Depends(get_redis),
+    queue_redis: Redis = Depends(get_queue_redis),
 ):
     """Endpoint para iniciar sesión y obtener tokens de acceso."""
     # Buscar usuario por email
-    result = await db.execute(select(UserModel).where(UserModel.email == user_in.email))
-    user = result.scalar_one_or_none()
+    user = await get_user_record_by_email(db, user_in.email)
 
     if not user:
         raise HTTPException(status_code=400, detail="Email o contraseña incorrectos")
@@ -289,36 +370,36 @@ async def login(
     elif user.status == UserStatus.DELETED:
         raise HTTPException(status_code=403, detail="Esta cuenta ha sido eliminada")
 
-    # Actualizar estado y última fecha de login
-    await db.execute(
-        update(UserModel)
-        .where(UserModel.id == user.id)
-        .values(status=UserStatus.ACTIVE, last_login_at=datetime.now(UTC))
+    # El resto del login solo usa Redis
+    await release_db(db)
+
+    # Estado y última fecha de login se escriben en diferido (ver app.core.auth.activity)
+    last_login_at = datetime.now(UTC)
+    await record_user_activity(queue_redis, user.id, UserStatus.ACTIVE, last_login_at)
+
+    # Crear una sesión para este dispositivo sin cerrar las de los demás
+    claims = await epoch_claims(redis, user.id, user.token_version)
+    session = await create_session(
+        redis,
+        user.id,
+        user.email,
+        user.full_name,
+        user.role,
+        UserStatus.ACTIVE,
+        **_client_device(request),
+        claims=claims,
     )
-    await db.commit()
+    refresh_token = session.refresh_token
 
-    # Crear tokens
-    access_token_data = {"sub": str(user.id), "email": user.email, "role": user.role, "type": "access"}
-    refresh_token_data = {"sub": str(user.id), "type": "refresh"}
-
-    access_token = create_access_token(access_token_data)
-    refresh_token = create_refresh_token(refresh_token_data)
-
-    # Crear hash con información del usuario y refresh token
-    user_refresh_data = {
-        "refresh_token": refresh_token,
-        "user_id": str(user.id),
-        "email": str(user.email),
-        "full_name": str(user.full_name),
-        "role": str(user.role),
-        "status": user.status,
-        "created_at": datetime.now(UTC).isoformat(),
+    access_token_data = {
+        "sub": str(user.id),
+        "email": user.email,
+        "role": user.role,
+        "type": "access",
+        "sid": session.sid,
+        **claims,
     }
-
-    # Almacenar hash en Redis
-    redis_key = f"refresh_token:{user.id}"
-    await redis.hset(redis_key, mapping=user_refresh_data)
-    await redis.expire(redis_key, 7 * 24 * 60 * 60)  # 7 días
+    access_token = create_access_token(access_token_data)
 
     # Configurar cookie segura para el refresh token
     response.set_cookie(
@@ -342,9 +423,9 @@ async def login(
                 "full_name": user.full_name,
                 "role": user.role,
                 "is_verified": user.is_verified,
-                "status": user.status,
+                "status": UserStatus.ACTIVE,
                 "provider": user.provider,
-                "last_login_at": user.last_login_at.isoformat() if user.last_login_at else None,
+                "last_login_at": last_login_at.isoformat(),
             },
         },
         status_code=200,
@@ -356,28 +437,27 @@ async def logout(
     response: Response,
     user_id: UUID,
     token: str = Depends(verify_token_not_blacklisted),
-    db: AsyncSession = Depends(get_db),
     redis: Redis = Depends(get_redis),
+    cache_redis: Redis = Depends(get_cache_redis),
+    queue_redis: Redis = Depends(get_queue_redis),
 ):
     """Endpoint para cerrar sesión."""
-    # Actualizar estado is_active
-    result = await db.execute(
-        update(UserModel).where(UserModel.id == user_id).values(status=UserStatus.INACTIVE).returning(UserModel)
-    )
+    payload = decode_token(token) or {}
+    if payload.get("sub") != str(user_id):
+        raise HTTPException(status_code=403, detail="No puedes cerrar la sesión de otro usuario")
 
-    user = result.scalar_one_or_none()
+    # Marcar al usuario como inactivo (escritura diferida)
+    await record_user_activity(queue_redis, user_id, UserStatus.INACTIVE)
 
-    if not user:
-        raise HTTPException(status_code=404, detail="Usuario no encontrado")
-
-    await db.commit()
-
-    # Eliminar refresh token de Redis
-    redis_key = f"refresh_token:{user_id}"
-    await redis.delete(redis_key)
+    # Cerrar la sesión del dispositivo actual; los tokens sin sesión asociada cierran todas
+    sid = payload.get("sid")
+    if sid:
+        await revoke_session(redis, user_id, sid)
+    else:
+        await revoke_all_user_sessions(redis, user_id)
 
     # Añadir el token actual a la lista negra
-    await redis.set(f"blacklisted_token:{token}", "true", ex=3600)  # expira en 1 hora
+    await deny_token(cache_redis, token)
 
     # Eliminar la cookie del refresh token
     response.delete_cookie(key="refresh_token", path="/auth/refresh", secure=True, httponly=True)
@@ -426,45 +506,33 @@ async def refresh_token(
     if not user_id:
         raise HTTPException(status_code=400, detail="Token de refresco inválido")
 
-    # Verificar si el refresh token existe en Redis
-    redis_key = f"refresh_token:{user_id}"
-    stored_token = await redis.hget(redis_key, "refresh_token")
-
-    if not stored_token or stored_token != token_to_use:
+    # Rechazar tokens emitidos antes de una revocación masiva del usuario o global
+    if not await token_epochs_valid(redis, payload):
+        raise HTTPException(status_code=401, detail="La sesión fue revocada. Por favor, inicie sesión nuevamente.")
+
+    # Rotar el refresh token de la sesión; falla si la sesión no existe o el token ya se usó
+    claims = await epoch_claims(redis, user_id, payload.get("ver"))
+    if payload.get("sid"):
+        session = await rotate_session(redis, payload, claims)
+    else:
+        # Token emitido antes de las sesiones por dispositivo: se convierte en una sesión en su primer uso
+        session = await adopt_legacy_session(redis, user_id, token_to_use, **_client_device(request), claims=claims)
+    if not session:
         raise HTTPException(status_code=400, detail="Token de refresco inválido o expirado")
 
-    # Obtener información del usuario de Redis
-    user_data = await redis.hgetall(redis_key)
-    if not user_data:
-        raise HTTPException(status_code=400, detail="Información de sesión no encontrada")
+    user_data = session.data
+    new_refresh_token = session.refresh_token
 
-    # Crear nuevos tokens
+    # Crear nuevo token de acceso
     access_token_data = {
         "sub": user_data["user_id"],
         "email": user_data["email"],
         "role": user_data["role"],
         "type": "access",
+        "sid": session.sid,
+        **claims,
     }
-    refresh_token_data = {"sub": user_data["user_id"], "type": "refresh"}
-
     new_access_token = create_access_token(access_token_data)
-    new_refresh_token = create_refresh_token(refresh_token_data)
-
-    # Actualizar el refresh token en Redis
-    user_refresh_data = {
-        "refresh_token": new_refresh_token,
-        "user_id": user_data["user_id"],
-        "email": user_data["email"],
-        "full_name": user_data["full_name"],
-        "role": user_data["role"],
-        "status": user_data["status"],
-        "created_at": datetime.now(UTC).isoformat(),
-    }
-
-    # Almacenar nuevo hash en Redis
-    await redis.delete(redis_key)  # Eliminar el hash anterior
-    await redis.hset(redis_key, mapping=user_refresh_data)
-    await redis.expire(redis_key, 7 * 24 * 60 * 60)  # 7 días en segundos
 
     # Actualizar la cookie con el nuevo refresh token
     response.set_cookie(
@@ -477,9 +545,6 @@ async def refresh_token(
         path="/auth/refresh",
     )
 
-    # Añadir el token anterior a la lista negra
-    await redis.set(f"blacklisted_token:{token_to_use}", "true", ex=3600)
-
     response_data = {
         "message": "Tokens renovados exitosamente",
         "access_token": new_access_token,
@@ -517,8 +582,7 @@ async def get_current_user(token: str = Depends(verify_token_not_blacklisted), d
         user_id = payload["sub"]
 
         # Buscar el usuario en la base de datos
-        result = await db.execute(select(UserModel).where(UserModel.id == user_id))
-        user = result.scalar_one_or_none()
+        user = await get_user_record_by_id(db, user_id)
 
         if not user:
             raise HTTPException(status_code=404, detail="Usuario no encontrado")
@@ -552,13 +616,12 @@ async def get_current_user(token: str = Depends(verify_token_not_blacklisted), d
 
 @router.post("/forgot-password")
 async def forgot_password(
-    reset_request: PasswordResetRequest, db: AsyncSession = Depends(get_db), redis: Redis = Depends(get_redis)
+    reset_request: PasswordResetRequest, db: AsyncSession = Depends(get_db), redis: Redis = Depends(get_ephemeral_redis)
 ):
     """Endpoint para solicitar un token de recuperación de contraseña."""
     try:
         # Verificar si el usuario existe
-        result = await db.execute(select(UserModel).where(UserModel.email == reset_request.email))
-        user = result.scalar_one_or_none()
+        user = await get_user_record_by_email(db, reset_request.email)
 
         if not user:
             # Por seguridad, no revelamos si el email existe o no
@@ -588,11 +651,14 @@ async def forgot_password(
                 detail="La cuenta no está verificada. Por favor, verifica tu correo electrónico primero",
             )
 
+        # Devolver la conexión antes del envío del correo
+        await release_db(db)
+
         # Generar token de recuperación
-        reset_token = await generate_password_reset_token(redis, reset_request.email)
+        reset_token = await generate_password_reset_token(redis, reset_request.email, user.password)
 
         # Enviar correo con el token
-        await send_password_reset_email(reset_request.email, reset_token, db)
+        await send_password_reset_email(reset_request.email, reset_token, full_name=user.full_name)
 
         return JSONResponse(
             content={"message": "Si el correo está registrado, recibirás instrucciones para restablecer tu contraseña"},
@@ -613,12 +679,21 @@ async def forgot_password(
 
 @router.put("/reset-password")
 async def reset_password(
-    reset_data: PasswordResetVerify, db: AsyncSession = Depends(get_db), redis: Redis = Depends(get_redis)
+    request: Request,
+    reset_data: PasswordResetVerify,
+    db: AsyncSession = Depends(get_db),
+    redis: Redis = Depends(get_redis),
+    ephemeral_redis: Redis = Depends(get_ephemeral_redis),
 ):
     """Endpoint para restablecer la contraseña usando el token de verificación."""
     try:
-        # Verificar el token y obtener el email asociado
-        email = await verify_password_reset_token(redis, reset_data.token)
+        # Consumir el token y obtener el email asociado; un mismo código no puede usarse dos veces
+        try:
+            email = await consume_password_reset_token(
+                ephemeral_redis, reset_data.token, subject=request.client.host if request.client else None
+            )
+        except TooManyAttemptsError:
+            raise _too_many_attempts()
         if not email:
             raise HTTPException(
                 status_code=400,
@@ -626,17 +701,20 @@ async def reset_password(
             )
 
         # Buscar el usuario por email
-        result = await db.execute(select(UserModel).where(UserModel.email == email))
-        user = result.scalar_one_or_none()
+        user = await get_user_record_by_email(db, email)
 
         if not user:
-            # Invalidar el token si el usuario no existe
-            await invalidate_password_reset_token(redis, reset_data.token)
             raise HTTPException(status_code=404, detail="Usuario no encontrado")
 
+        # Un código emitido antes del último cambio de contraseña ya no es válido
+        if not password_reset_token_matches(reset_data.token, user.password):
+            raise HTTPException(
+                status_code=400,
+                detail="Token inválido o expirado. Por favor, solicita un nuevo código de recuperación.",
+            )
+
         # Verificar si el usuario se registró con un proveedor social
         if user.provider != AuthProvider.LOCAL:
-            await invalidate_password_reset_token(redis, reset_data.token)
             raise HTTPException(
                 status_code=400,
                 detail=f"No se puede restablecer la contraseña para cuentas registradas con {user.provider}",
@@ -646,17 +724,19 @@ async def reset_password(
         hashed_password = get_password_hash(reset_data.new_password)
         await db.execute(
             update(UserModel)
-            .where(UserModel.email == email)
+            .where(UserModel.email_matches(email))
             .values(password=hashed_password, updated_at=datetime.now(UTC))
         )
+        token_version = await bump_token_version(db, user.id)
+        add_outbox_event(
+            db, OutboxEventType.PASSWORD_CHANGED, user.id, {"reason": "reset", "token_version": token_version}
+        )
         await db.commit()
+        notify_outbox()
 
-        # Invalidar el token después de usarlo
-        await invalidate_password_reset_token(redis, reset_data.token)
-
-        # Invalidar todas las sesiones activas del usuario por seguridad
-        redis_key = f"refresh_token:{user.id}"
-        await redis.delete(redis_key)
+        # Invalidar todas las sesiones y tokens activos del usuario por seguridad
+        await revoke_all_user_sessions(redis, user.id)
+        await publish_token_version(redis, user.id, token_version)
 
         return JSONResponse(
             content={
@@ -679,6 +759,7 @@ async def change_password(
     token: str = Depends(verify_token_not_blacklisted),
     db: AsyncSession = Depends(get_db),
     redis: Redis = Depends(get_redis),
+    queue_redis: Redis = Depends(get_queue_redis),
 ):
     """Endpoint para cambiar la contraseña del usuario autenticado."""
     try:
@@ -690,8 +771,7 @@ async def change_password(
         user_id = payload["sub"]
 
         # Buscar el usuario en la base de datos
-        result = await db.execute(select(UserModel).where(UserModel.id == user_id))
-        user = result.scalar_one_or_none()
+        user = await get_user_by_id(db, user_id)
 
         if not user:
             raise HTTPException(status_code=404, detail="Usuario no encontrado")
@@ -722,14 +802,17 @@ async def change_password(
                 updated_at=datetime.now(UTC),
             )
         )
+        token_version = await bump_token_version(db, user_id)
+        add_outbox_event(
+            db, OutboxEventType.PASSWORD_CHANGED, user_id, {"reason": "change", "token_version": token_version}
+        )
+        await discard_pending_activity(queue_redis, user_id)
         await db.commit()
+        notify_outbox()
 
-        # Invalidar todas las sesiones activas del usuario por seguridad
-        redis_key = f"refresh_token:{user_id}"
-        await redis.delete(redis_key)
-
-        # Añadir el token actual a la lista negra
-        await redis.set(f"blacklisted_token:{token}", "true", ex=3600)  # expira en 1 hora
+        # Invalidar todas las sesiones y tokens activos del usuario, incluido el actual
+        await revoke_all_user_sessions(redis, user_id)
+        await publish_token_version(redis, user_id, token_version)
 
         return JSONResponse(
             content={
@@ -763,8 +846,7 @@ async def delete_account(
         user_id = payload["sub"]
 
         # Buscar el usuario en la base de datos
-        result = await db.execute(select(UserModel).where(UserModel.id == user_id))
-        user = result.scalar_one_or_none()
+        user = await get_user_by_id(db, user_id)
 
         if not user:
             raise HTTPException(status_code=404, detail="Usuario no encontrado")
@@ -779,14 +861,14 @@ async def delete_account(
             .where(UserModel.id == user_id)
             .values(status=UserStatus.DELETED, updated_at=datetime.now(UTC))
         )
+        token_version = await bump_token_version(db, user_id)
+        add_outbox_event(db, OutboxEventType.ACCOUNT_DELETED, user_id, {"token_version": token_version})
         await db.commit()
+        notify_outbox()
 
-        # Eliminar todas las sesiones del usuario en Redis
-        redis_key = f"refresh_token:{user_id}"
-        await redis.delete(redis_key)
-
-        # Añadir el token actual a la lista negra
-        await redis.set(f"blacklisted_token:{token}", "true", ex=3600)  # expira en 1 hora
+        # Eliminar todas las sesiones del usuario e invalidar sus tokens, incluido el actual
+        await revoke_all_user_sessions(redis, user_id)
+        await publish_token_version(redis, user_id, token_version)
 
         return JSONResponse(
             content={"message": "Cuenta eliminada exitosamente"},
@@ -807,6 +889,7 @@ async def revoke_all_sessions(
     token: str = Depends(verify_token_not_blacklisted),
     db: AsyncSession = Depends(get_db),
     redis: Redis = Depends(get_redis),
+    queue_redis: Redis = Depends(get_queue_redis),
 ):
     """Endpoint para revocar todas las sesiones activas del usuario."""
     try:
@@ -818,8 +901,7 @@ async def revoke_all_sessions(
         user_id = payload["sub"]
 
         # Buscar el usuario en la base de datos
-        result = await db.execute(select(UserModel).where(UserModel.id == user_id))
-        user = result.scalar_one_or_none()
+        user = await get_user_by_id(db, user_id)
 
         if not user:
             raise HTTPException(status_code=404, detail="Usuario no encontrado")
@@ -834,14 +916,18 @@ async def revoke_all_sessions(
             .where(UserModel.id == user_id)
             .values(status=UserStatus.INACTIVE, updated_at=datetime.now(UTC))
         )
+        token_version = await bump_token_version(db, user_id)
+        add_outbox_event(
+            db, OutboxEventType.SESSION_REVOKED, user_id, {"scope": "all", "token_version": token_version}
+        )
+        # Un login anterior aún sin volcar no debe devolver la cuenta a activa
+        await discard_pending_activity(queue_redis, user_id)
         await db.commit()
+        notify_outbox()
 
-        # Eliminar todas las sesiones del usuario en Redis
-        redis_key = f"refresh_token:{user_id}"
-        await redis.delete(redis_key)
-
-        # Añadir el token actual a la lista negra
-        await redis.set(f"blacklisted_token:{token}", "true", ex=3600)  # expira en 1 hora
+        # Eliminar todas las sesiones del usuario e invalidar sus tokens, incluido el actual
+        await revoke_all_user_sessions(redis, user_id)
+        await publish_token_version(redis, user_id, token_version)
 
         return JSONResponse(
             content={
@@ -858,6 +944,28 @@ async def revoke_all_sessions(
         raise HTTPException(status_code=500, detail="Error inesperado al revocar las sesiones")
 
 
+@router.post("/revoke-global")
+async def revoke_all_tokens_globally(
+    token: str = Depends(verify_token_not_blacklisted),
+    redis: Redis = Depends(get_redis),
+):
+    """Endpoint para invalidar los tokens de todos los usuarios. Solo accesible para administradores."""
+    payload = decode_token(token)
+    if not payload or "sub" not in payload or "role" not in payload:
+        raise HTTPException(status_code=401, detail="Token inválido o mal formado")
+
+    if payload["role"].lower() != "admin":
+        raise HTTPException(status_code=403, detail="No tienes permisos suficientes para realizar esta acción")
+
+    epoch = await bump_global_epoch(redis)
+    logger.warning(f"Revocación global de tokens solicitada por {payload['sub']} (época {epoch})")
+
+    return JSONResponse(
+        content={"message": "Todos los tokens han sido revocados", "epoch": epoch},
+        status_code=200,
+    )
+
+
 @router.get("/sessions", response_model=ActiveSessionsList)
 async def list_active_sessions(
     token: str = Depends(verify_token_not_blacklisted),
@@ -878,31 +986,25 @@ async def list_active_sessions(
                 detail="No tienes permisos suficientes para acceder a esta información",
             )
 
-        # Obtener todas las claves de refresh tokens
-        refresh_keys = []
-        async for key in redis.scan_iter("refresh_token:*"):
-            refresh_keys.append(key)
-
         active_sessions = []
-        # Procesar cada sesión activa
-        for key in refresh_keys:
-            session_data = await redis.hgetall(key)
-            if session_data:
-                try:
-                    created_at = datetime.fromisoformat(session_data.get("created_at", ""))
-                    # Crear una instancia de ActiveSession usando el modelo Pydantic
-                    session = ActiveSession(
-                        user_id=UUID(session_data.get("user_id", "")),
-                        email=session_data.get("email", ""),
-                        full_name=session_data.get("full_name", ""),
-                        role=session_data.get("role", ""),
-                        created_at=created_at,
-                        is_active=session_data.get("is_active", "false").lower() == "true",
-                    )
-                    active_sessions.append(session)
-                except (ValueError, TypeError) as e:
-                    logger.error(f"Error al procesar sesión {key}: {str(e)}")
-                    continue
+        # Recorrer los índices de sesiones de cada usuario
+        async for session_data in iter_all_sessions(redis):
+            try:
+                # Crear una instancia de ActiveSession usando el modelo Pydantic
+                session = ActiveSession(
+                    sid=session_data.get("sid"),
+                    user_id=UUID(session_data.get("user_id", "")),
+                    email=session_data.get("email", ""),
+                    full_name=session_data.get("full_name", ""),
+                    role=session_data.get("role", ""),
+                    device=session_data.get("device") or None,
+                    created_at=datetime.fromisoformat(session_data.get("created_at", "")),
+                    status=session_data.get("status", UserStatus.ACTIVE.value),
+                )
+                active_sessions.append(session)
+            except (ValueError, TypeError) as e:
+                logger.error(f"Error al procesar sesión {session_data.get('sid')}: {str(e)}")
+                continue
 
         # Ordenar las sesiones por fecha de creación (más recientes primero)
         active_sessions.sort(key=lambda x: x.created_at, reverse=True)
@@ -921,17 +1023,67 @@ async def list_active_sessions(
         raise HTTPException(status_code=500, detail="Error inesperado al listar las sesiones activas")
 
 
+@router.get("/me/sessions", response_model=DeviceSessionsList)
+async def list_my_sessions(
+    token: str = Depends(verify_token_not_blacklisted),
+    redis: Redis = Depends(get_redis),
+):
+    """Endpoint para listar las sesiones activas del usuario autenticado en sus dispositivos."""
+    payload = decode_token(token)
+    if not payload or "sub" not in payload:
+        raise HTTPException(status_code=401, detail="Token inválido o mal formado")
+
+    current_sid = payload.get("sid")
+    sessions = [
+        DeviceSession(
+            sid=data["sid"],
+            device=data.get("device") or None,
+            ip_address=data.get("ip_address") or None,
+            created_at=datetime.fromisoformat(data["created_at"]),
+            last_used_at=datetime.fromisoformat(data["last_used_at"]),
+            current=data["sid"] == current_sid,
+        )
+        for data in await list_user_sessions(redis, payload["sub"])
+    ]
+    sessions.sort(key=lambda x: x.last_used_at, reverse=True)
+
+    return DeviceSessionsList(total=len(sessions), sessions=sessions)
+
+
+@router.delete("/me/sessions/{sid}")
+async def revoke_my_session(
+    sid: str,
+    token: str = Depends(verify_token_not_blacklisted),
+    redis: Redis = Depends(get_redis),
+    cache_redis: Redis = Depends(get_cache_redis),
+):
+    """Endpoint para cerrar la sesión de uno de los dispositivos del usuario autenticado."""
+    payload = decode_token(token)
+    if not payload or "sub" not in payload:
+        raise HTTPException(status_code=401, detail="Token inválido o mal formado")
+
+    if not await revoke_session(redis, payload["sub"], sid):
+        raise HTTPException(status_code=404, detail="Sesión no encontrada")
+
+    # Si se cierra la sesión actual, invalidar también el token de acceso en uso
+    if sid == payload.get("sid"):
+        await deny_token(cache_redis, token)
+
+    return JSONResponse(content={"message": "Sesión cerrada exitosamente"}, status_code=200)
+
+
 @router.post("/reactivate")
 async def reactivate_account(
+    request: Request,
     reactivate_data: ReactivateAccount,
     db: AsyncSession = Depends(get_db),
     redis: Redis = Depends(get_redis),
+    queue_redis: Redis = Depends(get_queue_redis),
 ):
     """Endpoint para reactivar una cuenta que fue eliminada."""
     try:
         # Buscar el usuario por email
-        result = await db.execute(select(UserModel).where(UserModel.email == reactivate_data.email))
-        user = result.scalar_one_or_none()
+        user = await get_user_by_email(db, reactivate_data.email)
 
         if not user:
             raise HTTPException(status_code=404, detail="No se encontró ninguna cuenta con este correo electrónico")
@@ -944,35 +1096,38 @@ async def reactivate_account(
             raise HTTPException(status_code=400, detail="La contraseña es incorrecta")
 
         # Reactivar la cuenta
+        now = datetime.now(UTC)
         await db.execute(
             update(UserModel)
             .where(UserModel.id == user.id)
-            .values(status=UserStatus.ACTIVE, updated_at=datetime.now(UTC), last_login_at=datetime.now(UTC))
+            .values(status=UserStatus.ACTIVE, updated_at=now, last_login_at=now)
         )
-        await db.commit()
-        await db.refresh(user)
-
-        # Crear tokens para el inicio de sesión automático
-        access_token_data = {"sub": str(user.id), "email": user.email, "role": user.role, "type": "access"}
-        refresh_token_data = {"sub": str(user.id), "type": "refresh"}
-
-        access_token = create_access_token(access_token_data)
-        refresh_token = create_refresh_token(refresh_token_data)
-
-        # Almacenar información en Redis
-        user_refresh_data = {
-            "refresh_token": refresh_token,
-            "user_id": str(user.id),
+        await discard_pending_activity(queue_redis, user.id, last_login_at=True)
+
+        # El resto solo usa Redis; la respuesta se arma con los valores recién escritos
+        await release_db(db)
+
+        # Crear la sesión para el inicio de sesión automático
+        claims = await epoch_claims(redis, user.id, user.token_version)
+        session = await create_session(
+            redis,
+            user.id,
+            user.email,
+            user.full_name,
+            user.role,
+            UserStatus.ACTIVE,
+            **_client_device(request),
+            claims=claims,
+        )
+        access_token_data = {
+            "sub": str(user.id),
             "email": user.email,
-            "full_name": user.full_name,
-            "role": str(user.role),
-            "status": user.status,
-            "created_at": datetime.now(UTC).isoformat(),
+            "role": user.role,
+            "type": "access",
+            "sid": session.sid,
+            **claims,
         }
-
-        redis_key = f"refresh_token:{user.id}"
-        await redis.hset(redis_key, mapping=user_refresh_data)
-        await redis.expire(redis_key, 7 * 24 * 60 * 60)  # 7 días
+        access_token = create_access_token(access_token_data)
 
         return JSONResponse(
             content={
@@ -987,9 +1142,9 @@ async def reactivate_account(
                     "bio": user.bio,
                     "avatar_url": user.avatar_url,
                     "is_verified": user.is_verified,
-                    "status": user.status,
+                    "status": UserStatus.ACTIVE,
                     "provider": user.provider,
-                    "last_login_at": user.last_login_at.isoformat() if user.last_login_at else None,
+                    "last_login_at": now.isoformat(),
                 },
             },
             status_code=200,
@@ -1051,82 +1206,66 @@ async def github_login():
 @router.post("/exchange-temp-code")
 async def exchange_temp_code(
     request: ExchangeCodeRequest,
+    http_request: Request,
     response: Response,
     redis: Redis = Depends(get_redis),
+    ephemeral_redis: Redis = Depends(get_ephemeral_redis),
+    queue_redis: Redis = Depends(get_queue_redis),
     db: AsyncSession = Depends(get_db),
 ):
     """Endpoint para intercambiar el código temporal por los tokens de acceso."""
     try:
-        logger.debug(f"Recibido código temporal para intercambio: {request.temp_code}")
-
         # Verificar que el código no esté vacío
         if not request.temp_code:
             raise HTTPException(status_code=400, detail="El código temporal no puede estar vacío")
 
         # Recuperar datos temporales
-        auth_data = await get_temp_auth_data(redis, request.temp_code)
+        auth_data = await get_temp_auth_data(ephemeral_redis, request.temp_code)
 
         if not auth_data:
-            # Verificar si el código existe en Redis (para mejor debugging)
-            redis_key = f"temp_auth:{request.temp_code}"
-            exists = await redis.exists(redis_key)
-            logger.error(f"Verificación adicional - ¿La clave existe?: {exists}")
-
-            if exists:
-                all_keys = await redis.hkeys(redis_key)
-                logger.error(f"Las claves disponibles en el hash son: {all_keys}")
-                raise HTTPException(status_code=500, detail="Error al recuperar los datos temporales")
-            else:
-                logger.error(f"Código temporal no encontrado: {request.temp_code}")
-                raise HTTPException(
-                    status_code=400,
-                    detail="Código temporal inválido o expirado. Asegúrate de usar el código exacto sin el prefijo 'temp_auth:'",
-                )
-
-        logger.debug(f"Datos temporales recuperados exitosamente: {auth_data}")
-
-        try:
-            # Actualizar estado del usuario a activo
-            logger.debug(f"Actualizando estado del usuario {auth_data['user_id']} a ACTIVE")
-            result = await db.execute(
-                update(UserModel)
-                .where(UserModel.id == UUID(auth_data["user_id"]))
-                .values(status=UserStatus.ACTIVE, updated_at=datetime.now(UTC))
-                .returning(UserModel)
+            raise HTTPException(
+                status_code=400,
+                detail="Código temporal inválido o expirado. Asegúrate de usar el código exacto sin el prefijo 'temp_auth:'",
             )
-            user = result.scalar_one_or_none()
-
-            if not user:
-                logger.error(f"No se encontró el usuario con ID {auth_data['user_id']}")
-                raise HTTPException(status_code=404, detail="Usuario no encontrado")
 
-            await db.commit()
-            logger.debug(f"Estado del usuario actualizado exitosamente a {user.status}")
+        user_id = UUID(auth_data["user_id"])
+        result = await db.execute(select(UserModel.token_version).where(UserModel.id == user_id))
+        token_version = result.scalar_one_or_none()
+        await release_db(db)
 
-        except Exception as e:
-            logger.error(f"Error al actualizar el estado del usuario: {str(e)}")
-            await db.rollback()
-            raise HTTPException(status_code=500, detail="Error al actualizar el estado del usuario")
+        if token_version is None:
+            logger.error(f"No se encontró el usuario con ID {auth_data['user_id']}")
+            raise HTTPException(status_code=404, detail="Usuario no encontrado")
 
-        # Almacenar información del refresh token en Redis
-        user_refresh_data = {
-            "refresh_token": auth_data["jwt_refresh_token"],
-            "user_id": auth_data["user_id"],
+        # Marcar al usuario como activo (escritura diferida)
+        await record_user_activity(queue_redis, user_id, UserStatus.ACTIVE)
+
+        # Crear la sesión del dispositivo que completa el login social
+        claims = await epoch_claims(redis, user_id, token_version)
+        session = await create_session(
+            redis,
+            auth_data["user_id"],
+            auth_data["email"],
+            auth_data["full_name"],
+            auth_data["role"],
+            UserStatus.ACTIVE,
+            **_client_device(http_request),
+            claims=claims,
+        )
+        access_token_data = {
+            "sub": auth_data["user_id"],
             "email": auth_data["email"],
-            "full_name": auth_data["full_name"],
             "role": auth_data["role"],
-            "status": UserStatus.ACTIVE.value,  # Usar el valor del enum
-            "created_at": datetime.now(UTC).isoformat(),
+            "type": "access",
+            "sid": session.sid,
+            **claims,
         }
-
-        redis_key = f"refresh_token:{auth_data['user_id']}"
-        await redis.hset(redis_key, mapping=user_refresh_data)
-        await redis.expire(redis_key, 7 * 24 * 60 * 60)  # 7 días
+        access_token = create_access_token(access_token_data)
 
         # Configurar cookie del refresh token
         response.set_cookie(
             key="refresh_token",
-            value=auth_data["jwt_refresh_token"],
+            value=session.refresh_token,
             httponly=True,
             secure=True,
             samesite="lax",
@@ -1138,7 +1277,7 @@ async def exchange_temp_code(
         return JSONResponse(
             content={
                 "message": "Inicio de sesión con GitHub exitoso",
-                "access_token": auth_data["jwt_access_token"],
+                "access_token": access_token,
                 "token_type": "bearer",
                 "user": {
                     "id": auth_data["user_id"],
@@ -1171,7 +1310,8 @@ async def github_callback(
     request: Request,
     response: Response,
     db: AsyncSession = Depends(get_db),
-    redis: Redis = Depends(get_redis),
+    redis: Redis = Depends(get_ephemeral_redis),
+    queue_redis: Redis = Depends(get_queue_redis),
 ):
     """Endpoint para manejar el callback de GitHub y obtener el token de acceso."""
     try:
@@ -1191,7 +1331,6 @@ async def github_callback(
 
         logger.info(f"Iniciando intercambio de código por token de acceso. Code length: {len(code)}")
         logger.debug(f"Código recibido: {code}")
-        logger.debug(f"State recibido: {state}")
         logger.debug(f"URL configurada: {settings.GITHUB_REDIRECT_URI}")
         logger.debug(f"URL actual de la petición: {request.url}")
         logger.debug(f"Client ID configurado: {settings.GITHUB_CLIENT_ID}")
@@ -1270,86 +1409,86 @@ async def github_callback(
                     detail="No se pudo obtener un email verificado del proveedor social",
                 )
 
-            # Buscar si el usuario ya existe
-            result = await db.execute(select(UserModel).where(UserModel.email == social_profile.email))
-            user = result.scalar_one_or_none()
-
-            if not user:
-                # Crear nuevo usuario
-                user = UserModel(
-                    email=social_profile.email,
-                    full_name=social_profile.full_name or "",
-                    password="",  # No se requiere contraseña para login social
-                    role=UserRole.USER,
-                    avatar_url=social_profile.avatar_url,
-                    is_verified=True,  # Los usuarios de login social se consideran verificados
-                    status=UserStatus.INACTIVE,  # Inicialmente inactivo hasta completar el exchange
-                    provider=social_login_data.provider,
-                    provider_id=social_profile.provider_id,
-                    last_login_at=datetime.now(UTC),
-                )
-                db.add(user)
-                await db.commit()
-                await db.refresh(user)
-            else:
-                # Verificar si el usuario ya está registrado con otro proveedor social
-                if user.provider != social_login_data.provider:
-                    raise HTTPException(
-                        status_code=400,
-                        detail=f"Este correo electrónico ya está registrado usando {user.provider}. Por favor, inicie sesión con ese método.",
-                    )
-
-                # Actualizar información del usuario si es necesario
-                update_data = {
-                    "last_login_at": datetime.now(UTC),
-                    "status": UserStatus.INACTIVE,  # Establecer como inactivo hasta completar el exchange
-                }
+        # Las llamadas HTTP al proveedor han terminado: a partir de aquí solo base de datos y Redis
+        # Buscar si el usuario ya existe
+        user = await _find_social_user(db, social_login_data.provider, social_profile)
 
-                if social_profile.avatar_url and not user.avatar_url:
-                    update_data["avatar_url"] = social_profile.avatar_url
-                if social_profile.full_name and not user.full_name:
-                    update_data["full_name"] = social_profile.full_name
-                if not user.provider_id:
-                    update_data["provider_id"] = social_profile.provider_id
-
-                await db.execute(
-                    update(UserModel).where(UserModel.id == user.id).values(**update_data, updated_at=datetime.now(UTC))
+        if not user:
+            # Crear nuevo usuario
+            user = UserModel(
+                email=social_profile.email,
+                full_name=social_profile.full_name or "",
+                password="",  # No se requiere contraseña para login social
+                role=UserRole.USER,
+                avatar_url=social_profile.avatar_url,
+                is_verified=True,  # Los usuarios de login social se consideran verificados
+                status=UserStatus.INACTIVE,  # Inicialmente inactivo hasta completar el exchange
+                provider=social_login_data.provider,
+                provider_id=social_profile.provider_id,
+                last_login_at=datetime.now(UTC),
+            )
+            db.add(user)
+            await db.flush()
+            add_outbox_event(
+                db,
+                OutboxEventType.USER_REGISTERED,
+                user.id,
+                {
+                    "email": user.email,
+                    "full_name": user.full_name,
+                    "provider": social_login_data.provider.value,
+                    "is_verified": True,
+                },
+            )
+            await db.commit()
+            notify_outbox()
+        else:
+            # Verificar si el usuario ya está registrado con otro proveedor social
+            if user.provider != social_login_data.provider:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Este correo electrónico ya está registrado usando {user.provider}. Por favor, inicie sesión con ese método.",
                 )
-                await db.commit()
-                await db.refresh(user)
 
-            # Crear tokens JWT para la sesión
-            access_token_data = {
-                "sub": str(user.id),
-                "email": user.email,
-                "role": user.role,
-                "type": "access",
-            }
-            refresh_token_data = {"sub": str(user.id), "type": "refresh"}
-
-            jwt_access_token = create_access_token(access_token_data)
-            jwt_refresh_token = create_refresh_token(refresh_token_data)
-
-            # Crear un objeto con los datos necesarios
-            auth_data = {
-                "jwt_access_token": jwt_access_token,
-                "jwt_refresh_token": jwt_refresh_token,
-                "user_id": str(user.id),
-                "email": user.email,
-                "full_name": user.full_name or "",
-                "avatar_url": user.avatar_url or "",
-                "provider": user.provider,
-                "role": user.role,
-            }
+            # Completar el perfil solo si le faltan datos
+            profile_changed = False
+            if social_profile.avatar_url and not user.avatar_url:
+                user.avatar_url = social_profile.avatar_url
+                profile_changed = True
+            if social_profile.full_name and not user.full_name:
+                user.full_name = social_profile.full_name
+                profile_changed = True
+            if not user.provider_id:
+                user.provider_id = social_profile.provider_id
+                profile_changed = True
+
+            if profile_changed:
+                user.updated_at = datetime.now(UTC)
+            # Guarda los cambios del perfil, si los hay, y devuelve la conexión
+            await release_db(db)
+
+            # Último login e inactivo hasta completar el exchange (escritura diferida)
+            await record_user_activity(queue_redis, user.id, UserStatus.INACTIVE, datetime.now(UTC))
+
+        # Crear un objeto con los datos necesarios; los tokens y la sesión se crean
+        # al intercambiar el código temporal
+        auth_data = {
+            "user_id": str(user.id),
+            "email": user.email,
+            "full_name": user.full_name or "",
+            "avatar_url": user.avatar_url or "",
+            "provider": user.provider,
+            "role": user.role,
+        }
 
-            # Generar código temporal
-            temp_code = await generate_temporary_auth_code(redis, auth_data)
+        # Generar código temporal
+        temp_code = await generate_temporary_auth_code(redis, auth_data)
 
-            # Redirigir al frontend solo con el código temporal
-            frontend_url = "http://localhost/"
-            redirect_url = f"{frontend_url}?temp_code={temp_code}"
+        # Redirigir al frontend solo con el código temporal
+        frontend_url = "http://localhost/"
+        redirect_url = f"{frontend_url}?temp_code={temp_code}"
 
-            return RedirectResponse(url=redirect_url, status_code=303)
+        return RedirectResponse(url=redirect_url, status_code=303)
 
     except HTTPException as http_error:
         raise http_error
@@ -1363,7 +1502,7 @@ async def github_callback(
 
 
 @router.get("/google/login")
-async def google_login(redis: Redis = Depends(get_redis)):
+async def google_login(redis: Redis = Depends(get_ephemeral_redis)):
     """Endpoint para iniciar el flujo de autenticación con Google."""
     try:
         logger.info("Generando URL de autorización de Google")
@@ -1374,11 +1513,8 @@ async def google_login(redis: Redis = Depends(get_redis)):
                 detail="Error de configuración: Client ID de Google no configurado",
             )
 
-        # Generar estado para seguridad
-        state = token_urlsafe(32)
-
-        # Almacenar el state en Redis con expiración de 10 minutos
-        await redis.set(f"oauth_state:{state}", "google", ex=600)
+        # Generar y almacenar el state con expiración de 10 minutos
+        state = await oauth_states.issue(redis, "google")
 
         # Construir la URL de autorización de Google
         google_auth_url = (
@@ -1394,7 +1530,6 @@ async def google_login(redis: Redis = Depends(get_redis)):
         logger.debug(f"URL de autorización generada: {google_auth_url}")
         logger.debug(f"Client ID usado: {settings.GOOGLE_CLIENT_ID}")
         logger.debug(f"Redirect URI configurado: {settings.GOOGLE_REDIRECT_URI}")
-        logger.debug(f"State generado: {state}")
 
         return JSONResponse(
             content={
@@ -1420,7 +1555,8 @@ async def google_callback(
     response: Response,
     code: str,
     db: AsyncSession = Depends(get_db),
-    redis: Redis = Depends(get_redis),
+    redis: Redis = Depends(get_ephemeral_redis),
+    queue_redis: Redis = Depends(get_queue_redis),
     state: str | None = None,
 ):
     """Endpoint para manejar el callback de Google y obtener el token de acceso."""
@@ -1441,19 +1577,16 @@ async def google_callback(
 
         # Verificar el state si está presente
         if state:
-            stored_provider = await redis.get(f"oauth_state:{state}")
-            if not stored_provider or stored_provider != "google":
-                logger.error(f"State inválido o expirado: {state}")
+            stored_provider = await oauth_states.consume(redis, state)
+            if stored_provider != "google":
+                logger.error("State inválido o expirado en el callback de Google")
                 raise HTTPException(
                     status_code=400,
                     detail="Estado de autenticación inválido o expirado",
                 )
-            # Eliminar el state usado
-            await redis.delete(f"oauth_state:{state}")
 
         logger.info(f"Iniciando intercambio de código por token de acceso. Code length: {len(code)}")
         logger.debug(f"Código recibido: {code}")
-        logger.debug(f"State recibido: {state}")
         logger.debug(f"URL configurada: {settings.GOOGLE_REDIRECT_URI}")
         logger.debug(f"URL actual de la petición: {request.url}")
         logger.debug(f"Client ID configurado: {settings.GOOGLE_CLIENT_ID}")
@@ -1520,86 +1653,86 @@ async def google_callback(
                     detail="No se pudo obtener un email verificado del proveedor social",
                 )
 
-            # Buscar si el usuario ya existe
-            result = await db.execute(select(UserModel).where(UserModel.email == social_profile.email))
-            user = result.scalar_one_or_none()
-
-            if not user:
-                # Crear nuevo usuario
-                user = UserModel(
-                    email=social_profile.email,
-                    full_name=social_profile.full_name or "",
-                    password="",  # No se requiere contraseña para login social
-                    role=UserRole.USER,
-                    avatar_url=social_profile.avatar_url,
-                    is_verified=True,  # Los usuarios de login social se consideran verificados
-                    status=UserStatus.INACTIVE,  # Inicialmente inactivo hasta completar el exchange
-                    provider=social_login_data.provider,
-                    provider_id=social_profile.provider_id,
-                    last_login_at=datetime.now(UTC),
-                )
-                db.add(user)
-                await db.commit()
-                await db.refresh(user)
-            else:
-                # Verificar si el usuario ya está registrado con otro proveedor social
-                if user.provider != social_login_data.provider:
-                    raise HTTPException(
-                        status_code=400,
-                        detail=f"Este correo electrónico ya está registrado usando {user.provider}. Por favor, inicie sesión con ese método.",
-                    )
-
-                # Actualizar información del usuario si es necesario
-                update_data = {
-                    "last_login_at": datetime.now(UTC),
-                    "status": UserStatus.INACTIVE,  # Establecer como inactivo hasta completar el exchange
-                }
+        # Las llamadas HTTP al proveedor han terminado: a partir de aquí solo base de datos y Redis
+        # Buscar si el usuario ya existe
+        user = await _find_social_user(db, social_login_data.provider, social_profile)
 
-                if social_profile.avatar_url and not user.avatar_url:
-                    update_data["avatar_url"] = social_profile.avatar_url
-                if social_profile.full_name and not user.full_name:
-                    update_data["full_name"] = social_profile.full_name
-                if not user.provider_id:
-                    update_data["provider_id"] = social_profile.provider_id
-
-                await db.execute(
-                    update(UserModel).where(UserModel.id == user.id).values(**update_data, updated_at=datetime.now(UTC))
+        if not user:
+            # Crear nuevo usuario
+            user = UserModel(
+                email=social_profile.email,
+                full_name=social_profile.full_name or "",
+                password="",  # No se requiere contraseña para login social
+                role=UserRole.USER,
+                avatar_url=social_profile.avatar_url,
+                is_verified=True,  # Los usuarios de login social se consideran verificados
+                status=UserStatus.INACTIVE,  # Inicialmente inactivo hasta completar el exchange
+                provider=social_login_data.provider,
+                provider_id=social_profile.provider_id,
+                last_login_at=datetime.now(UTC),
+            )
+            db.add(user)
+            await db.flush()
+            add_outbox_event(
+                db,
+                OutboxEventType.USER_REGISTERED,
+                user.id,
+                {
+                    "email": user.email,
+                    "full_name": user.full_name,
+                    "provider": social_login_data.provider.value,
+                    "is_verified": True,
+                },
+            )
+            await db.commit()
+            notify_outbox()
+        else:
+            # Verificar si el usuario ya está registrado con otro proveedor social
+            if user.provider != social_login_data.provider:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Este correo electrónico ya está registrado usando {user.provider}. Por favor, inicie sesión con ese método.",
                 )
-                await db.commit()
-                await db.refresh(user)
 
-            # Crear tokens JWT para la sesión
-            access_token_data = {
-                "sub": str(user.id),
-                "email": user.email,
-                "role": user.role,
-                "type": "access",
-            }
-            refresh_token_data = {"sub": str(user.id), "type": "refresh"}
-
-            jwt_access_token = create_access_token(access_token_data)
-            jwt_refresh_token = create_refresh_token(refresh_token_data)
-
-            # Crear un objeto con los datos necesarios
-            auth_data = {
-                "jwt_access_token": jwt_access_token,
-                "jwt_refresh_token": jwt_refresh_token,
-                "user_id": str(user.id),
-                "email": user.email,
-                "full_name": user.full_name or "",
-                "avatar_url": user.avatar_url or "",
-                "provider": user.provider,
-                "role": user.role,
-            }
+            # Completar el perfil solo si le faltan datos
+            profile_changed = False
+            if social_profile.avatar_url and not user.avatar_url:
+                user.avatar_url = social_profile.avatar_url
+                profile_changed = True
+            if social_profile.full_name and not user.full_name:
+                user.full_name = social_profile.full_name
+                profile_changed = True
+            if not user.provider_id:
+                user.provider_id = social_profile.provider_id
+                profile_changed = True
+
+            if profile_changed:
+                user.updated_at = datetime.now(UTC)
+            # Guarda los cambios del perfil, si los hay, y devuelve la conexión
+            await release_db(db)
+
+            # Último login e inactivo hasta completar el exchange (escritura diferida)
+            await record_user_activity(queue_redis, user.id, UserStatus.INACTIVE, datetime.now(UTC))
+
+        # Crear un objeto con los datos necesarios; los tokens y la sesión se crean
+        # al intercambiar el código temporal
+        auth_data = {
+            "user_id": str(user.id),
+            "email": user.email,
+            "full_name": user.full_name or "",
+            "avatar_url": user.avatar_url or "",
+            "provider": user.provider,
+            "role": user.role,
+        }
 
-            # Generar código temporal
-            temp_code = await generate_temporary_auth_code(redis, auth_data)
+        # Generar código temporal
+        temp_code = await generate_temporary_auth_code(redis, auth_data)
 
-            # Redirigir al frontend solo con el código temporal
-            frontend_url = "http://localhost/"
-            redirect_url = f"{frontend_url}?temp_code={temp_code}"
+        # Redirigir al frontend solo con el código temporal
+        frontend_url = "http://localhost/"
+        redirect_url = f"{frontend_url}?temp_code={temp_code}"
 
-            return RedirectResponse(url=redirect_url, status_code=303)
+        return RedirectResponse(url=redirect_url, status_code=303)
 
     except HTTPException as http_error:
         raise http_error
@@ -1627,13 +1760,6 @@ async def update_profile(
 
         user_id = payload["sub"]
 
-        # Buscar el usuario en la base de datos
-        result = await db.execute(select(UserModel).where(UserModel.id == user_id))
-        user = result.scalar_one_or_none()
-
-        if not user:
-            raise HTTPException(status_code=404, detail="Usuario no encontrado")
-
         # Preparar los datos de actualización
         update_data = {}
         if profile_update.full_name is not None:
@@ -1646,11 +1772,30 @@ async def update_profile(
         if not update_data:
             raise HTTPException(status_code=400, detail="No se proporcionaron datos para actualizar")
 
-        # Actualizar el usuario
+        # Actualizar el usuario y leer el perfil resultante en la misma sentencia
         update_data["updated_at"] = datetime.now(UTC)
-        await db.execute(update(UserModel).where(UserModel.id == user_id).values(**update_data))
-        await db.commit()
-        await db.refresh(user)
+        result = await db.execute(
+            update(UserModel)
+            .where(UserModel.id == user_id)
+            .values(**update_data)
+            .returning(
+                UserModel.id,
+                UserModel.email,
+                UserModel.full_name,
+                UserModel.bio,
+                UserModel.avatar_url,
+                UserModel.role,
+                UserModel.is_verified,
+                UserModel.status,
+                UserModel.provider,
+                UserModel.updated_at,
+            )
+        )
+        user = result.one_or_none()
+        await release_db(db)
+
+        if not user:
+            raise HTTPException(status_code=404, detail="Usuario no encontrado")
 
         return JSONResponse(
             content={
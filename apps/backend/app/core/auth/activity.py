@@ -0,0 +1,200 @@
+"""
+Escritura diferida (write-behind) de la actividad de los usuarios: `last_login_at` y el estado
+activo/inactivo que cambian login, logout, el intercambio del código temporal y los callbacks OAuth.
+
+Son datos no críticos que antes costaban un UPDATE y un commit en cada petición. Ahora cada
+petición los anota en un hash de Redis (`{user_activity}`, campos `<id>:t` y `<id>:s`) y un worker
+los vuelca cada ACTIVITY_FLUSH_INTERVAL_SECONDS con un único UPDATE ... FROM (VALUES ...) por lote.
+El retraso máximo es ese intervalo; al apagar la aplicación se hace un último volcado.
+
+El volcado nunca cambia el estado de una cuenta suspendida o eliminada: esos estados se escriben
+directamente en la base de datos y tienen prioridad sobre la actividad pendiente. Los endpoints que
+escriben directamente otro estado (revocar todas las sesiones, cambiar la contraseña, verificar el
+email, reactivar la cuenta) descartan antes el estado pendiente del usuario con
+`discard_pending_activity`, para que un volcado posterior no lo sustituya por uno anterior.
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime, UTC
+from secrets import token_hex
+from uuid import UUID
+
+from fastapi import FastAPI
+from redis.asyncio import Redis
+from redis.exceptions import ResponseError
+from sqlalchemy import DateTime, case, cast, column, func, update, values
+from sqlalchemy.dialects.postgresql import UUID as PGUUID
+
+from app.core.config import settings
+from app.core.redis import RedisWorkload, get_redis_client
+from app.core.utils.enums import UserStatus
+from app.core.utils.metrics import metrics
+from app.db.base import AsyncSessionLocal
+from app.db.models.user import User as UserModel
+
+logger = logging.getLogger(__name__)
+
+# Mismo hash tag: RENAME entre ellas es válido también en Redis Cluster
+ACTIVITY_KEY = "{user_activity}"
+FLUSHING_KEY = "{user_activity}:flushing"
+FLUSH_LOCK_KEY = "{user_activity}:lock"
+
+# Libera el lock solo si sigue perteneciendo a este volcado
+RELEASE_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+# Estados que la actividad diferida no puede sobrescribir
+PROTECTED_STATUSES = (UserStatus.SUSPENDED, UserStatus.DELETED)
+
+activity_flushed_total = metrics.counter(
+    "zentora_user_activity_flushed_total", "Usuarios cuya actividad diferida se ha volcado a la base de datos"
+)
+activity_flush_duration_seconds = metrics.histogram(
+    "zentora_user_activity_flush_duration_seconds", "Duración de cada volcado de la actividad diferida"
+)
+
+
+async def record_user_activity(
+    redis: Redis,
+    user_id: UUID | str,
+    status: UserStatus | None = None,
+    last_login_at: datetime | None = None,
+) -> None:
+    """Anota la actividad de un usuario para el próximo volcado (gana el último valor de cada campo)."""
+    mapping = {}
+    if status is not None:
+        mapping[f"{user_id}:s"] = str(status)
+    if last_login_at is not None:
+        mapping[f"{user_id}:t"] = int(last_login_at.timestamp() * 1000)
+    if mapping:
+        await redis.hset(ACTIVITY_KEY, mapping=mapping)
+
+
+async def discard_pending_activity(redis: Redis, user_id: UUID | str, last_login_at: bool = False) -> None:
+    """
+    Descarta el estado pendiente de un usuario (y su `last_login_at` si se indica) porque se va a
+    escribir directamente en la base de datos. También del hash de un volcado en curso o fallido.
+    """
+    fields = [f"{user_id}:s"] + ([f"{user_id}:t"] if last_login_at else [])
+    async with redis.pipeline(transaction=False) as pipe:
+        pipe.hdel(ACTIVITY_KEY, *fields)
+        pipe.hdel(FLUSHING_KEY, *fields)
+        await pipe.execute()
+
+
+def _parse_activity(raw: dict[str, str]) -> list[dict]:
+    pending: dict[str, dict] = {}
+    for field, value in raw.items():
+        user_id, kind = field.rsplit(":", 1)
+        entry = pending.setdefault(user_id, {"id": UUID(user_id), "last_login_at": None, "status": None})
+        if kind == "t":
+            entry["last_login_at"] = datetime.fromtimestamp(int(value) / 1000, UTC)
+        else:
+            entry["status"] = UserStatus(value)
+    return list(pending.values())
+
+
+def activity_update_statement(rows: list[dict]):
+    """UPDATE ... FROM (VALUES ...) de un lote de actividad."""
+    activity = values(
+        column("id", PGUUID(as_uuid=True)),
+        column("last_login_at", DateTime(timezone=True)),
+        column("status", UserModel.status.type),
+        name="activity",
+    ).data([(row["id"], row["last_login_at"], row["status"]) for row in rows])
+
+    return (
+        update(UserModel)
+        .where(UserModel.id == activity.c.id)
+        .values(
+            # Los NULL de VALUES no tienen tipo: se convierten al de la columna destino
+            last_login_at=func.greatest(
+                UserModel.last_login_at, cast(activity.c.last_login_at, DateTime(timezone=True))
+            ),
+            status=case(
+                (UserModel.status.in_(PROTECTED_STATUSES), UserModel.status),
+                else_=func.coalesce(cast(activity.c.status, UserModel.status.type), UserModel.status),
+            ),
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def flush_user_activity(redis: Redis) -> int:
+    """
+    Vuelca la actividad pendiente a la base de datos y retorna el número de usuarios actualizados.
+
+    Solo un worker vuelca a la vez (lock en Redis). El hash pendiente se renombra antes de leerlo,
+    así que lo que llega durante el volcado queda para el siguiente; si el volcado falla, el hash
+    renombrado se conserva y se reintenta primero en el siguiente tick.
+    """
+    token = token_hex(8)
+    if not await redis.set(FLUSH_LOCK_KEY, token, nx=True, px=settings.ACTIVITY_FLUSH_LOCK_SECONDS * 1000):
+        return 0
+
+    started = time.monotonic()
+    flushed = 0
+    try:
+        if not await redis.exists(FLUSHING_KEY):
+            try:
+                await redis.rename(ACTIVITY_KEY, FLUSHING_KEY)
+            except ResponseError:
+                # No hay actividad pendiente
+                return 0
+
+        rows = _parse_activity(await redis.hgetall(FLUSHING_KEY))
+        batch_size = settings.ACTIVITY_FLUSH_BATCH_SIZE
+        async with AsyncSessionLocal() as db:
+            for start in range(0, len(rows), batch_size):
+                batch = rows[start : start + batch_size]
+                await db.execute(activity_update_statement(batch))
+                await db.commit()
+                flushed += len(batch)
+
+        await redis.delete(FLUSHING_KEY)
+    finally:
+        await redis.eval(RELEASE_LOCK_SCRIPT, 1, FLUSH_LOCK_KEY, token)
+
+    activity_flushed_total.inc(flushed)
+    activity_flush_duration_seconds.observe(time.monotonic() - started)
+    if flushed:
+        logger.debug(f"Actividad diferida volcada para {flushed} usuarios")
+    return flushed
+
+
+async def run_activity_flusher(stop: asyncio.Event) -> None:
+    """Worker que vuelca la actividad diferida cada ACTIVITY_FLUSH_INTERVAL_SECONDS."""
+    redis = get_redis_client(RedisWorkload.QUEUES)
+    while not stop.is_set():
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=settings.ACTIVITY_FLUSH_INTERVAL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+        try:
+            await flush_user_activity(redis)
+        except Exception as e:
+            logger.error(f"Error al volcar la actividad diferida de los usuarios: {str(e)}")
+
+
+def init_activity_flusher(app: FastAPI):
+    """Arranca el volcado periódico de la actividad diferida; al apagar hace un último volcado."""
+    stop = asyncio.Event()
+    tasks: list[asyncio.Task] = []
+
+    @app.on_event("startup")
+    async def start_activity_flusher():
+        tasks.append(asyncio.create_task(run_activity_flusher(stop)))
+
+    @app.on_event("shutdown")
+    async def stop_activity_flusher():
+        # El worker hace el último volcado al salir del bucle
+        stop.set()
+        for task in tasks:
+            await task
@@ -0,0 +1,168 @@
+"""
+Lista negra de tokens de acceso con caché local por proceso.
+
+Casi todas las consultas responden "no está en la lista negra", así que cada worker guarda las
+respuestas en un LRU acotado. Las revocaciones se publican en el canal `token_revocations` y
+cada worker las aplica a su caché al recibirlas, de modo que surten efecto en todos los workers
+en milisegundos. Las respuestas negativas además caducan tras DENYLIST_NEGATIVE_TTL_SECONDS por
+si se pierde algún mensaje. Mientras el listener no está suscrito la caché no se usa.
+"""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Callable
+
+from fastapi import FastAPI
+from redis.asyncio import Redis
+
+from app.core.config import settings
+from app.core.redis import RedisWorkload, pubsub_client
+from app.core.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+DENYLIST_KEY_PREFIX = "blacklisted_token:"
+REVOCATION_CHANNEL = "token_revocations"
+DEFAULT_DENY_SECONDS = 3600  # Vida máxima de un token de acceso
+
+denylist_lookups_total = metrics.counter(
+    "zentora_denylist_lookups_total", "Consultas a la lista negra de tokens por origen de la respuesta"
+)
+
+
+class DenylistCache:
+    """LRU acotado de respuestas de la lista negra con caducidad por entrada."""
+
+    def __init__(self, max_entries: int, negative_ttl: float):
+        self.max_entries = max_entries
+        self.negative_ttl = negative_ttl
+        self.enabled = False
+        self._entries: OrderedDict[str, tuple[bool, float]] = OrderedDict()
+
+    def get(self, token: str) -> bool | None:
+        if not self.enabled:
+            return None
+        entry = self._entries.get(token)
+        if entry is None:
+            return None
+        denied, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._entries[token]
+            return None
+        self._entries.move_to_end(token)
+        return denied
+
+    def put(self, token: str, denied: bool, ttl: float | None = None) -> None:
+        if not self.enabled:
+            return
+        # Una respuesta negativa que llega tarde nunca pisa una revocación ya recibida
+        current = self._entries.get(token)
+        if not denied and current is not None and current[0]:
+            return
+        self._entries[token] = (denied, time.monotonic() + (ttl if ttl is not None else self.negative_ttl))
+        self._entries.move_to_end(token)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+denylist_cache = DenylistCache(settings.DENYLIST_CACHE_SIZE, settings.DENYLIST_NEGATIVE_TTL_SECONDS)
+
+# Otros tipos de revocación que viajan por el mismo canal, identificados por prefijo
+_handlers: dict[str, Callable[[str], None]] = {}
+_reset_hooks: list[Callable[[], None]] = []
+
+
+def register_revocation_handler(prefix: str, handler: Callable[[str], None], reset: Callable[[], None]) -> None:
+    """
+    Registra un manejador para los mensajes del canal que empiezan por `prefix`.
+
+    `reset` se llama cada vez que la caché local deja de ser fiable (al suscribirse o al perder
+    la conexión), igual que se vacía la caché de la lista negra.
+    """
+    _handlers[prefix] = handler
+    _reset_hooks.append(reset)
+
+
+def _reset_caches() -> None:
+    denylist_cache.clear()
+    for reset in _reset_hooks:
+        reset()
+
+
+def _apply_message(data: str) -> None:
+    for prefix, handler in _handlers.items():
+        if data.startswith(prefix):
+            handler(data[len(prefix) :])
+            return
+    # Sin prefijo: el mensaje es un token de acceso revocado
+    denylist_cache.put(data, True, DEFAULT_DENY_SECONDS)
+
+
+async def deny_token(redis: Redis, token: str, ttl: int = DEFAULT_DENY_SECONDS) -> None:
+    """Añade un token a la lista negra y avisa a todos los workers."""
+    async with redis.pipeline(transaction=False) as pipe:
+        pipe.set(f"{DENYLIST_KEY_PREFIX}{token}", "true", ex=ttl)
+        pipe.publish(REVOCATION_CHANNEL, token)
+        await pipe.execute()
+    denylist_cache.put(token, True, ttl)
+
+
+async def is_token_denied(redis: Redis, token: str) -> bool:
+    """Consulta la lista negra, resolviendo desde la caché local cuando es posible."""
+    cached = denylist_cache.get(token)
+    if cached is not None:
+        denylist_lookups_total.inc(source="cache")
+        return cached
+
+    denylist_lookups_total.inc(source="redis")
+    denied = bool(await redis.get(f"{DENYLIST_KEY_PREFIX}{token}"))
+    denylist_cache.put(token, denied, DEFAULT_DENY_SECONDS if denied else None)
+    return denied
+
+
+async def run_revocation_listener(stop: asyncio.Event) -> None:
+    """Escucha el canal de revocaciones y aplica cada una a la caché local."""
+    while not stop.is_set():
+        try:
+            async with pubsub_client(RedisWorkload.CACHE) as redis:
+                async with redis.pubsub() as pubsub:
+                    await pubsub.subscribe(REVOCATION_CHANNEL)
+                    # Lo que se cacheó antes de suscribirse pudo perder revocaciones
+                    _reset_caches()
+                    denylist_cache.enabled = True
+                    while not stop.is_set():
+                        message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                        if message and message["type"] == "message":
+                            _apply_message(message["data"])
+        except Exception as e:
+            logger.warning(f"Listener de revocaciones desconectado: {str(e)}")
+        finally:
+            denylist_cache.enabled = False
+            _reset_caches()
+
+        if not stop.is_set():
+            await asyncio.sleep(1)
+
+
+def init_denylist_listener(app: FastAPI):
+    """Arranca el listener de revocaciones junto con la aplicación."""
+    stop = asyncio.Event()
+    tasks: list[asyncio.Task] = []
+
+    @app.on_event("startup")
+    async def start_denylist_listener():
+        tasks.append(asyncio.create_task(run_revocation_listener(stop)))
+
+    @app.on_event("shutdown")
+    async def stop_denylist_listener():
+        stop.set()
+        for task in tasks:
+            await task
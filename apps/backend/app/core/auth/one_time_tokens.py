@@ -0,0 +1,165 @@
+"""
+Almacén unificado de tokens de un solo uso (códigos de verificación, recuperación, códigos
+temporales de OAuth y estados de OAuth).
+
+Cada namespace guarda sus tokens en `namespace:token`; los que limitan intentos usan el
+namespace como hash tag (`{namespace}:token`) para que el token y el contador de intentos
+compartan slot en Redis Cluster (ver `app.core.redis_keys`). La emisión usa SET NX, así que dos
+códigos iguales nunca se pisan, y el consumo es un único script Lua que lee y borra el token
+de forma atómica: dos peticiones concurrentes con el mismo código no pueden consumirlo ambas.
+"""
+
+import json
+import logging
+import secrets
+from datetime import timedelta
+from typing import Any, Callable
+
+from redis.asyncio import Redis
+
+from app.core.config import settings
+from app.core.redis_keys import one_time_token_key, otp_attempts_key
+from app.core.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+MAX_ISSUE_ATTEMPTS = 5
+
+# KEYS: token y, si se limitan intentos, contador de intentos fallidos
+# ARGV: máximo de intentos, ventana del contador en segundos
+# Retorna {1, valor} si se consumió, {0} si no existe y {-1} si el sujeto está bloqueado.
+CONSUME_SCRIPT = """
+local limited = #KEYS > 1
+if limited then
+    local attempts = tonumber(redis.call('GET', KEYS[2]) or '0')
+    if attempts >= tonumber(ARGV[1]) then
+        return {-1}
+    end
+end
+local value = redis.call('GET', KEYS[1])
+if value then
+    redis.call('DEL', KEYS[1])
+    if limited then
+        redis.call('DEL', KEYS[2])
+    end
+    return {1, value}
+end
+if limited then
+    if redis.call('INCR', KEYS[2]) == 1 then
+        redis.call('EXPIRE', KEYS[2], ARGV[2])
+    end
+end
+return {0}
+"""
+
+tokens_issued_total = metrics.counter("zentora_one_time_tokens_issued_total", "Tokens de un solo uso emitidos")
+tokens_consumed_total = metrics.counter(
+    "zentora_one_time_tokens_consumed_total", "Intentos de consumo de tokens de un solo uso por resultado"
+)
+token_issue_collisions_total = metrics.counter(
+    "zentora_one_time_token_issue_collisions_total", "Colisiones al emitir tokens de un solo uso"
+)
+
+
+class TooManyAttemptsError(Exception):
+    """El sujeto superó el máximo de intentos fallidos de consumo en la ventana actual."""
+
+    def __init__(self, namespace: str):
+        super().__init__(f"Demasiados intentos fallidos en {namespace}")
+        self.namespace = namespace
+
+
+def numeric_code(length: int = 6) -> Callable[[], str]:
+    """Generador de códigos numéricos de `length` dígitos."""
+    return lambda: f"{secrets.randbelow(10**length):0{length}d}"
+
+
+def urlsafe_token(nbytes: int = 32) -> Callable[[], str]:
+    """Generador de tokens aleatorios aptos para URLs."""
+    return lambda: secrets.token_urlsafe(nbytes)
+
+
+class OneTimeTokenStore:
+    def __init__(
+        self,
+        namespace: str,
+        ttl: timedelta,
+        generator: Callable[[], str],
+        max_attempts: int | None = None,
+    ):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.generator = generator
+        self.max_attempts = max_attempts
+
+    def key(self, token: str) -> str:
+        return one_time_token_key(self.namespace, token, tagged=self.max_attempts is not None)
+
+    async def issue(self, redis: Redis, value: str | dict[str, Any]) -> str:
+        """Emite un token nuevo asociado a `value` (texto o diccionario serializable a JSON)."""
+        data = json.dumps(value) if isinstance(value, dict) else value
+        for _ in range(MAX_ISSUE_ATTEMPTS):
+            token = self.generator()
+            if await redis.set(self.key(token), data, ex=int(self.ttl.total_seconds()), nx=True):
+                tokens_issued_total.inc(namespace=self.namespace)
+                return token
+            token_issue_collisions_total.inc(namespace=self.namespace)
+        raise RuntimeError(f"No se pudo emitir un token único en {self.namespace}")
+
+    async def consume(self, redis: Redis, token: str, subject: str | None = None) -> str | None:
+        """
+        Consume el token y retorna su valor, o None si no existe o ya se usó.
+
+        Si el namespace limita intentos y se indica `subject` (por ejemplo, la IP del cliente),
+        cada fallo suma un intento y al superar el máximo se lanza TooManyAttemptsError.
+        """
+        keys = [self.key(token)]
+        if self.max_attempts is not None and subject is not None:
+            keys.append(otp_attempts_key(self.namespace, subject))
+        result = await redis.eval(
+            CONSUME_SCRIPT,
+            len(keys),
+            *keys,
+            self.max_attempts or 0,
+            settings.ONE_TIME_TOKEN_ATTEMPT_WINDOW_SECONDS,
+        )
+
+        status = int(result[0])
+        if status == -1:
+            tokens_consumed_total.inc(namespace=self.namespace, result="blocked")
+            raise TooManyAttemptsError(self.namespace)
+        if status == 0:
+            tokens_consumed_total.inc(namespace=self.namespace, result="miss")
+            return None
+
+        tokens_consumed_total.inc(namespace=self.namespace, result="hit")
+        return result[1]
+
+    async def consume_json(self, redis: Redis, token: str, subject: str | None = None) -> dict[str, Any] | None:
+        value = await self.consume(redis, token, subject)
+        return json.loads(value) if value is not None else None
+
+    async def revoke(self, redis: Redis, token: str) -> bool:
+        """Invalida un token sin consumirlo. Retorna True si existía."""
+        return bool(await redis.delete(self.key(token)))
+
+
+email_verification_tokens = OneTimeTokenStore(
+    "email_verification",
+    timedelta(hours=24),
+    numeric_code(6),
+    max_attempts=settings.ONE_TIME_TOKEN_MAX_ATTEMPTS,
+)
+password_reset_tokens = OneTimeTokenStore(
+    "password_reset",
+    timedelta(minutes=15),
+    numeric_code(6),
+    max_attempts=settings.ONE_TIME_TOKEN_MAX_ATTEMPTS,
+)
+temp_auth_codes = OneTimeTokenStore("temp_auth", timedelta(minutes=5), urlsafe_token(32))
+oauth_states = OneTimeTokenStore("oauth_state", timedelta(minutes=10), urlsafe_token(32))
+
+# Namespaces con hash tag, para migrar sus claves del formato anterior
+TAGGED_NAMESPACES = tuple(
+    store.namespace for store in (email_verification_tokens, password_reset_tokens) if store.max_attempts is not None
+)
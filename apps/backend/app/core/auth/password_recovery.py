@@ -1,41 +1,45 @@
-import random
-from datetime import timedelta
 from redis.asyncio import Redis
 
-TOKEN_LENGTH = 6
-TOKEN_EXPIRY = timedelta(minutes=15)  # El token expira en 15 minutos
+from app.core.auth.one_time_tokens import password_reset_tokens
+from app.core.auth.signed_codes import consume_signed_code, issue_signed_code, read_signed_code, state_version
+from app.core.config import settings
 
+TOKEN_EXPIRY = password_reset_tokens.ttl  # El token expira en 15 minutos
+PURPOSE = "password_reset"
 
-async def generate_password_reset_token(redis: Redis, email: str) -> str:
-    """Genera y almacena un código de recuperación de contraseña de 6 dígitos."""
-    # Generar código de 6 dígitos
-    token = "".join(str(random.randint(0, 9)) for _ in range(TOKEN_LENGTH))
 
-    # Almacenar el token en Redis con expiración
-    await redis.set(f"password_reset:{token}", email, ex=int(TOKEN_EXPIRY.total_seconds()))
+async def generate_password_reset_token(redis: Redis, email: str, password_hash: str | None = None) -> str:
+    """
+    Genera un código de recuperación de contraseña.
 
-    return token
+    En modo sin estado (STATELESS_CODES_ENABLED) es un código firmado ligado a la contraseña
+    actual del usuario; si no, un código de 6 dígitos almacenado en Redis.
+    """
+    if settings.STATELESS_CODES_ENABLED:
+        return issue_signed_code(PURPOSE, email, TOKEN_EXPIRY, state_version(password_hash))
+    return await password_reset_tokens.issue(redis, email)
 
 
-async def verify_password_reset_token(redis: Redis, token: str) -> str | None:
+async def consume_password_reset_token(redis: Redis, token: str, subject: str | None = None) -> str | None:
     """
-    Verifica un token de recuperación de contraseña y retorna el email asociado si es válido.
-    Retorna None si el token es inválido o ha expirado.
+    Consume un token de recuperación de contraseña y retorna el email asociado si es válido.
+    Retorna None si el token es inválido, ha expirado o ya se usó.
+
+    Lanza TooManyAttemptsError si `subject` acumula demasiados intentos fallidos.
     """
-    email = await redis.get(f"password_reset:{token}")
-    if email:
-        # No eliminamos el token aquí para permitir la verificación en el endpoint de reset
-        return email.decode() if isinstance(email, bytes) else email
-    return None
+    if settings.STATELESS_CODES_ENABLED:
+        claims = await consume_signed_code(redis, token, PURPOSE)
+        return claims.email if claims else None
+    return await password_reset_tokens.consume(redis, token, subject)
 
 
-async def invalidate_password_reset_token(redis: Redis, token: str) -> bool:
+def password_reset_token_matches(token: str, password_hash: str | None) -> bool:
     """
-    Invalida un token de recuperación de contraseña después de su uso.
-    Retorna True si el token existía y fue invalidado, False en caso contrario.
+    Comprueba que un código firmado se emitió para la contraseña actual del usuario, de modo que
+    cambiar la contraseña invalida todos los códigos pendientes. Los códigos almacenados en Redis
+    no llevan versión y siempre coinciden.
     """
-    key = f"password_reset:{token}"
-    if await redis.exists(key):
-        await redis.delete(key)
+    if not settings.STATELESS_CODES_ENABLED:
         return True
-    return False
+    claims = read_signed_code(token, PURPOSE)
+    return bool(claims) and claims.state_version == state_version(password_hash)
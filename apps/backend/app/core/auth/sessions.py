@@ -0,0 +1,370 @@
+"""
+Sesiones de refresco por dispositivo.
+
+Cada login crea un registro `session:{user_id}:sid` (hash) y lo añade al índice del usuario
+`user_sessions:{user_id}` (sorted set con la expiración de cada sesión, en ms, como score). Todas las
+operaciones que tocan varias claves se hacen con scripts Lua, así que listar, rotar o revocar
+las sesiones de un usuario cuesta un único viaje a Redis. Las claves de un usuario comparten
+hash tag, de modo que en Redis Cluster esos scripts se ejecutan en un único nodo.
+
+El refresh token lleva el `sid` de la sesión y un `jti` que cambia en cada rotación; solo el
+último `jti` emitido es válido.
+
+El hash se guarda en formato compacto: nombres de campo de una letra, fechas como segundos
+epoch y sin `sid` ni `user_id`, que ya están en el nombre de la clave. Con valores de hasta
+64 bytes Redis lo mantiene codificado como listpack. `decode_session` lee también el formato
+anterior (campos con nombre completo y fechas ISO) mientras queden sesiones antiguas.
+"""
+
+import logging
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, UTC
+from secrets import token_urlsafe
+from typing import Any
+from uuid import UUID
+
+from redis.asyncio import Redis
+
+from app.core.auth.security import create_refresh_token
+from app.core.config import settings
+from app.core.redis_keys import (
+    USER_SESSIONS_KEY_PREFIX,
+    legacy_refresh_key,
+    session_key,
+    session_key_prefix,
+    tag_of,
+    user_sessions_key,
+)
+
+logger = logging.getLogger(__name__)
+
+# Los scripts construyen las claves de otras sesiones a partir del prefijo de sesión del usuario,
+# que comparte hash tag (y por tanto slot) con las claves declaradas.
+
+# KEYS: sesión, índice del usuario
+# ARGV: sid, expires_at, ttl, now, max_sesiones, prefijo_sesión, campo1, valor1, ...
+# Retorna la lista de sids desalojados por superar el límite de dispositivos.
+CREATE_SESSION_SCRIPT = """
+local index = KEYS[2]
+local sid, expires_at, ttl, now, max_sessions = ARGV[1], ARGV[2], tonumber(ARGV[3]), ARGV[4], tonumber(ARGV[5])
+redis.call('ZREMRANGEBYSCORE', index, '-inf', now)
+redis.call('HSET', KEYS[1], unpack(ARGV, 7))
+redis.call('EXPIRE', KEYS[1], ttl)
+redis.call('ZADD', index, expires_at, sid)
+redis.call('EXPIRE', index, ttl)
+local evicted = {}
+local excess = redis.call('ZCARD', index) - max_sessions
+if excess > 0 then
+    local oldest = redis.call('ZPOPMIN', index, excess)
+    for i = 1, #oldest, 2 do
+        redis.call('DEL', ARGV[6] .. oldest[i])
+        table.insert(evicted, oldest[i])
+    end
+end
+return evicted
+"""
+
+# KEYS: sesión, índice del usuario
+# ARGV: sid, jti_actual, jti_nuevo, expires_at, ttl, last_used_at (epoch), last_used_at (ISO)
+# Retorna la sesión actualizada, o una lista vacía si el token ya no es el vigente.
+ROTATE_SESSION_SCRIPT = """
+local jti_field, used_field, used_at = 'j', 'l', ARGV[6]
+local current = redis.call('HGET', KEYS[1], 'j')
+if not current then
+    -- Sesión en el formato anterior
+    jti_field, used_field, used_at = 'jti', 'last_used_at', ARGV[7]
+    current = redis.call('HGET', KEYS[1], 'jti')
+end
+if current ~= ARGV[2] then
+    return {}
+end
+local ttl = tonumber(ARGV[5])
+redis.call('HSET', KEYS[1], jti_field, ARGV[3], used_field, used_at)
+redis.call('EXPIRE', KEYS[1], ttl)
+redis.call('ZADD', KEYS[2], ARGV[4], ARGV[1])
+redis.call('EXPIRE', KEYS[2], ttl)
+return redis.call('HGETALL', KEYS[1])
+"""
+
+# KEYS: índice del usuario; ARGV: now, prefijo_sesión
+# Retorna una lista de pares {sid, hash como lista plana campo/valor} de las sesiones vigentes.
+LIST_SESSIONS_SCRIPT = """
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+local sids = redis.call('ZRANGE', KEYS[1], 0, -1)
+local sessions = {}
+for _, sid in ipairs(sids) do
+    local data = redis.call('HGETALL', ARGV[2] .. sid)
+    if #data > 0 then
+        table.insert(sessions, {sid, data})
+    else
+        redis.call('ZREM', KEYS[1], sid)
+    end
+end
+return sessions
+"""
+
+# KEYS: índice del usuario, sesión. Solo elimina la sesión si pertenece al índice del usuario.
+REVOKE_SESSION_SCRIPT = """
+if redis.call('ZREM', KEYS[1], ARGV[1]) == 1 then
+    redis.call('DEL', KEYS[2])
+    return 1
+end
+return 0
+"""
+
+# KEYS: índice del usuario; ARGV: prefijo_sesión. Retorna cuántas sesiones se eliminaron.
+REVOKE_ALL_SESSIONS_SCRIPT = """
+local sids = redis.call('ZRANGE', KEYS[1], 0, -1)
+for _, sid in ipairs(sids) do
+    redis.call('DEL', ARGV[1] .. sid)
+end
+redis.call('DEL', KEYS[1])
+return #sids
+"""
+
+
+# Campo del formato compacto -> campo de la sesión decodificada
+# KEYS: hash de refresco anterior a las sesiones por dispositivo
+# ARGV: refresh token presentado
+# Si el token es el guardado, consume el hash y retorna sus campos; si no, una lista vacía.
+ADOPT_LEGACY_SESSION_SCRIPT = """
+if redis.call('HGET', KEYS[1], 'refresh_token') ~= ARGV[1] then
+    return {}
+end
+local data = redis.call('HGETALL', KEYS[1])
+redis.call('DEL', KEYS[1])
+return data
+"""
+
+COMPACT_FIELDS = {
+    "e": "email",
+    "n": "full_name",
+    "r": "role",
+    "s": "status",
+    "j": "jti",
+    "d": "device",
+    "a": "ip_address",
+    "c": "created_at",
+    "l": "last_used_at",
+}
+TIMESTAMP_FIELDS = ("c", "l")
+# Límite por defecto de hash-max-listpack-value; un valor más largo convierte el hash en hashtable
+MAX_VALUE_BYTES = 64
+
+
+def _fit(value: str | None, max_bytes: int = MAX_VALUE_BYTES) -> str:
+    return (value or "").encode()[:max_bytes].decode(errors="ignore")
+
+
+def encode_session(
+    email: str,
+    full_name: str | None,
+    role: str,
+    status: str,
+    jti: str,
+    device: str | None,
+    ip_address: str | None,
+    created_at: int,
+    last_used_at: int,
+) -> dict[str, str | int]:
+    """Registro compacto de una sesión, listo para HSET."""
+    return {
+        "e": email,
+        "n": full_name or "",
+        "r": str(role),
+        "s": str(status),
+        "j": jti,
+        "d": _fit(device),
+        "a": ip_address or "",
+        "c": created_at,
+        "l": last_used_at,
+    }
+
+
+def decode_session(user_id: UUID | str, sid: str, raw: dict[str, str]) -> dict[str, str]:
+    """
+    Sesión con nombres de campo completos y fechas ISO, en el formato compacto o en el anterior.
+    """
+    if "j" not in raw:
+        # Formato anterior: ya trae sid, user_id y fechas ISO
+        return {"sid": sid, "user_id": str(user_id), **raw}
+
+    data = {"sid": sid, "user_id": str(user_id)}
+    for short, name in COMPACT_FIELDS.items():
+        value = raw.get(short, "")
+        if short in TIMESTAMP_FIELDS and value:
+            value = datetime.fromtimestamp(int(value), UTC).isoformat()
+        data[name] = value
+    return data
+
+
+def _pairs(row: list[str]) -> dict[str, str]:
+    return dict(zip(row[::2], row[1::2]))
+
+
+def _session_ttl() -> int:
+    return settings.REFRESH_TOKEN_EXPIRE_DAYS * 24 * 60 * 60
+
+
+@dataclass(frozen=True)
+class IssuedSession:
+    sid: str
+    refresh_token: str
+    data: dict[str, str] = field(default_factory=dict)
+
+
+async def create_session(
+    redis: Redis,
+    user_id: UUID | str,
+    email: str,
+    full_name: str | None,
+    role: str,
+    status: str,
+    device: str | None = None,
+    ip_address: str | None = None,
+    claims: dict[str, Any] | None = None,
+) -> IssuedSession:
+    """
+    Crea una sesión nueva para un dispositivo y emite su refresh token.
+
+    Si el usuario supera `SESSION_MAX_PER_USER` sesiones, se desalojan las que expiran antes
+    (las usadas hace más tiempo). `claims` se añaden al refresh token (por ejemplo, las épocas).
+    """
+    sid = token_urlsafe(16)
+    jti = token_urlsafe(12)
+    ttl = _session_ttl()
+    now = time.time()
+
+    fields = encode_session(email, full_name, role, status, jti, device, ip_address, int(now), int(now))
+    flat_fields = [item for pair in fields.items() for item in pair]
+
+    evicted = await redis.eval(
+        CREATE_SESSION_SCRIPT,
+        2,
+        session_key(user_id, sid),
+        user_sessions_key(user_id),
+        sid,
+        int((now + ttl) * 1000),
+        ttl,
+        int(now * 1000),
+        settings.SESSION_MAX_PER_USER,
+        session_key_prefix(user_id),
+        *flat_fields,
+    )
+    if evicted:
+        logger.info(f"Se desalojaron {len(evicted)} sesiones antiguas del usuario {user_id}")
+
+    refresh_token = create_refresh_token(
+        {"sub": str(user_id), "type": "refresh", "sid": sid, "jti": jti, **(claims or {})}
+    )
+    data = decode_session(user_id, sid, {k: str(v) for k, v in fields.items()})
+    return IssuedSession(sid=sid, refresh_token=refresh_token, data=data)
+
+
+async def get_session(redis: Redis, user_id: UUID | str, sid: str) -> dict[str, str] | None:
+    raw = await redis.hgetall(session_key(user_id, sid))
+    return decode_session(user_id, sid, raw) if raw else None
+
+
+async def rotate_session(
+    redis: Redis, payload: dict[str, Any], claims: dict[str, Any] | None = None
+) -> IssuedSession | None:
+    """
+    Rota el refresh token de una sesión a partir del payload del token presentado.
+
+    Retorna None si la sesión no existe o si el token ya fue rotado (reutilización). La rotación
+    es O(1): solo toca el hash de la sesión y su entrada en el índice del usuario.
+    """
+    sid, jti, user_id = payload.get("sid"), payload.get("jti"), payload.get("sub")
+    if not sid or not jti or not user_id:
+        return None
+
+    new_jti = token_urlsafe(12)
+    ttl = _session_ttl()
+    now = datetime.now(UTC)
+    row = await redis.eval(
+        ROTATE_SESSION_SCRIPT,
+        2,
+        session_key(user_id, sid),
+        user_sessions_key(user_id),
+        sid,
+        jti,
+        new_jti,
+        int((time.time() + ttl) * 1000),
+        ttl,
+        int(now.timestamp()),
+        now.isoformat(),
+    )
+    if not row:
+        return None
+
+    refresh_token = create_refresh_token(
+        {"sub": str(user_id), "type": "refresh", "sid": sid, "jti": new_jti, **(claims or {})}
+    )
+    return IssuedSession(sid=sid, refresh_token=refresh_token, data=decode_session(user_id, sid, _pairs(row)))
+
+
+async def adopt_legacy_session(
+    redis: Redis,
+    user_id: UUID | str,
+    refresh_token: str,
+    device: str | None = None,
+    ip_address: str | None = None,
+    claims: dict[str, Any] | None = None,
+) -> IssuedSession | None:
+    """
+    Convierte un refresh token emitido antes de las sesiones por dispositivo (sin `sid` ni `jti`,
+    guardado en el hash `refresh_token:<user_id>`) en una sesión nueva.
+
+    Retorna None si el token no es el guardado. El hash se consume en el mismo script que lo
+    compara, así que el token anterior solo sirve una vez.
+    """
+    row = await redis.eval(ADOPT_LEGACY_SESSION_SCRIPT, 1, legacy_refresh_key(user_id), refresh_token)
+    if not row:
+        return None
+    data = _pairs(row)
+    return await create_session(
+        redis,
+        user_id,
+        data["email"],
+        data.get("full_name"),
+        data["role"],
+        data["status"],
+        device=device,
+        ip_address=ip_address,
+        claims=claims,
+    )
+
+
+async def list_user_sessions(redis: Redis, user_id: UUID | str) -> list[dict[str, str]]:
+    """Retorna las sesiones vigentes del usuario, de la que expira antes a la más reciente."""
+    rows = await redis.eval(
+        LIST_SESSIONS_SCRIPT, 1, user_sessions_key(user_id), int(time.time() * 1000), session_key_prefix(user_id)
+    )
+    return [decode_session(user_id, sid, _pairs(row)) for sid, row in rows]
+
+
+async def revoke_session(redis: Redis, user_id: UUID | str, sid: str) -> bool:
+    """Revoca una sesión concreta del usuario. Retorna False si no existía."""
+    removed = await redis.eval(REVOKE_SESSION_SCRIPT, 2, user_sessions_key(user_id), session_key(user_id, sid), sid)
+    return bool(removed)
+
+
+async def revoke_all_user_sessions(redis: Redis, user_id: UUID | str) -> int:
+    """Revoca todas las sesiones del usuario y retorna cuántas había."""
+    return await redis.eval(REVOKE_ALL_SESSIONS_SCRIPT, 1, user_sessions_key(user_id), session_key_prefix(user_id))
+
+
+async def iter_all_sessions(redis: Redis):
+    """
+    Recorre todas las sesiones de todos los usuarios (uso administrativo).
+
+    Es la única operación que recorre todo el keyspace; en Redis Cluster el SCAN visita cada nodo.
+    """
+    async for index_key in redis.scan_iter(f"{USER_SESSIONS_KEY_PREFIX}{{*", count=500):
+        user_id = tag_of(index_key)
+        if not user_id:
+            continue
+        for session in await list_user_sessions(redis, user_id):
+            yield session
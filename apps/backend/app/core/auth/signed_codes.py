@@ -0,0 +1,113 @@
+"""
+Códigos de verificación y recuperación firmados con HMAC (modo sin estado).
+
+Un código es un sobre `base64url(payload).base64url(firma)` donde el payload lleva el propósito,
+el email, la expiración, la versión de estado del usuario y un nonce. Verificarlo solo requiere
+CPU; Redis guarda únicamente los nonces ya usados (`used_code:{propósito}:{nonce}`) hasta que
+el código expira, para que cada código sirva una sola vez.
+"""
+
+import base64
+import hashlib
+import hmac
+import secrets
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+from functools import lru_cache
+
+from redis.asyncio import Redis
+
+from app.core.config import settings
+from app.core.utils.metrics import metrics
+
+SIGNATURE_BYTES = 16
+
+signed_codes_verified_total = metrics.counter(
+    "zentora_signed_codes_verified_total", "Verificaciones de códigos firmados por resultado"
+)
+
+
+@dataclass(frozen=True)
+class SignedCode:
+    purpose: str
+    email: str
+    expires_at: int
+    state_version: str
+    nonce: str
+
+
+@lru_cache()
+def _signing_key() -> bytes:
+    # Clave derivada para no reutilizar directamente la de los JWT
+    return hashlib.sha256(f"{settings.SECRET_KEY}:signed-codes".encode()).digest()
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _sign(payload: bytes) -> bytes:
+    return hmac.new(_signing_key(), payload, hashlib.sha256).digest()[:SIGNATURE_BYTES]
+
+
+def state_version(value: str | None) -> str:
+    """Huella corta de un estado del usuario (por ejemplo, su hash de contraseña)."""
+    return hashlib.sha256((value or "").encode()).hexdigest()[:8]
+
+
+def issue_signed_code(purpose: str, email: str, ttl: timedelta, version: str = "") -> str:
+    """Emite un código firmado para `purpose` que expira tras `ttl`."""
+    expires_at = int(time.time() + ttl.total_seconds())
+    nonce = secrets.token_urlsafe(8)
+    payload = "|".join([purpose, email, str(expires_at), version, nonce]).encode()
+    return f"{_b64encode(payload)}.{_b64encode(_sign(payload))}"
+
+
+def read_signed_code(code: str, purpose: str) -> SignedCode | None:
+    """Valida firma, propósito y expiración sin tocar Redis. Retorna None si el código no es válido."""
+    try:
+        encoded_payload, encoded_signature = code.split(".", 1)
+        payload = _b64decode(encoded_payload)
+        signature = _b64decode(encoded_signature)
+    except (ValueError, TypeError):
+        return None
+
+    if not hmac.compare_digest(signature, _sign(payload)):
+        return None
+
+    try:
+        # El email puede contener "|": se separa el propósito por la izquierda y el resto por la derecha
+        code_purpose, rest = payload.decode().split("|", 1)
+        email, expires_at, version, nonce = rest.rsplit("|", 3)
+        claims = SignedCode(code_purpose, email, int(expires_at), version, nonce)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+    if claims.purpose != purpose or claims.expires_at <= time.time():
+        return None
+    return claims
+
+
+async def consume_signed_code(redis: Redis, code: str, purpose: str) -> SignedCode | None:
+    """
+    Valida el código y lo marca como usado. Retorna None si es inválido, ha expirado o ya se usó.
+
+    El único acceso a Redis es un SET NX del nonce con la vida restante del código.
+    """
+    claims = read_signed_code(code, purpose)
+    if not claims:
+        signed_codes_verified_total.inc(purpose=purpose, result="invalid")
+        return None
+
+    ttl = max(1, claims.expires_at - int(time.time()))
+    if not await redis.set(f"used_code:{purpose}:{claims.nonce}", "1", ex=ttl, nx=True):
+        signed_codes_verified_total.inc(purpose=purpose, result="reused")
+        return None
+
+    signed_codes_verified_total.inc(purpose=purpose, result="valid")
+    return claims
@@ -0,0 +1,179 @@
+"""
+Épocas de tokens: revocación masiva en O(1).
+
+Cada token lleva dos claims: `ver` (el `token_version` del usuario al emitirlo) y `gep` (la época
+global). Un token es válido mientras ambos sean mayores o iguales que los valores actuales, así
+que revocar todos los tokens de un usuario es incrementar su `token_version`, y revocar los de
+todos los usuarios es incrementar la época global.
+
+La columna `users.token_version` es la fuente de verdad; Redis guarda un espejo
+`token_version:{<user_id>}` (con el hash tag del usuario, junto a sus sesiones) durante la vida
+de un refresh token, suficiente porque cualquier token emitido antes de un incremento caduca
+antes que el espejo. Si no hay espejo, no ha habido revocaciones recientes y la versión del token
+no se compara. La época global vive en `token_epoch:global`. Ambos valores se cachean en cada
+worker y se invalidan por el mismo canal de pub/sub que la lista negra, que vive en el pool de
+caché; las claves, en el de sesiones.
+"""
+
+import time
+from collections import OrderedDict
+from typing import Any
+from uuid import UUID
+
+from redis.asyncio import Redis
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.auth.denylist import REVOCATION_CHANNEL, denylist_cache, register_revocation_handler
+from app.core.config import settings
+from app.core.redis import RedisWorkload, get_redis_client
+from app.core.redis_keys import GLOBAL_EPOCH_KEY, token_version_key
+from app.core.utils.metrics import metrics
+from app.db.models.user import User as UserModel
+
+USER_VERSION_MESSAGE = "user_version:"
+GLOBAL_EPOCH_MESSAGE = "global_epoch:"
+
+# Solo sube la versión (nunca la baja) y renueva su vida
+# KEYS: espejo de la versión; ARGV: versión, ttl
+SET_USER_VERSION_SCRIPT = """
+local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+local version = tonumber(ARGV[1])
+if version > current then
+    current = version
+end
+redis.call('SET', KEYS[1], current, 'EX', ARGV[2])
+return current
+"""
+
+token_epoch_lookups_total = metrics.counter(
+    "zentora_token_epoch_lookups_total", "Consultas de épocas de tokens por origen de la respuesta"
+)
+
+
+class EpochCache:
+    """Caché local de versiones por usuario (LRU acotado) y de la época global."""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._versions: OrderedDict[str, tuple[int, float]] = OrderedDict()
+        self._global: tuple[int, float] | None = None
+
+    def get(self, user_id: str) -> tuple[int, int] | None:
+        if not denylist_cache.enabled:
+            return None
+        now = time.monotonic()
+        entry = self._versions.get(user_id)
+        if entry is None or entry[1] <= now or self._global is None or self._global[1] <= now:
+            return None
+        self._versions.move_to_end(user_id)
+        return entry[0], self._global[0]
+
+    def put_user(self, user_id: str, version: int) -> None:
+        if not denylist_cache.enabled:
+            return
+        current = self._versions.get(user_id)
+        if current is not None:
+            version = max(version, current[0])
+        self._versions[user_id] = (version, time.monotonic() + self.ttl)
+        self._versions.move_to_end(user_id)
+        while len(self._versions) > self.max_entries:
+            self._versions.popitem(last=False)
+
+    def put_global(self, epoch: int) -> None:
+        if not denylist_cache.enabled:
+            return
+        if self._global is not None:
+            epoch = max(epoch, self._global[0])
+        self._global = (epoch, time.monotonic() + self.ttl)
+
+    def clear(self) -> None:
+        self._versions.clear()
+        self._global = None
+
+
+epoch_cache = EpochCache(settings.DENYLIST_CACHE_SIZE, settings.DENYLIST_NEGATIVE_TTL_SECONDS)
+
+
+def _on_user_version(data: str) -> None:
+    user_id, version = data.rsplit(":", 1)
+    epoch_cache.put_user(user_id, int(version))
+
+
+def _on_global_epoch(data: str) -> None:
+    epoch_cache.put_global(int(data))
+
+
+register_revocation_handler(USER_VERSION_MESSAGE, _on_user_version, epoch_cache.clear)
+register_revocation_handler(GLOBAL_EPOCH_MESSAGE, _on_global_epoch, epoch_cache.clear)
+
+
+async def get_token_epochs(redis: Redis, user_id: UUID | str) -> tuple[int, int]:
+    """Retorna (token_version del usuario, época global) en una sola consulta cacheada."""
+    user_id = str(user_id)
+    cached = epoch_cache.get(user_id)
+    if cached is not None:
+        token_epoch_lookups_total.inc(source="cache")
+        return cached
+
+    token_epoch_lookups_total.inc(source="redis")
+    # Las dos claves están en slots distintos: un pipeline en lugar de MGET, que en Redis Cluster
+    # exige que todas compartan slot (sigue siendo un único viaje con un nodo único)
+    async with redis.pipeline(transaction=False) as pipe:
+        pipe.get(token_version_key(user_id))
+        pipe.get(GLOBAL_EPOCH_KEY)
+        version, epoch = await pipe.execute()
+    version, epoch = int(version or 0), int(epoch or 0)
+    epoch_cache.put_user(user_id, version)
+    epoch_cache.put_global(epoch)
+    return version, epoch
+
+
+async def epoch_claims(redis: Redis, user_id: UUID | str, token_version: int | None) -> dict[str, int]:
+    """Claims `ver` y `gep` para un token nuevo del usuario."""
+    version, epoch = await get_token_epochs(redis, user_id)
+    return {"ver": max(token_version or 0, version), "gep": epoch}
+
+
+async def token_epochs_valid(redis: Redis, payload: dict[str, Any]) -> bool:
+    """Comprueba que un token no fue emitido antes de la última revocación de su usuario o global."""
+    user_id = payload.get("sub")
+    if not user_id:
+        return False
+    version, epoch = await get_token_epochs(redis, user_id)
+    return int(payload.get("ver", 0)) >= version and int(payload.get("gep", 0)) >= epoch
+
+
+async def bump_token_version(db: AsyncSession, user_id: UUID | str) -> int:
+    """
+    Incrementa `token_version` del usuario dentro de la transacción actual y retorna el nuevo valor.
+
+    No hace commit; tras confirmarlo hay que llamar a `publish_token_version`.
+    """
+    result = await db.execute(
+        update(UserModel)
+        .where(UserModel.id == UUID(str(user_id)))
+        .values(token_version=UserModel.token_version + 1)
+        .returning(UserModel.token_version)
+    )
+    return result.scalar_one()
+
+
+async def publish_token_version(redis: Redis, user_id: UUID | str, version: int) -> int:
+    """Actualiza el espejo en Redis y avisa a los workers. Es idempotente y nunca baja la versión."""
+    ttl = settings.REFRESH_TOKEN_EXPIRE_DAYS * 24 * 60 * 60
+    current = await redis.eval(SET_USER_VERSION_SCRIPT, 1, token_version_key(user_id), version, ttl)
+    await get_redis_client(RedisWorkload.CACHE).publish(
+        REVOCATION_CHANNEL, f"{USER_VERSION_MESSAGE}{user_id}:{int(current)}"
+    )
+    epoch_cache.put_user(str(user_id), int(current))
+    return int(current)
+
+
+async def bump_global_epoch(redis: Redis) -> int:
+    """Revoca todos los tokens emitidos hasta ahora, de todos los usuarios."""
+    epoch = await redis.incr(GLOBAL_EPOCH_KEY)
+    await get_redis_client(RedisWorkload.CACHE).publish(REVOCATION_CHANNEL, f"{GLOBAL_EPOCH_MESSAGE}{epoch}")
+    epoch_cache.put_global(int(epoch))
+    return int(epoch)
@@ -29,6 +29,15 @@ class Settings(BaseSettings):
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     REFRESH_TOKEN_EXPIRE_DAYS: int = 7
     ALGORITHM: str = "HS256"
+    SESSION_MAX_PER_USER: int = int(os.getenv("SESSION_MAX_PER_USER", "10"))  # Dispositivos por usuario
+    # Intentos fallidos permitidos por cliente al canjear códigos de verificación y recuperación
+    ONE_TIME_TOKEN_MAX_ATTEMPTS: int = int(os.getenv("ONE_TIME_TOKEN_MAX_ATTEMPTS", "10"))
+    ONE_TIME_TOKEN_ATTEMPT_WINDOW_SECONDS: int = int(os.getenv("ONE_TIME_TOKEN_ATTEMPT_WINDOW_SECONDS", "900"))
+    # Caché local de la lista negra de tokens (invalidada por pub/sub)
+    DENYLIST_CACHE_SIZE: int = int(os.getenv("DENYLIST_CACHE_SIZE", "10000"))
+    DENYLIST_NEGATIVE_TTL_SECONDS: float = float(os.getenv("DENYLIST_NEGATIVE_TTL_SECONDS", "10"))
+    # Códigos de verificación y recuperación firmados con HMAC en lugar de almacenados en Redis
+    STATELESS_CODES_ENABLED: bool = os.getenv("STATELESS_CODES_ENABLED", "false").lower() == "true"
 
     # Database
     POSTGRES_SERVER: str = os.getenv("POSTGRES_SERVER", "localhost")
@@ -37,6 +46,16 @@ class Settings(BaseSettings):
     POSTGRES_DB: str = os.getenv("POSTGRES_DB", "zentora_db")
     POSTGRES_PORT: str = os.getenv("POSTGRES_PORT", "5432")
     DATABASE_URL: Optional[str] = os.getenv("DATABASE_URL")  # Permitir DATABASE_URL como alternativa
+    # Cachés de sentencias: SQL compilado por SQLAlchemy (por engine) y sentencias preparadas de
+    # asyncpg (por conexión; 0 las desactiva, necesario detrás de PgBouncer en modo transacción)
+    DB_COMPILED_CACHE_SIZE: int = int(os.getenv("DB_COMPILED_CACHE_SIZE", "500"))
+    DB_PREPARED_STATEMENT_CACHE_SIZE: int = int(os.getenv("DB_PREPARED_STATEMENT_CACHE_SIZE", "100"))
+    # Pool de conexiones a Postgres; las sesiones solo retienen una conexión durante su transacción
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+    # Tope de la búsqueda de usuarios del panel de administración; una búsqueda más lenta se cancela
+    USER_SEARCH_STATEMENT_TIMEOUT_MS: int = int(os.getenv("USER_SEARCH_STATEMENT_TIMEOUT_MS", "2000"))
 
     # Redis
     REDIS_HOST: str = os.getenv("REDIS_HOST", "localhost")
@@ -44,6 +63,21 @@ class Settings(BaseSettings):
     REDIS_DB: int = int(os.getenv("REDIS_DB", "0"))
     REDIS_PASSWORD: Optional[str] = os.getenv("REDIS_PASSWORD")
     REDIS_URL: Optional[str] = os.getenv("REDIS_URL")  # Permitir REDIS_URL como alternativa
+    # Topología: "standalone", "sentinel" (REDIS_SENTINELS="host:puerto,..." y el nombre del
+    # servicio en REDIS_SENTINEL_SERVICE) o "cluster" (REDIS_URL apunta a cualquier nodo)
+    REDIS_MODE: str = os.getenv("REDIS_MODE", "standalone")
+    REDIS_SENTINELS: str = os.getenv("REDIS_SENTINELS", "")
+    REDIS_SENTINEL_SERVICE: str = os.getenv("REDIS_SENTINEL_SERVICE", "mymaster")
+    # Valores por defecto de los pools por carga; cada uno se puede sobrescribir con
+    # REDIS_{SESSIONS|CACHE|EPHEMERAL|QUEUES}_{OPCIÓN}, por ejemplo REDIS_CACHE_URL
+    REDIS_MAX_CONNECTIONS: int = int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))
+    REDIS_POOL_TIMEOUT: float = float(os.getenv("REDIS_POOL_TIMEOUT", "5"))
+    REDIS_SOCKET_TIMEOUT: float = float(os.getenv("REDIS_SOCKET_TIMEOUT", "2"))
+    REDIS_CONNECT_TIMEOUT: float = float(os.getenv("REDIS_CONNECT_TIMEOUT", "2"))
+    REDIS_HEALTH_CHECK_INTERVAL: int = int(os.getenv("REDIS_HEALTH_CHECK_INTERVAL", "30"))
+    REDIS_RETRY_ATTEMPTS: int = int(os.getenv("REDIS_RETRY_ATTEMPTS", "3"))
+    REDIS_RETRY_BACKOFF_BASE: float = float(os.getenv("REDIS_RETRY_BACKOFF_BASE", "0.01"))
+    REDIS_RETRY_BACKOFF_CAP: float = float(os.getenv("REDIS_RETRY_BACKOFF_CAP", "0.5"))
 
     # CORS
     BACKEND_CORS_ORIGINS: List[str] = ["http://localhost:3000"]
@@ -59,6 +93,15 @@ class Settings(BaseSettings):
     # Email Settings (Brevo)
     BREVO_API_KEY: str = os.getenv("BREVO_API_KEY", "")
     BREVO_SENDER_EMAIL: str = os.getenv("BREVO_SENDER_EMAIL", "")
+    BREVO_API_URL: str = os.getenv("BREVO_API_URL", "https://api.brevo.com/v3")
+    BREVO_RATE_LIMIT_PER_SECOND: float = float(os.getenv("BREVO_RATE_LIMIT_PER_SECOND", "10"))
+    BREVO_RATE_LIMIT_BURST: int = int(os.getenv("BREVO_RATE_LIMIT_BURST", "20"))
+    BREVO_MAX_CONNECTIONS: int = int(os.getenv("BREVO_MAX_CONNECTIONS", "20"))
+    BREVO_TIMEOUT_SECONDS: float = float(os.getenv("BREVO_TIMEOUT_SECONDS", "10"))
+    BREVO_MAX_RETRIES: int = int(os.getenv("BREVO_MAX_RETRIES", "3"))
+    BREVO_BATCH_SIZE: int = int(os.getenv("BREVO_BATCH_SIZE", "100"))
+    BREVO_CIRCUIT_FAILURE_THRESHOLD: int = int(os.getenv("BREVO_CIRCUIT_FAILURE_THRESHOLD", "5"))
+    BREVO_CIRCUIT_RESET_SECONDS: float = float(os.getenv("BREVO_CIRCUIT_RESET_SECONDS", "30"))
 
     # Email
     MAIL_USERNAME: str = os.getenv("MAIL_USERNAME", "")
@@ -71,8 +114,40 @@ class Settings(BaseSettings):
     MAIL_SSL_TLS: bool = False
     MAIL_USE_CREDENTIALS: bool = True
     MAIL_VALIDATE_CERTS: bool = True
+    MAIL_POOL_SIZE: int = int(os.getenv("MAIL_POOL_SIZE", "4"))
+    MAIL_MAX_MESSAGES_PER_CONNECTION: int = int(os.getenv("MAIL_MAX_MESSAGES_PER_CONNECTION", "100"))
+    MAIL_IDLE_TIMEOUT_SECONDS: float = float(os.getenv("MAIL_IDLE_TIMEOUT_SECONDS", "60"))
+    MAIL_TIMEOUT_SECONDS: float = float(os.getenv("MAIL_TIMEOUT_SECONDS", "10"))
     EMAIL_TEMPLATES_DIR: str = "app/email-templates"
 
+    # Enrutamiento de correo entre transportes (brevo, smtp)
+    EMAIL_TRANSPORTS: str = os.getenv("EMAIL_TRANSPORTS", "brevo,smtp")  # En orden de preferencia
+    EMAIL_ROUTING_MODE: str = os.getenv("EMAIL_ROUTING_MODE", "failover")  # failover | split
+    EMAIL_ROUTER_MAX_ERROR_RATE: float = float(os.getenv("EMAIL_ROUTER_MAX_ERROR_RATE", "0.5"))
+    EMAIL_ROUTER_MAX_LATENCY_SECONDS: float = float(os.getenv("EMAIL_ROUTER_MAX_LATENCY_SECONDS", "5"))
+
+    # Outbox de eventos de dominio
+    OUTBOX_BATCH_SIZE: int = int(os.getenv("OUTBOX_BATCH_SIZE", "100"))
+    OUTBOX_POLL_INTERVAL_SECONDS: float = float(os.getenv("OUTBOX_POLL_INTERVAL_SECONDS", "1"))
+    OUTBOX_MAX_ATTEMPTS: int = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "10"))
+    # Tiempo que un relay se reserva los eventos que ha reclamado antes de que otro pueda reintentarlos
+    OUTBOX_CLAIM_LEASE_SECONDS: int = int(os.getenv("OUTBOX_CLAIM_LEASE_SECONDS", "300"))
+    # Margen antes del fin del lease a partir del cual el relay deja de entregar y libera el resto del lote
+    OUTBOX_LEASE_MARGIN_SECONDS: int = int(os.getenv("OUTBOX_LEASE_MARGIN_SECONDS", "60"))
+
+    # Expiración continua de usuarios no verificados
+    UNVERIFIED_EXPIRY_TICK_SECONDS: float = float(os.getenv("UNVERIFIED_EXPIRY_TICK_SECONDS", "5"))
+    UNVERIFIED_EXPIRY_BATCH_SIZE: int = int(os.getenv("UNVERIFIED_EXPIRY_BATCH_SIZE", "50"))
+    UNVERIFIED_EXPIRY_MAX_BATCHES_PER_TICK: int = int(os.getenv("UNVERIFIED_EXPIRY_MAX_BATCHES_PER_TICK", "4"))
+
+    # Actividad diferida de los usuarios (last_login_at y estado activo/inactivo)
+    ACTIVITY_FLUSH_INTERVAL_SECONDS: float = float(os.getenv("ACTIVITY_FLUSH_INTERVAL_SECONDS", "5"))
+    ACTIVITY_FLUSH_BATCH_SIZE: int = int(os.getenv("ACTIVITY_FLUSH_BATCH_SIZE", "1000"))
+    ACTIVITY_FLUSH_LOCK_SECONDS: int = int(os.getenv("ACTIVITY_FLUSH_LOCK_SECONDS", "60"))
+
+    # Tareas programadas (los shards reparten los usuarios por hash del id, ver JobShard)
+    CLEANUP_UNVERIFIED_SHARDS: int = int(os.getenv("CLEANUP_UNVERIFIED_SHARDS", "8"))
+
     # Frontend URL
     FRONTEND_URL: str = os.getenv("FRONTEND_URL", "http://localhost:3000")
 
@@ -120,6 +195,39 @@ class Settings(BaseSettings):
         # Construir la URL a partir de los componentes
         return f"postgresql+asyncpg://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}@{self.POSTGRES_SERVER}:{self.POSTGRES_PORT}/{self.POSTGRES_DB}"
 
+    @property
+    def sync_database_url(self) -> str:
+        """URL de conexión síncrona (psycopg2), usada por Alembic y los scripts de mantenimiento."""
+        return self.async_database_url.replace("postgresql+asyncpg://", "postgresql://")
+
+    @property
+    def email_transports(self) -> List[str]:
+        """Lista de transportes de correo habilitados, en orden de preferencia."""
+        return [i.strip().lower() for i in self.EMAIL_TRANSPORTS.split(",") if i.strip()]
+
+    def redis_workload_config(self, workload: str) -> Dict[str, Any]:
+        """Configuración del pool de Redis de una carga (sessions, cache, ephemeral, queues)."""
+        prefix = f"REDIS_{workload.upper()}_"
+
+        def option(name: str, default: Any, cast):
+            value = os.getenv(f"{prefix}{name}")
+            return cast(value) if value is not None else default
+
+        return {
+            "mode": option("MODE", self.REDIS_MODE, str).lower(),
+            "sentinels": option("SENTINELS", self.REDIS_SENTINELS, str),
+            "sentinel_service": option("SENTINEL_SERVICE", self.REDIS_SENTINEL_SERVICE, str),
+            "url": option("URL", self.get_redis_url, str),
+            "max_connections": option("MAX_CONNECTIONS", self.REDIS_MAX_CONNECTIONS, int),
+            "pool_timeout": option("POOL_TIMEOUT", self.REDIS_POOL_TIMEOUT, float),
+            "socket_timeout": option("SOCKET_TIMEOUT", self.REDIS_SOCKET_TIMEOUT, float),
+            "connect_timeout": option("CONNECT_TIMEOUT", self.REDIS_CONNECT_TIMEOUT, float),
+            "health_check_interval": option("HEALTH_CHECK_INTERVAL", self.REDIS_HEALTH_CHECK_INTERVAL, int),
+            "retry_attempts": option("RETRY_ATTEMPTS", self.REDIS_RETRY_ATTEMPTS, int),
+            "retry_backoff_base": option("RETRY_BACKOFF_BASE", self.REDIS_RETRY_BACKOFF_BASE, float),
+            "retry_backoff_cap": option("RETRY_BACKOFF_CAP", self.REDIS_RETRY_BACKOFF_CAP, float),
+        }
+
     @property
     def get_redis_url(self) -> str:
         """Construye la URL de conexión a Redis."""
@@ -0,0 +1,190 @@
+import asyncio
+import logging
+import random
+from functools import lru_cache
+from typing import Any, Sequence
+
+import httpx
+
+from app.core.config import settings
+from app.core.email.transport import CircuitOpenError, EmailDeliveryError, EmailMessage
+from app.core.utils.resilience import CircuitBreaker, TokenBucket
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS_CODES = {408, 425, 429, 500, 502, 503, 504}
+
+
+def is_retryable_status(status_code: int) -> bool:
+    """Clasifica un código de estado HTTP de Brevo como transitorio o definitivo."""
+    return status_code in RETRYABLE_STATUS_CODES or status_code >= 500
+
+
+def _retry_after_seconds(response: httpx.Response) -> float | None:
+    """Extrae el tiempo de espera sugerido por Brevo en una respuesta 429."""
+    for header in ("Retry-After", "x-sib-ratelimit-reset"):
+        value = response.headers.get(header)
+        if value:
+            try:
+                return max(float(value), 0.0)
+            except ValueError:
+                continue
+    return None
+
+
+class BrevoTransport:
+    """
+    Transporte asíncrono para la API transaccional de Brevo.
+
+    Usa un único `httpx.AsyncClient` con pool de conexiones keep-alive, un token bucket que
+    respeta los límites de tasa del plan, reintentos con backoff exponencial para errores
+    transitorios y un circuit breaker que deja de llamar al proveedor durante una caída.
+    """
+
+    name = "brevo"
+
+    def __init__(
+        self,
+        api_key: str,
+        sender_email: str,
+        sender_name: str,
+        base_url: str,
+        rate_per_second: float,
+        burst: int,
+        max_connections: int = 20,
+        timeout: float = 10.0,
+        max_retries: int = 3,
+        batch_size: int = 100,
+        breaker: CircuitBreaker | None = None,
+        http_transport: httpx.AsyncBaseTransport | None = None,
+    ):
+        self.sender = {"name": sender_name, "email": sender_email}
+        self.max_retries = max_retries
+        self.batch_size = batch_size
+        self.rate_limiter = TokenBucket(rate=rate_per_second, capacity=burst)
+        self.breaker = breaker or CircuitBreaker()
+        self._client = httpx.AsyncClient(
+            base_url=base_url,
+            headers={"api-key": api_key, "accept": "application/json"},
+            timeout=httpx.Timeout(timeout),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            transport=http_transport,
+        )
+
+    async def send(self, message: EmailMessage) -> str | None:
+        """Envía un correo y retorna el messageId asignado por Brevo."""
+        payload = {
+            "sender": self.sender,
+            "to": [{"email": message.email_to}],
+            "subject": message.subject,
+            "htmlContent": message.html_content,
+        }
+        data = await self._post_with_retries(payload)
+        return data.get("messageId")
+
+    async def send_batch(self, messages: Sequence[EmailMessage]) -> list[str]:
+        """
+        Envía varios correos agrupándolos en llamadas con `messageVersions`.
+
+        Cada llamada incluye hasta `batch_size` versiones, de modo que N correos cuestan
+        ceil(N / batch_size) peticiones HTTP y tokens del rate limiter en lugar de N.
+        """
+        message_ids: list[str] = []
+        for start in range(0, len(messages), self.batch_size):
+            chunk = messages[start : start + self.batch_size]
+            if len(chunk) == 1:
+                message_id = await self.send(chunk[0])
+                if message_id:
+                    message_ids.append(message_id)
+                continue
+
+            payload = {
+                "sender": self.sender,
+                "subject": chunk[0].subject,
+                "htmlContent": chunk[0].html_content,
+                "messageVersions": [
+                    {
+                        "to": [{"email": message.email_to}],
+                        "subject": message.subject,
+                        "htmlContent": message.html_content,
+                    }
+                    for message in chunk
+                ],
+            }
+            data = await self._post_with_retries(payload)
+            message_ids.extend(data.get("messageIds", []))
+        return message_ids
+
+    async def _post_with_retries(self, payload: dict[str, Any]) -> dict[str, Any]:
+        attempt = 0
+        while True:
+            try:
+                return await self._post(payload)
+            except EmailDeliveryError as e:
+                if not e.retryable or isinstance(e, CircuitOpenError) or attempt >= self.max_retries:
+                    raise
+                delay = min(2**attempt * 0.5, 8.0) * (0.5 + random.random())
+                logger.warning(f"Error transitorio de Brevo ({e}); reintento {attempt + 1} en {delay:.2f}s")
+                await asyncio.sleep(delay)
+                attempt += 1
+
+    async def _post(self, payload: dict[str, Any]) -> dict[str, Any]:
+        with self.breaker.guard() as allowed:
+            if not allowed:
+                raise CircuitOpenError(self.name)
+            return await self._post_guarded(payload)
+
+    async def _post_guarded(self, payload: dict[str, Any]) -> dict[str, Any]:
+        await self.rate_limiter.acquire()
+
+        try:
+            response = await self._client.post("/smtp/email", json=payload)
+        except httpx.TransportError as e:
+            self.breaker.record_failure()
+            raise EmailDeliveryError(f"Error de red al contactar con Brevo: {str(e)}", retryable=True) from e
+
+        if response.status_code < 400:
+            self.breaker.record_success()
+            return response.json() if response.content else {}
+
+        retryable = is_retryable_status(response.status_code)
+        if response.status_code == 429:
+            retry_after = _retry_after_seconds(response)
+            if retry_after:
+                self.rate_limiter.penalize(retry_after)
+
+        # Solo los fallos del proveedor cuentan para el circuito; un 4xx o un 429 indican que Brevo responde
+        if retryable and response.status_code != 429:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+
+        raise EmailDeliveryError(
+            f"Brevo respondió {response.status_code}: {response.text}",
+            retryable=retryable,
+            status_code=response.status_code,
+        )
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+
+@lru_cache()
+def get_brevo_transport() -> BrevoTransport:
+    """Retorna la instancia compartida del transporte de Brevo para este proceso."""
+    return BrevoTransport(
+        api_key=settings.BREVO_API_KEY,
+        sender_email=settings.BREVO_SENDER_EMAIL,
+        sender_name=settings.PROJECT_NAME,
+        base_url=settings.BREVO_API_URL,
+        rate_per_second=settings.BREVO_RATE_LIMIT_PER_SECOND,
+        burst=settings.BREVO_RATE_LIMIT_BURST,
+        max_connections=settings.BREVO_MAX_CONNECTIONS,
+        timeout=settings.BREVO_TIMEOUT_SECONDS,
+        max_retries=settings.BREVO_MAX_RETRIES,
+        batch_size=settings.BREVO_BATCH_SIZE,
+        breaker=CircuitBreaker(
+            failure_threshold=settings.BREVO_CIRCUIT_FAILURE_THRESHOLD,
+            reset_timeout=settings.BREVO_CIRCUIT_RESET_SECONDS,
+        ),
+    )
@@ -1,36 +1,37 @@
-import sib_api_v3_sdk
-from sib_api_v3_sdk.rest import ApiException
-from pydantic import EmailStr
 from app.core.config import settings
 import logging
 from fastapi import HTTPException
-from typing import Any, Dict
-import os
+from typing import Any, Dict, Sequence
 import jinja2
-from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.db.models.user import User as UserModel
+from app.db.queries import get_user_record_by_email
+from app.core.email.router import get_email_router
+from app.core.email.transport import EmailDeliveryError, EmailMessage
 
 # Configurar logging con más detalle
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
-# Configurar el cliente de Brevo
-configuration = sib_api_v3_sdk.Configuration()
-configuration.api_key["api-key"] = settings.BREVO_API_KEY
-
-try:
-    api_instance = sib_api_v3_sdk.TransactionalEmailsApi(sib_api_v3_sdk.ApiClient(configuration))
-    logger.info("Cliente de Brevo API inicializado correctamente")
-except Exception as e:
-    logger.error(f"Error al inicializar el cliente de Brevo API: {str(e)}")
-    raise
-
 # Configurar Jinja2 para las plantillas
 template_loader = jinja2.FileSystemLoader(settings.EMAIL_TEMPLATES_DIR)
 template_env = jinja2.Environment(loader=template_loader)
 
 
+def render_email(
+    email_to: str,
+    subject: str,
+    body: str,
+    template_name: str | None = None,
+    template_body: Dict[str, Any] | None = None,
+) -> EmailMessage:
+    """Renderiza el contenido HTML de un correo a partir del cuerpo o de un template."""
+    html_content = body
+    if template_name and template_body:
+        template = template_env.get_template(template_name)
+        html_content = template.render(**template_body)
+    return EmailMessage(email_to=email_to, subject=subject, html_content=html_content)
+
+
 async def send_email(
     email_to: str,
     subject: str,
@@ -39,7 +40,7 @@ async def send_email(
     template_body: Dict[str, Any] | None = None,
 ) -> None:
     """
-    Envía un correo electrónico usando la API de Brevo.
+    Envía un correo electrónico usando el transporte disponible (Brevo o SMTP).
 
     Args:
         email_to: Dirección de correo del destinatario
@@ -49,34 +50,43 @@ async def send_email(
         template_body: Datos para el template (opcional)
     """
     try:
-        # Preparar el contenido HTML
-        html_content = body
-        if template_name and template_body:
-            template = template_env.get_template(template_name)
-            html_content = template.render(**template_body)
-
-        # Crear el objeto de envío de correo
-        send_smtp_email = sib_api_v3_sdk.SendSmtpEmail(
-            to=[{"email": email_to}],
-            html_content=html_content,
-            sender={"name": settings.PROJECT_NAME, "email": settings.BREVO_SENDER_EMAIL},
-            subject=subject,
-        )
+        message = render_email(email_to, subject, body, template_name, template_body)
 
         # Enviar el correo
-        api_response = api_instance.send_transac_email(send_smtp_email)
+        message_id = await get_email_router().send(message)
         logger.info(f"Correo enviado exitosamente a {email_to}")
-        logger.debug(f"Respuesta de Brevo API: {api_response}")
+        logger.debug(f"Identificador del envío: {message_id}")
 
-    except ApiException as e:
-        logger.error(f"Error de Brevo API al enviar correo: {str(e)}")
+    except EmailDeliveryError as e:
+        logger.error(f"Error del proveedor de correo al enviar correo: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error al enviar el correo: {str(e)}")
     except Exception as e:
         logger.error(f"Error inesperado al enviar correo: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error inesperado al enviar el correo: {str(e)}")
 
 
-async def send_verification_email(email_to: str, token: str, db: AsyncSession | None = None) -> None:
+async def send_email_batch(messages: Sequence[EmailMessage]) -> list[str]:
+    """
+    Envía varios correos ya renderizados en el menor número posible de llamadas al proveedor.
+
+    Args:
+        messages: Correos a enviar
+
+    Returns:
+        list[str]: Identificadores de los envíos
+    """
+    try:
+        message_ids = await get_email_router().send_batch(messages)
+        logger.info(f"Lote de {len(messages)} correos enviado exitosamente")
+        return message_ids
+    except EmailDeliveryError as e:
+        logger.error(f"Error del proveedor de correo al enviar lote de correos: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error al enviar los correos: {str(e)}")
+
+
+async def send_verification_email(
+    email_to: str, token: str, db: AsyncSession | None = None, full_name: str | None = None
+) -> None:
     """
     Envía un correo de verificación.
 
@@ -84,17 +94,21 @@ async def send_verification_email(email_to: str, token: str, db: AsyncSession |
         email_to: Dirección de correo del destinatario
         token: Token de verificación
         db: Sesión de base de datos (opcional)
+        full_name: Nombre del destinatario (opcional, evita la consulta a la base de datos)
     """
-    # Intentar obtener el nombre completo de la base de datos
-    full_name = email_to.split("@")[0]  # Valor por defecto
-    logger.debug(f"Valor por defecto de full_name: {full_name}")
+    if full_name:
+        logger.debug(f"Usando nombre completo proporcionado: {full_name}")
+        db = None  # No hace falta consultar la base de datos
+    else:
+        # Intentar obtener el nombre completo de la base de datos
+        full_name = email_to.split("@")[0]  # Valor por defecto
+        logger.debug(f"Valor por defecto de full_name: {full_name}")
 
     if db:
         logger.debug("Sesión de base de datos proporcionada, intentando obtener nombre completo")
         try:
-            result = await db.execute(select(UserModel).where(UserModel.email == email_to))
-            user = result.scalar_one_or_none()
-            logger.debug(f"Usuario encontrado: {user}")
+            user = await get_user_record_by_email(db, email_to)
+            logger.debug(f"Usuario encontrado: {user.id if user else None}")
             if user:
                 logger.debug(f"Nombre completo del usuario en DB: {user.full_name}")
 
@@ -127,7 +141,9 @@ async def send_verification_email(email_to: str, token: str, db: AsyncSession |
     )
 
 
-async def send_password_reset_email(email_to: str, token: str, db: AsyncSession | None = None) -> None:
+async def send_password_reset_email(
+    email_to: str, token: str, db: AsyncSession | None = None, full_name: str | None = None
+) -> None:
     """
     Envía un correo para restablecer la contraseña.
 
@@ -135,17 +151,21 @@ async def send_password_reset_email(email_to: str, token: str, db: AsyncSession
         email_to: Dirección de correo del destinatario
         token: Token de restablecimiento
         db: Sesión de base de datos (opcional)
+        full_name: Nombre del destinatario (opcional, evita la consulta a la base de datos)
     """
-    # Intentar obtener el nombre completo de la base de datos
-    full_name = email_to.split("@")[0]  # Valor por defecto
-    logger.debug(f"Valor por defecto de full_name: {full_name}")
+    if full_name:
+        logger.debug(f"Usando nombre completo proporcionado: {full_name}")
+        db = None  # No hace falta consultar la base de datos
+    else:
+        # Intentar obtener el nombre completo de la base de datos
+        full_name = email_to.split("@")[0]  # Valor por defecto
+        logger.debug(f"Valor por defecto de full_name: {full_name}")
 
     if db:
         logger.debug("Sesión de base de datos proporcionada, intentando obtener nombre completo")
         try:
-            result = await db.execute(select(UserModel).where(UserModel.email == email_to))
-            user = result.scalar_one_or_none()
-            logger.debug(f"Usuario encontrado: {user}")
+            user = await get_user_record_by_email(db, email_to)
+            logger.debug(f"Usuario encontrado: {user.id if user else None}")
             if user:
                 logger.debug(f"Nombre completo del usuario en DB: {user.full_name}")
 
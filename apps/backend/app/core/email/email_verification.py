@@ -1,62 +1,187 @@
-import random
-from datetime import timedelta
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, UTC
+from uuid import UUID
+from fastapi import FastAPI
 from redis.asyncio import Redis
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, delete
+from sqlalchemy import ColumnElement, delete
+from app.core.auth.one_time_tokens import email_verification_tokens
+from app.core.auth.signed_codes import consume_signed_code, issue_signed_code
+from app.core.config import settings
+from app.core.redis import get_queue_redis
+from app.core.utils.metrics import metrics
+from app.db.base import AsyncSessionLocal
 from app.db.models.user import User as UserModel
 
-TOKEN_LENGTH = 6
-TOKEN_EXPIRY = timedelta(hours=24)  # El token expira en 24 horas
+logger = logging.getLogger(__name__)
+
+TOKEN_EXPIRY = email_verification_tokens.ttl  # El token expira en 24 horas
+VERIFICATION_PURPOSE = "email_verification"
 VERIFICATION_WINDOW = timedelta(hours=24)  # Ventana de tiempo para verificar el email
 
+# Cola de expiración: sorted set con score = instante en que vence la ventana de verificación
+UNVERIFIED_EXPIRY_KEY = "unverified_expiry"
 
-async def generate_verification_token(redis: Redis, email: str) -> str:
-    """Genera y almacena un código de verificación numérico de 6 dígitos."""
-    # Generar código de 6 dígitos
-    token = "".join(str(random.randint(0, 9)) for _ in range(TOKEN_LENGTH))
+# Extrae atómicamente hasta ARGV[2] miembros vencidos, para que dos workers nunca reclamen el mismo
+POP_DUE_SCRIPT = """
+local ids = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+if #ids > 0 then
+    redis.call('ZREM', KEYS[1], unpack(ids))
+end
+return ids
+"""
 
-    # Almacenar el token en Redis con expiración
-    await redis.set(f"email_verification:{token}", email, ex=int(TOKEN_EXPIRY.total_seconds()))
+unverified_expired_total = metrics.counter(
+    "zentora_unverified_users_expired_total", "Usuarios no verificados eliminados al vencer su ventana"
+)
+unverified_expiry_lag_seconds = metrics.gauge(
+    "zentora_unverified_expiry_lag_seconds", "Retraso de la entrada vencida más antigua de la cola de expiración"
+)
+unverified_expiry_backlog = metrics.gauge(
+    "zentora_unverified_expiry_backlog", "Entradas vencidas pendientes en la cola de expiración"
+)
 
-    return token
 
+async def generate_verification_token(redis: Redis, email: str) -> str:
+    """
+    Genera un código de verificación.
 
-async def verify_email_token(redis: Redis, token: str) -> str | None:
+    En modo sin estado (STATELESS_CODES_ENABLED) es un código firmado que no ocupa Redis hasta
+    que se usa; si no, un código numérico de 6 dígitos almacenado en Redis.
     """
-    Verifica un token y retorna el email asociado si es válido.
-    Retorna None si el token es inválido o ha expirado.
+    if settings.STATELESS_CODES_ENABLED:
+        return issue_signed_code(VERIFICATION_PURPOSE, email, TOKEN_EXPIRY)
+    return await email_verification_tokens.issue(redis, email)
+
+
+async def verify_email_token(redis: Redis, token: str, subject: str | None = None) -> str | None:
+    """
+    Consume un token y retorna el email asociado si es válido.
+    Retorna None si el token es inválido, ha expirado o ya se usó.
+
+    Lanza TooManyAttemptsError si `subject` acumula demasiados intentos fallidos.
     """
-    email = await redis.get(f"email_verification:{token}")
-    if email:
-        # Eliminar el token después de usarlo
-        await redis.delete(f"email_verification:{token}")
-    return email
+    if settings.STATELESS_CODES_ENABLED:
+        claims = await consume_signed_code(redis, token, VERIFICATION_PURPOSE)
+        return claims.email if claims else None
+    return await email_verification_tokens.consume(redis, token, subject)
+
 
+async def schedule_unverified_expiry(redis: Redis, user_id: UUID | str, created_at: datetime) -> None:
+    """Programa la expiración de un usuario no verificado al final de su ventana de verificación."""
+    due_at = created_at + VERIFICATION_WINDOW
+    await redis.zadd(UNVERIFIED_EXPIRY_KEY, {str(user_id): due_at.timestamp()})
 
-async def cleanup_expired_unverified_users(db: AsyncSession, redis: Redis) -> int:
+
+async def cancel_unverified_expiry(redis: Redis, user_id: UUID | str) -> None:
+    """Elimina la expiración programada de un usuario (por ejemplo, al verificar su email)."""
+    await redis.zrem(UNVERIFIED_EXPIRY_KEY, str(user_id))
+
+
+async def expire_due_unverified_users(db: AsyncSession, redis: Redis, batch_size: int) -> int:
     """
-    Elimina todos los usuarios no verificados que hayan expirado.
+    Reclama hasta `batch_size` entradas vencidas de la cola y elimina esos usuarios si siguen sin verificar.
     Retorna el número de usuarios eliminados.
     """
-    # Buscar usuarios no verificados
-    result = await db.execute(
-        select(UserModel).where(UserModel.is_verified == False, UserModel.created_at <= VERIFICATION_WINDOW)
-    )
-    users = result.scalars().all()
+    now = time.time()
+    user_ids = await redis.eval(POP_DUE_SCRIPT, 1, UNVERIFIED_EXPIRY_KEY, now, batch_size)
+    if not user_ids:
+        return 0
 
-    count = 0
-    for user in users:
-        # Eliminar el usuario de la base de datos
-        await db.execute(delete(UserModel).where(UserModel.email == user.email, UserModel.is_verified == False))
+    try:
+        result = await db.execute(
+            delete(UserModel)
+            .where(UserModel.id.in_([UUID(user_id) for user_id in user_ids]), UserModel.is_verified == False)
+            .returning(UserModel.id)
+        )
+        deleted = len(result.all())
+        await db.commit()
+    except Exception:
+        # Devolver las entradas a la cola para no perderlas
+        await db.rollback()
+        await redis.zadd(UNVERIFIED_EXPIRY_KEY, {user_id: now for user_id in user_ids})
+        raise
 
-        # Eliminar todos los tokens asociados al email
-        pattern = f"email_verification:*"
-        async for key in redis.scan_iter(pattern):
-            token_email = await redis.get(key)
-            if token_email == user.email:
-                await redis.delete(key)
+    unverified_expired_total.inc(deleted)
+    return deleted
 
-        count += 1
 
+async def record_unverified_expiry_lag(redis: Redis) -> float:
+    """Actualiza las métricas de retraso y backlog de la cola de expiración y retorna el retraso en segundos."""
+    now = time.time()
+    oldest = await redis.zrange(UNVERIFIED_EXPIRY_KEY, 0, 0, withscores=True)
+    lag = max(0.0, now - oldest[0][1]) if oldest else 0.0
+    backlog = await redis.zcount(UNVERIFIED_EXPIRY_KEY, "-inf", now)
+    unverified_expiry_lag_seconds.set(lag)
+    unverified_expiry_backlog.set(backlog)
+    return lag
+
+
+async def run_unverified_expiry_worker(stop: asyncio.Event) -> None:
+    """
+    Worker continuo que expira usuarios no verificados a medida que vencen.
+
+    En cada tick procesa como máximo UNVERIFIED_EXPIRY_MAX_BATCHES_PER_TICK lotes, de modo que
+    la carga se reparte a lo largo del día en lugar de concentrarse a medianoche.
+    """
+    while not stop.is_set():
+        try:
+            async with AsyncSessionLocal() as db:
+                async for redis in get_queue_redis():
+                    for _ in range(settings.UNVERIFIED_EXPIRY_MAX_BATCHES_PER_TICK):
+                        deleted = await expire_due_unverified_users(db, redis, settings.UNVERIFIED_EXPIRY_BATCH_SIZE)
+                        if deleted < settings.UNVERIFIED_EXPIRY_BATCH_SIZE:
+                            break
+                    await record_unverified_expiry_lag(redis)
+        except Exception as e:
+            logger.error(f"Error en el worker de expiración de usuarios no verificados: {str(e)}")
+
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=settings.UNVERIFIED_EXPIRY_TICK_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+
+def init_unverified_expiry_worker(app: FastAPI):
+    """Arranca el worker de expiración junto con la aplicación."""
+    stop = asyncio.Event()
+    tasks: list[asyncio.Task] = []
+
+    @app.on_event("startup")
+    async def start_unverified_expiry_worker():
+        tasks.append(asyncio.create_task(run_unverified_expiry_worker(stop)))
+
+    @app.on_event("shutdown")
+    async def stop_unverified_expiry_worker():
+        stop.set()
+        for task in tasks:
+            await task
+
+
+async def cleanup_expired_unverified_users(
+    db: AsyncSession, redis: Redis, shard_condition: ColumnElement[bool] | None = None
+) -> int:
+    """
+    Elimina todos los usuarios no verificados que hayan expirado.
+    Retorna el número de usuarios eliminados.
+
+    Es un barrido completo de reconciliación; la expiración normal la hace el worker continuo.
+    Con `shard_condition` (ver JobShard.condition) solo se barren los usuarios de ese shard, para
+    repartir el trabajo entre varios workers.
+    """
+    conditions = [UserModel.is_verified == False, UserModel.created_at <= datetime.now(UTC) - VERIFICATION_WINDOW]
+    if shard_condition is not None:
+        conditions.append(shard_condition)
+
+    result = await db.execute(delete(UserModel).where(*conditions).returning(UserModel.id))
+    user_ids = [str(user_id) for user_id in result.scalars().all()]
     await db.commit()
-    return count
+
+    # Quitar de la cola las entradas de los usuarios ya eliminados
+    if user_ids:
+        await redis.zrem(UNVERIFIED_EXPIRY_KEY, *user_ids)
+
+    unverified_expired_total.inc(len(user_ids))
+    return len(user_ids)
@@ -0,0 +1,159 @@
+import logging
+import random
+import time
+from functools import lru_cache
+from typing import Protocol, Sequence
+
+from app.core.config import settings
+from app.core.email.brevo import get_brevo_transport
+from app.core.email.smtp import get_smtp_transport
+from app.core.email.transport import EmailDeliveryError, EmailMessage
+from app.core.utils.resilience import CircuitBreaker, CircuitState
+
+logger = logging.getLogger(__name__)
+
+
+class EmailTransport(Protocol):
+    name: str
+    breaker: CircuitBreaker
+
+    async def send(self, message: EmailMessage) -> str | None: ...
+
+    async def send_batch(self, messages: Sequence[EmailMessage]) -> list[str]: ...
+
+    async def aclose(self) -> None: ...
+
+
+class TransportStats:
+    """Tasa de error y latencia de un transporte como medias móviles exponenciales (EWMA)."""
+
+    def __init__(self, alpha: float = 0.2):
+        self.alpha = alpha
+        self.error_rate = 0.0
+        self.latency = 0.0
+        self.updated_at = time.monotonic()
+
+    def reset(self) -> None:
+        self.error_rate = 0.0
+        self.latency = 0.0
+        self.updated_at = time.monotonic()
+
+    def record(self, elapsed: float, failed: bool) -> None:
+        self.updated_at = time.monotonic()
+        self.error_rate = self.alpha * (1.0 if failed else 0.0) + (1 - self.alpha) * self.error_rate
+        if not failed:
+            self.latency = elapsed if self.latency == 0.0 else self.alpha * elapsed + (1 - self.alpha) * self.latency
+
+
+class EmailRouter:
+    """
+    Reparte los envíos entre varios transportes según su salud.
+
+    - `failover`: usa el primer transporte sano en orden de preferencia y pasa al siguiente
+      ante un error transitorio.
+    - `split`: reparte la carga entre los transportes sanos con un peso proporcional a
+      (1 - tasa de error) / latencia, y también hace failover ante errores transitorios.
+
+    Un transporte se considera degradado si su circuito está abierto, su tasa de error supera
+    `max_error_rate` o su latencia supera `max_latency`. Si todos están degradados se prueban
+    igualmente en orden, para no dejar de enviar correo. Las estadísticas de un transporte que
+    no recibe tráfico durante `stats_ttl` segundos se reinician para que vuelva a probarse.
+    """
+
+    def __init__(
+        self,
+        transports: Sequence[EmailTransport],
+        mode: str = "failover",
+        max_error_rate: float = 0.5,
+        max_latency: float = 5.0,
+        stats_ttl: float = 60.0,
+    ):
+        if not transports:
+            raise ValueError("Se necesita al menos un transporte de correo")
+        if mode not in ("failover", "split"):
+            raise ValueError(f"Modo de enrutamiento no soportado: {mode}")
+        self.transports = list(transports)
+        self.mode = mode
+        self.max_error_rate = max_error_rate
+        self.max_latency = max_latency
+        self.stats_ttl = stats_ttl
+        self.stats = {transport.name: TransportStats() for transport in self.transports}
+
+    def is_healthy(self, transport: EmailTransport) -> bool:
+        stats = self.stats[transport.name]
+        if time.monotonic() - stats.updated_at > self.stats_ttl:
+            stats.reset()
+        return (
+            transport.breaker.state == CircuitState.CLOSED
+            and stats.error_rate < self.max_error_rate
+            and stats.latency < self.max_latency
+        )
+
+    def _weight(self, transport: EmailTransport) -> float:
+        stats = self.stats[transport.name]
+        return (1.0 - stats.error_rate) / max(stats.latency, 0.01)
+
+    def candidates(self) -> list[EmailTransport]:
+        """Retorna los transportes en el orden en que deben intentarse para el próximo envío."""
+        healthy = [t for t in self.transports if self.is_healthy(t)]
+        degraded = [t for t in self.transports if t not in healthy]
+
+        if self.mode == "split" and len(healthy) > 1:
+            first = random.choices(healthy, weights=[self._weight(t) for t in healthy])[0]
+            healthy = [first] + [t for t in healthy if t is not first]
+
+        return healthy + degraded
+
+    async def _dispatch(self, operation: str, payload) -> tuple[EmailTransport, object]:
+        last_error: EmailDeliveryError | None = None
+        for transport in self.candidates():
+            started = time.monotonic()
+            try:
+                result = await getattr(transport, operation)(payload)
+            except EmailDeliveryError as e:
+                self.stats[transport.name].record(time.monotonic() - started, failed=True)
+                last_error = e
+                if not e.retryable:
+                    raise
+                logger.warning(f"Fallo transitorio en el transporte {transport.name}: {str(e)}; probando el siguiente")
+                continue
+            self.stats[transport.name].record(time.monotonic() - started, failed=False)
+            return transport, result
+
+        raise last_error or EmailDeliveryError("No hay transportes de correo disponibles", retryable=True)
+
+    async def send(self, message: EmailMessage) -> str | None:
+        transport, result = await self._dispatch("send", message)
+        logger.debug(f"Correo para {message.email_to} enviado por {transport.name}")
+        return result
+
+    async def send_batch(self, messages: Sequence[EmailMessage]) -> list[str]:
+        transport, result = await self._dispatch("send_batch", messages)
+        logger.debug(f"Lote de {len(messages)} correos enviado por {transport.name}")
+        return result
+
+    async def aclose(self) -> None:
+        for transport in self.transports:
+            await transport.aclose()
+
+
+@lru_cache()
+def get_email_router() -> EmailRouter:
+    """Construye el router con los transportes listados en EMAIL_TRANSPORTS."""
+    factories = {"brevo": get_brevo_transport, "smtp": get_smtp_transport}
+    transports = []
+    for name in settings.email_transports:
+        if name not in factories:
+            logger.warning(f"Transporte de correo desconocido en EMAIL_TRANSPORTS: {name}")
+            continue
+        if name == "smtp" and settings.MAIL_USE_CREDENTIALS and not settings.MAIL_USERNAME:
+            logger.warning("Transporte SMTP omitido: MAIL_USERNAME no está configurada")
+            continue
+        transports.append(factories[name]())
+
+    return EmailRouter(
+        transports,
+        mode=settings.EMAIL_ROUTING_MODE,
+        max_error_rate=settings.EMAIL_ROUTER_MAX_ERROR_RATE,
+        max_latency=settings.EMAIL_ROUTER_MAX_LATENCY_SECONDS,
+    )
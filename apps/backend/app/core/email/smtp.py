@@ -0,0 +1,229 @@
+"""
+Transporte SMTP con pool de conexiones persistentes.
+
+Para pruebas locales basta con un sumidero SMTP:
+
+    python -m aiosmtpd -n -l localhost:1025
+
+y en el backend: MAIL_SERVER=localhost MAIL_PORT=1025 MAIL_STARTTLS=false MAIL_USE_CREDENTIALS=false
+"""
+
+import asyncio
+import logging
+import time
+from email.message import EmailMessage as MIMEMessage
+from email.utils import formataddr
+from functools import lru_cache
+from typing import Sequence
+
+import aiosmtplib
+
+from app.core.config import settings
+from app.core.email.transport import CircuitOpenError, EmailDeliveryError, EmailMessage
+from app.core.utils.resilience import CircuitBreaker
+
+logger = logging.getLogger(__name__)
+
+
+class _PooledConnection:
+    """Conexión SMTP del pool con su contador de mensajes y momento del último uso."""
+
+    def __init__(self, client: aiosmtplib.SMTP):
+        self.client = client
+        self.messages_sent = 0
+        self.last_used_at = time.monotonic()
+
+
+def _classify_smtp_error(error: Exception) -> EmailDeliveryError:
+    """Convierte un error de aiosmtplib en un EmailDeliveryError (4xx y red son transitorios)."""
+    if isinstance(error, aiosmtplib.SMTPRecipientsRefused) and error.recipients:
+        # Todos los destinatarios rechazados: el servidor respondió, se clasifica por su código
+        error = error.recipients[0]
+    if isinstance(error, aiosmtplib.SMTPResponseException):
+        return EmailDeliveryError(
+            f"El servidor SMTP respondió {error.code}: {error.message}",
+            retryable=400 <= error.code < 500,
+            status_code=error.code,
+        )
+    return EmailDeliveryError(f"Error de conexión SMTP: {str(error)}", retryable=True)
+
+
+class SMTPTransport:
+    """
+    Transporte SMTP que mantiene un pool de sesiones abiertas contra `MAIL_SERVER`.
+
+    Cada sesión se reutiliza para varios mensajes (hasta `max_messages_per_connection`),
+    evitando el coste de TCP + STARTTLS + AUTH por correo. Los lotes se reparten entre las
+    sesiones del pool y cada sesión envía su parte de forma consecutiva.
+    """
+
+    name = "smtp"
+
+    def __init__(
+        self,
+        hostname: str,
+        port: int,
+        sender_email: str,
+        sender_name: str,
+        username: str | None = None,
+        password: str | None = None,
+        use_tls: bool = False,
+        start_tls: bool = True,
+        validate_certs: bool = True,
+        pool_size: int = 4,
+        max_messages_per_connection: int = 100,
+        idle_timeout: float = 60.0,
+        timeout: float = 10.0,
+        breaker: CircuitBreaker | None = None,
+    ):
+        self.hostname = hostname
+        self.port = port
+        self.sender = formataddr((sender_name, sender_email))
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.start_tls = start_tls
+        self.validate_certs = validate_certs
+        self.pool_size = pool_size
+        self.max_messages_per_connection = max_messages_per_connection
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self.breaker = breaker or CircuitBreaker()
+        self._idle: asyncio.Queue[_PooledConnection] = asyncio.Queue()
+        self._slots = asyncio.Semaphore(pool_size)
+
+    async def _connect(self) -> _PooledConnection:
+        client = aiosmtplib.SMTP(
+            hostname=self.hostname,
+            port=self.port,
+            username=self.username,
+            password=self.password,
+            use_tls=self.use_tls,
+            start_tls=self.start_tls if not self.use_tls else False,
+            validate_certs=self.validate_certs,
+            timeout=self.timeout,
+        )
+        await client.connect()
+        logger.debug(f"Nueva conexión SMTP abierta con {self.hostname}:{self.port}")
+        return _PooledConnection(client)
+
+    async def _acquire(self) -> _PooledConnection:
+        """Reserva un hueco del pool y retorna una sesión abierta; si falla, el hueco ya queda libre."""
+        await self._slots.acquire()
+        try:
+            while not self._idle.empty():
+                connection = self._idle.get_nowait()
+                expired = time.monotonic() - connection.last_used_at > self.idle_timeout
+                if connection.client.is_connected and not expired:
+                    return connection
+                await self._discard(connection)
+            return await self._connect()
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def _release(self, connection: _PooledConnection) -> None:
+        """Devuelve al pool la sesión obtenida con `_acquire` y libera su hueco."""
+        connection.last_used_at = time.monotonic()
+        if connection.messages_sent < self.max_messages_per_connection and connection.client.is_connected:
+            self._idle.put_nowait(connection)
+        else:
+            asyncio.create_task(self._discard(connection))
+        self._slots.release()
+
+    async def _discard(self, connection: _PooledConnection) -> None:
+        try:
+            if connection.client.is_connected:
+                await connection.client.quit()
+        except aiosmtplib.SMTPException:
+            connection.client.close()
+
+    def _build_message(self, message: EmailMessage) -> MIMEMessage:
+        mime = MIMEMessage()
+        mime["From"] = self.sender
+        mime["To"] = message.email_to
+        mime["Subject"] = message.subject
+        mime.set_content(message.html_content, subtype="html")
+        return mime
+
+    async def _send_on(self, connection: _PooledConnection, messages: Sequence[EmailMessage], sent: list[str]) -> None:
+        """Envía los mensajes que siguen al último de `sent`, anotando cada uno en `sent` al entregarlo."""
+        for message in messages[len(sent) :]:
+            await connection.client.send_message(self._build_message(message))
+            connection.messages_sent += 1
+            sent.append(message.email_to)
+
+    async def _send_chunk(self, messages: Sequence[EmailMessage]) -> list[str]:
+        with self.breaker.guard() as allowed:
+            if not allowed:
+                raise CircuitOpenError(self.name)
+            return await self._send_chunk_guarded(messages)
+
+    def _failure(self, error: Exception, count_permanent: bool = False) -> EmailDeliveryError:
+        delivery_error = _classify_smtp_error(error)
+        if delivery_error.retryable or count_permanent:
+            self.breaker.record_failure()
+        return delivery_error
+
+    async def _send_chunk_guarded(self, messages: Sequence[EmailMessage]) -> list[str]:
+        try:
+            connection = await self._acquire()
+        except (aiosmtplib.SMTPException, OSError) as e:
+            raise self._failure(e) from e
+
+        sent: list[str] = []
+        try:
+            await self._send_on(connection, messages, sent)
+            self.breaker.record_success()
+            return sent
+        except aiosmtplib.SMTPServerDisconnected:
+            # La sesión pudo haber caducado en el servidor: reintentar una vez en una conexión nueva,
+            # solo con los mensajes que aún no se habían entregado
+            connection.client.close()
+            try:
+                connection = await self._connect()
+                await self._send_on(connection, messages, sent)
+                self.breaker.record_success()
+                return sent
+            except (aiosmtplib.SMTPException, OSError) as e:
+                raise self._failure(e, count_permanent=True) from e
+        except (aiosmtplib.SMTPException, OSError) as e:
+            raise self._failure(e) from e
+        finally:
+            self._release(connection)
+
+    async def send(self, message: EmailMessage) -> str | None:
+        """Envía un correo por una de las sesiones del pool."""
+        sent = await self._send_chunk([message])
+        return sent[0] if sent else None
+
+    async def send_batch(self, messages: Sequence[EmailMessage]) -> list[str]:
+        """Reparte el lote entre las sesiones del pool; cada una envía sus mensajes en la misma sesión."""
+        chunk_size = max(1, -(-len(messages) // self.pool_size))
+        chunks = [messages[i : i + chunk_size] for i in range(0, len(messages), chunk_size)]
+        results = await asyncio.gather(*(self._send_chunk(chunk) for chunk in chunks))
+        return [recipient for sent in results for recipient in sent]
+
+    async def aclose(self) -> None:
+        while not self._idle.empty():
+            await self._discard(self._idle.get_nowait())
+
+
+@lru_cache()
+def get_smtp_transport() -> SMTPTransport:
+    """Retorna la instancia compartida del transporte SMTP configurado con MAIL_*."""
+    return SMTPTransport(
+        hostname=settings.MAIL_SERVER,
+        port=settings.MAIL_PORT,
+        sender_email=settings.MAIL_FROM,
+        sender_name=settings.MAIL_FROM_NAME,
+        username=settings.MAIL_USERNAME if settings.MAIL_USE_CREDENTIALS else None,
+        password=settings.MAIL_PASSWORD if settings.MAIL_USE_CREDENTIALS else None,
+        use_tls=settings.MAIL_SSL_TLS,
+        start_tls=settings.MAIL_STARTTLS,
+        validate_certs=settings.MAIL_VALIDATE_CERTS,
+        pool_size=settings.MAIL_POOL_SIZE,
+        max_messages_per_connection=settings.MAIL_MAX_MESSAGES_PER_CONNECTION,
+        idle_timeout=settings.MAIL_IDLE_TIMEOUT_SECONDS,
+        timeout=settings.MAIL_TIMEOUT_SECONDS,
+    )
@@ -0,0 +1,31 @@
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class EmailMessage:
+    """Correo transaccional ya renderizado, independiente del proveedor de envío."""
+
+    email_to: str
+    subject: str
+    html_content: str
+
+
+class EmailDeliveryError(Exception):
+    """
+    Error al entregar un correo.
+
+    `retryable` indica si el fallo es transitorio (timeouts, 429, 5xx, circuito abierto)
+    y tiene sentido reintentar o enviar por otro transporte.
+    """
+
+    def __init__(self, message: str, retryable: bool = False, status_code: int | None = None):
+        super().__init__(message)
+        self.retryable = retryable
+        self.status_code = status_code
+
+
+class CircuitOpenError(EmailDeliveryError):
+    """El transporte está en modo circuit-breaker y no acepta envíos por ahora."""
+
+    def __init__(self, transport: str):
+        super().__init__(f"Circuito abierto para el transporte {transport}", retryable=True)
@@ -0,0 +1,67 @@
+"""
+Consumidores de los eventos de dominio publicados por el relay del outbox.
+
+La entrega es at-least-once, así que cada consumidor debe poder ejecutarse más de una vez
+para el mismo evento sin efectos indeseados.
+"""
+
+import logging
+
+from redis.asyncio import Redis
+
+from app.core.auth.one_time_tokens import email_verification_tokens
+from app.core.auth.sessions import revoke_all_user_sessions
+from app.core.auth.token_epochs import publish_token_version
+from app.core.email.email import send_verification_email
+from app.core.email.email_verification import generate_verification_token, schedule_unverified_expiry
+from app.core.events.outbox import register_consumer
+from app.core.redis import RedisWorkload, get_redis_client
+from app.core.utils.enums import AuthProvider, OutboxEventType
+from app.db.models.outbox import OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+
+def _needs_verification(event: OutboxEvent) -> bool:
+    return event.payload.get("provider") == AuthProvider.LOCAL.value and not event.payload.get("is_verified")
+
+
+@register_consumer(OutboxEventType.USER_REGISTERED)
+async def schedule_expiry_on_register(event: OutboxEvent, redis: Redis) -> None:
+    """Añade al usuario no verificado a la cola de expiración (el relay entrega el pool de colas)."""
+    if _needs_verification(event):
+        await schedule_unverified_expiry(redis, event.aggregate_id, event.created_at)
+
+
+@register_consumer(OutboxEventType.USER_REGISTERED)
+async def send_verification_on_register(event: OutboxEvent, redis: Redis) -> None:
+    """Genera el código de verificación y envía el correo a los usuarios locales no verificados."""
+    if not _needs_verification(event):
+        return
+
+    payload = event.payload
+    ephemeral_redis = get_redis_client(RedisWorkload.EPHEMERAL)
+    verification_token = await generate_verification_token(ephemeral_redis, payload["email"])
+    try:
+        await send_verification_email(payload["email"], verification_token, full_name=payload.get("full_name"))
+    except Exception:
+        # Los códigos firmados no ocupan Redis; revoke no hace nada en ese caso
+        await email_verification_tokens.revoke(ephemeral_redis, verification_token)
+        raise
+    logger.info(f"Correo de verificación enviado a {payload['email']} (evento {event.id})")
+
+
+@register_consumer(OutboxEventType.PASSWORD_CHANGED)
+@register_consumer(OutboxEventType.ACCOUNT_DELETED)
+@register_consumer(OutboxEventType.SESSION_REVOKED)
+async def revoke_refresh_sessions(event: OutboxEvent, redis: Redis) -> None:
+    """
+    Garantiza que las sesiones y los tokens del usuario quedan revocados.
+
+    El endpoint ya las elimina tras el commit; este consumidor cubre el caso en que el
+    proceso muera entre el commit y esa limpieza.
+    """
+    sessions_redis = get_redis_client(RedisWorkload.SESSIONS)
+    await revoke_all_user_sessions(sessions_redis, event.aggregate_id)
+    if "token_version" in event.payload:
+        await publish_token_version(sessions_redis, event.aggregate_id, event.payload["token_version"])
@@ -0,0 +1,212 @@
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, UTC
+from typing import Any, Awaitable, Callable
+from uuid import UUID
+
+from fastapi import FastAPI
+from redis.asyncio import Redis
+from sqlalchemy import func, insert, literal, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.redis import get_queue_redis
+from app.core.utils.enums import OutboxEventType
+from app.db.base import AsyncSessionLocal
+from app.db.models.outbox import OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+Consumer = Callable[[OutboxEvent, Redis], Awaitable[None]]
+
+_consumers: dict[str, list[Consumer]] = defaultdict(list)
+_wakeup = asyncio.Event()
+
+
+def add_outbox_event(
+    db: AsyncSession,
+    event_type: OutboxEventType,
+    aggregate_id: UUID | str | None,
+    payload: dict[str, Any] | None = None,
+) -> OutboxEvent:
+    """
+    Añade un evento al outbox dentro de la transacción actual.
+
+    No hace commit: el evento se confirma junto con el cambio del usuario en el mismo
+    `db.commit()` del endpoint, o se descarta con él si la transacción falla.
+    """
+    event = OutboxEvent(
+        event_type=str(event_type),
+        aggregate_id=UUID(str(aggregate_id)) if aggregate_id else None,
+        payload=payload or {},
+    )
+    db.add(event)
+    return event
+
+
+def outbox_event_insert(event_type: OutboxEventType, aggregate_id: Any, payload: dict[str, Any]):
+    """
+    Evento del outbox como sentencia INSERT ... SELECT, para encadenarlo en un CTE con el cambio
+    que lo origina y confirmar ambos en una sola sentencia. `aggregate_id` y los valores de
+    `payload` suelen ser columnas del CTE: si el cambio no produce filas, tampoco se crea el evento.
+    """
+    payload_args = [arg for key, value in payload.items() for arg in (literal(key), value)]
+    # Sin los defaults de Python: dentro de un CTE SQLAlchemy no los rellena al ejecutar (attempts
+    # llegaría como NULL); el resto de columnas toman los server_default de la tabla
+    return insert(OutboxEvent).from_select(
+        ["event_type", "aggregate_id", "payload"],
+        select(literal(str(event_type)), aggregate_id, func.jsonb_build_object(*payload_args)),
+        include_defaults=False,
+    )
+
+
+def notify_outbox() -> None:
+    """Despierta al relay de este proceso para que publique los eventos recién confirmados."""
+    _wakeup.set()
+
+
+def register_consumer(event_type: OutboxEventType) -> Callable[[Consumer], Consumer]:
+    """Registra una función como consumidor de un tipo de evento."""
+
+    def decorator(consumer: Consumer) -> Consumer:
+        _consumers[str(event_type)].append(consumer)
+        return consumer
+
+    return decorator
+
+
+async def claim_outbox_batch(db: AsyncSession, batch_size: int) -> list[OutboxEvent]:
+    """
+    Reclama un lote de eventos pendientes en una transacción corta y retorna los eventos reclamados.
+
+    Los eventos se bloquean con `FOR UPDATE SKIP LOCKED` solo el tiempo del UPDATE que les pone
+    `available_at` en el futuro (lease de OUTBOX_CLAIM_LEASE_SECONDS): ningún otro relay los
+    vuelve a ver hasta que el lease expire, aunque ya no haya ni bloqueo ni transacción abierta.
+    Si el relay muere antes de registrar el resultado, el evento se reintenta al expirar el lease.
+    """
+    now = datetime.now(UTC)
+    pending = (
+        select(OutboxEvent.id)
+        .where(
+            OutboxEvent.processed_at.is_(None),
+            OutboxEvent.failed_at.is_(None),
+            OutboxEvent.available_at <= now,
+        )
+        .order_by(OutboxEvent.available_at, OutboxEvent.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    result = await db.execute(
+        update(OutboxEvent)
+        .where(OutboxEvent.id.in_(pending.scalar_subquery()))
+        .values(available_at=now + timedelta(seconds=settings.OUTBOX_CLAIM_LEASE_SECONDS))
+        .returning(OutboxEvent)
+        .execution_options(synchronize_session=False)
+    )
+    events = sorted(result.scalars().all(), key=lambda event: event.id)
+    await db.commit()
+    return events
+
+
+async def deliver_outbox_event(event: OutboxEvent, redis: Redis) -> dict[str, Any]:
+    """Entrega un evento a sus consumidores y retorna los valores con los que registrar el resultado."""
+    try:
+        for consumer in _consumers.get(event.event_type, []):
+            await consumer(event, redis)
+    except Exception as e:
+        attempts = event.attempts + 1
+        outcome = {"id": event.id, "attempts": attempts, "last_error": str(e)[:1000]}
+        if attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+            outcome["failed_at"] = datetime.now(UTC)
+            logger.error(f"Evento {event.id} ({event.event_type}) descartado tras {attempts} intentos: {e}")
+        else:
+            backoff = timedelta(seconds=min(2**attempts, 300))
+            outcome["available_at"] = datetime.now(UTC) + backoff
+            logger.warning(f"Error al publicar el evento {event.id} ({event.event_type}), reintento en {backoff}: {e}")
+        return outcome
+
+    return {"id": event.id, "processed_at": datetime.now(UTC)}
+
+
+async def relay_outbox_batch(redis: Redis, batch_size: int) -> int:
+    """
+    Publica un lote de eventos pendientes y retorna cuántos se procesaron.
+
+    Ninguna conexión a la base de datos queda abierta mientras se entregan los eventos (envíos de
+    correo, publicaciones en Redis): el lote se reclama en una transacción corta, los consumidores
+    se ejecutan sin sesión y los resultados se guardan en una segunda transacción corta. Varios
+    relays (workers o réplicas) pueden trabajar a la vez sin entregar el mismo evento en paralelo.
+    La entrega es at-least-once: los consumidores deben ser idempotentes.
+
+    Si las entregas se acercan al fin del lease (menos de OUTBOX_LEASE_MARGIN_SECONDS), el relay
+    deja de entregar y libera los eventos restantes sin contarles un intento, para que otro relay
+    no los reclame mientras este sigue con ellos. Retorna solo los eventos entregados o fallidos.
+    """
+    deadline = time.monotonic() + settings.OUTBOX_CLAIM_LEASE_SECONDS - settings.OUTBOX_LEASE_MARGIN_SECONDS
+    async with AsyncSessionLocal() as db:
+        events = await claim_outbox_batch(db, batch_size)
+    if not events:
+        return 0
+
+    outcomes = []
+    for event in events:
+        if time.monotonic() >= deadline:
+            break
+        outcomes.append(await deliver_outbox_event(event, redis))
+    processed = len(outcomes)
+    if processed < len(events):
+        logger.warning(f"Lease del outbox por expirar: se liberan {len(events) - processed} eventos sin entregar")
+        released_at = datetime.now(UTC)
+        outcomes.extend({"id": event.id, "available_at": released_at} for event in events[processed:])
+
+    # Actualización por clave primaria, agrupada por columnas para mandar cada grupo en un executemany
+    groups: dict[tuple[str, ...], list[dict[str, Any]]] = defaultdict(list)
+    for outcome in outcomes:
+        groups[tuple(sorted(outcome))].append(outcome)
+    async with AsyncSessionLocal() as db:
+        for rows in groups.values():
+            await db.execute(update(OutboxEvent), rows)
+        await db.commit()
+    return processed
+
+
+async def run_outbox_relay(stop: asyncio.Event) -> None:
+    """Bucle del relay: procesa lotes mientras haya trabajo y espera notificaciones o el intervalo de sondeo."""
+    while not stop.is_set():
+        processed = 0
+        try:
+            async for redis in get_queue_redis():
+                processed = await relay_outbox_batch(redis, settings.OUTBOX_BATCH_SIZE)
+        except Exception as e:
+            logger.error(f"Error en el relay del outbox: {str(e)}")
+
+        if processed >= settings.OUTBOX_BATCH_SIZE:
+            continue
+
+        _wakeup.clear()
+        try:
+            await asyncio.wait_for(_wakeup.wait(), timeout=settings.OUTBOX_POLL_INTERVAL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+
+def init_outbox_relay(app: FastAPI):
+    """Arranca el relay del outbox junto con la aplicación."""
+    # Registrar los consumidores de eventos
+    from app.core.events import consumers  # noqa: F401
+
+    stop = asyncio.Event()
+    tasks: list[asyncio.Task] = []
+
+    @app.on_event("startup")
+    async def start_outbox_relay():
+        tasks.append(asyncio.create_task(run_outbox_relay(stop)))
+
+    @app.on_event("shutdown")
+    async def stop_outbox_relay():
+        stop.set()
+        _wakeup.set()
+        for task in tasks:
+            await task
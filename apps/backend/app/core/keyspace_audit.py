@@ -0,0 +1,231 @@
+"""
+Auditoría de memoria y TTL del keyspace de Redis.
+
+Recorre el keyspace con SCAN (que no bloquea el servidor) en lotes pequeños y, para una
+fracción de las claves, consulta `TTL` y `MEMORY USAGE` en un pipeline por lote. Agrupa los
+resultados por prefijo (el primer segmento de la clave, sin hash tag) e informa de número de
+claves, bytes, histograma de TTL y claves sin TTL. Con `sample_rate` < 1 los totales son
+estimaciones.
+
+Para usarlo contra producción sin afectarla: páginas de SCAN de `batch_size` claves, una pausa tras
+cada página (cuenten o no con claves muestreadas), `MEMORY USAGE ... SAMPLES` bajo para los
+agregados y un máximo de claves visitadas.
+
+Uso:
+    python -m app.core.keyspace_audit --workload sessions --sample-rate 0.1 --max-keys 200000
+"""
+
+import argparse
+import asyncio
+import logging
+import random
+import time
+from dataclasses import asdict, dataclass, field
+
+from redis.asyncio import Redis
+
+from app.core.redis import RedisWorkload, close_redis_pools, get_redis_client
+from app.core.redis_keys import tag_of
+from app.core.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Límite superior de cada cubeta del histograma de TTL, en segundos
+TTL_BUCKETS = (("1m", 60), ("1h", 3600), ("1d", 86400), ("7d", 7 * 86400), ("30d", 30 * 86400))
+NO_TTL = "none"
+
+keyspace_keys = metrics.gauge("zentora_redis_keyspace_keys", "Claves estimadas por prefijo en la última auditoría")
+keyspace_bytes = metrics.gauge("zentora_redis_keyspace_bytes", "Bytes estimados por prefijo en la última auditoría")
+keyspace_keys_without_ttl = metrics.gauge(
+    "zentora_redis_keyspace_keys_without_ttl", "Claves estimadas sin TTL por prefijo en la última auditoría"
+)
+keyspace_ttl_keys = metrics.gauge(
+    "zentora_redis_keyspace_ttl_keys", "Claves estimadas por prefijo y cubeta de TTL en la última auditoría"
+)
+keyspace_audit_timestamp = metrics.gauge(
+    "zentora_redis_keyspace_audit_timestamp", "Momento (epoch) en que terminó la última auditoría del keyspace"
+)
+
+
+@dataclass
+class PrefixStats:
+    keys: int = 0
+    bytes: int = 0
+    without_ttl: int = 0
+    ttl_histogram: dict[str, int] = field(default_factory=dict)
+    largest_key: str | None = None
+    largest_key_bytes: int = 0
+
+
+@dataclass
+class KeyspaceReport:
+    workload: str
+    sample_rate: float
+    scanned_keys: int = 0
+    sampled_keys: int = 0
+    complete: bool = True
+    duration_seconds: float = 0.0
+    prefixes: dict[str, PrefixStats] = field(default_factory=dict)
+
+    def estimated(self) -> dict[str, PrefixStats]:
+        """Estadísticas por prefijo escaladas a todo el keyspace recorrido."""
+        scale = 1 / self.sample_rate
+        return {
+            prefix: PrefixStats(
+                keys=round(stats.keys * scale),
+                bytes=round(stats.bytes * scale),
+                without_ttl=round(stats.without_ttl * scale),
+                ttl_histogram={bucket: round(n * scale) for bucket, n in stats.ttl_histogram.items()},
+                largest_key=stats.largest_key,
+                largest_key_bytes=stats.largest_key_bytes,
+            )
+            for prefix, stats in self.prefixes.items()
+        }
+
+    def to_dict(self) -> dict:
+        data = asdict(self)
+        data["prefixes"] = {prefix: asdict(stats) for prefix, stats in self.estimated().items()}
+        return data
+
+
+def key_prefix(key: str) -> str:
+    """Prefijo de una clave: su primer segmento, o el hash tag si la clave empieza por él."""
+    if key.startswith("{"):
+        return tag_of(key) or key
+    return key.split(":", 1)[0]
+
+
+def ttl_bucket(ttl: int) -> str:
+    if ttl < 0:
+        return NO_TTL
+    for name, limit in TTL_BUCKETS:
+        if ttl <= limit:
+            return name
+    return f">{TTL_BUCKETS[-1][0]}"
+
+
+async def _inspect_batch(redis: Redis, keys: list[str], report: KeyspaceReport, memory_samples: int) -> None:
+    async with redis.pipeline(transaction=False) as pipe:
+        for key in keys:
+            pipe.ttl(key)
+            pipe.memory_usage(key, samples=memory_samples)
+        results = await pipe.execute(raise_on_error=False)
+
+    for key, ttl, size in zip(keys, results[::2], results[1::2]):
+        # TTL -2: la clave caducó entre el SCAN y la consulta
+        if isinstance(ttl, Exception) or ttl == -2:
+            continue
+        size = size if isinstance(size, int) else 0
+        stats = report.prefixes.setdefault(key_prefix(key), PrefixStats())
+        stats.keys += 1
+        stats.bytes += size
+        bucket = ttl_bucket(ttl)
+        stats.ttl_histogram[bucket] = stats.ttl_histogram.get(bucket, 0) + 1
+        if bucket == NO_TTL:
+            stats.without_ttl += 1
+        if size > stats.largest_key_bytes:
+            stats.largest_key, stats.largest_key_bytes = key, size
+        report.sampled_keys += 1
+
+
+async def audit_keyspace(
+    redis: Redis,
+    workload: str = RedisWorkload.SESSIONS.value,
+    match: str | None = None,
+    sample_rate: float = 1.0,
+    batch_size: int = 500,
+    pause_seconds: float = 0.01,
+    max_keys: int | None = None,
+    memory_samples: int = 5,
+) -> KeyspaceReport:
+    """
+    Recorre el keyspace y retorna las estadísticas por prefijo.
+
+    Se detiene tras `max_keys` claves recorridas (el informe queda marcado como incompleto).
+    """
+    if not 0 < sample_rate <= 1:
+        raise ValueError("sample_rate debe estar en (0, 1]")
+
+    report = KeyspaceReport(workload=workload, sample_rate=sample_rate)
+    started = time.monotonic()
+    cursor = 0
+
+    # Una página de SCAN por iteración: la pausa depende de las claves recorridas, no de las muestreadas,
+    # así que con un sample_rate bajo el ritmo de SCAN contra el servidor sigue limitado
+    while True:
+        cursor, keys = await redis.scan(cursor=cursor, match=match, count=batch_size)
+        if max_keys is not None and report.scanned_keys + len(keys) >= max_keys:
+            report.complete = cursor == 0 and report.scanned_keys + len(keys) == max_keys
+            keys = keys[: max_keys - report.scanned_keys]
+            cursor = 0
+        report.scanned_keys += len(keys)
+
+        sampled = keys if sample_rate >= 1 else [key for key in keys if random.random() < sample_rate]
+        if sampled:
+            await _inspect_batch(redis, sampled, report, memory_samples)
+        if cursor == 0:
+            break
+        await asyncio.sleep(pause_seconds)
+
+    report.duration_seconds = round(time.monotonic() - started, 3)
+    return report
+
+
+def export_report_metrics(report: KeyspaceReport) -> None:
+    """Publica el informe como métricas (las de prefijos que ya no existen conservan su último valor)."""
+    for prefix, stats in report.estimated().items():
+        keyspace_keys.set(stats.keys, workload=report.workload, prefix=prefix)
+        keyspace_bytes.set(stats.bytes, workload=report.workload, prefix=prefix)
+        keyspace_keys_without_ttl.set(stats.without_ttl, workload=report.workload, prefix=prefix)
+        for bucket, count in stats.ttl_histogram.items():
+            keyspace_ttl_keys.set(count, workload=report.workload, prefix=prefix, bucket=bucket)
+    keyspace_audit_timestamp.set(time.time(), workload=report.workload)
+
+
+def _print_report(report: KeyspaceReport) -> None:
+    buckets = [name for name, _ in TTL_BUCKETS] + [f">{TTL_BUCKETS[-1][0]}", NO_TTL]
+    header = f"{'prefijo':<24}{'claves':>10}{'bytes':>14}{'sin TTL':>10}" + "".join(f"{b:>9}" for b in buckets)
+    print(header)
+    estimated = sorted(report.estimated().items(), key=lambda item: item[1].bytes, reverse=True)
+    for prefix, stats in estimated:
+        row = f"{prefix:<24}{stats.keys:>10}{stats.bytes:>14}{stats.without_ttl:>10}"
+        print(row + "".join(f"{stats.ttl_histogram.get(b, 0):>9}" for b in buckets))
+
+    status = "completo" if report.complete else "incompleto (max-keys alcanzado)"
+    print(
+        f"\n{report.scanned_keys} claves recorridas, {report.sampled_keys} inspeccionadas "
+        f"(muestreo {report.sample_rate:g}) en {report.duration_seconds}s; recorrido {status}"
+    )
+    for prefix, stats in estimated:
+        if stats.largest_key:
+            print(f"  {prefix}: clave más grande {stats.largest_key} ({stats.largest_key_bytes} bytes)")
+
+
+async def _main(args: argparse.Namespace) -> None:
+    workload = RedisWorkload(args.workload)
+    try:
+        report = await audit_keyspace(
+            get_redis_client(workload),
+            workload=workload.value,
+            match=args.match,
+            sample_rate=args.sample_rate,
+            batch_size=args.batch_size,
+            pause_seconds=args.pause_ms / 1000,
+            max_keys=args.max_keys,
+            memory_samples=args.memory_samples,
+        )
+    finally:
+        await close_redis_pools()
+    _print_report(report)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workload", choices=[w.value for w in RedisWorkload], default=RedisWorkload.SESSIONS.value)
+    parser.add_argument("--match", default=None, help="Patrón de SCAN (por defecto, todas las claves)")
+    parser.add_argument("--sample-rate", type=float, default=1.0, help="Fracción de claves inspeccionadas")
+    parser.add_argument("--batch-size", type=int, default=500, help="Claves por SCAN y por pipeline")
+    parser.add_argument("--pause-ms", type=float, default=10, help="Pausa entre páginas de SCAN")
+    parser.add_argument("--max-keys", type=int, default=None, help="Máximo de claves recorridas")
+    parser.add_argument("--memory-samples", type=int, default=5, help="SAMPLES de MEMORY USAGE (0 = exacto)")
+    asyncio.run(_main(parser.parse_args()))
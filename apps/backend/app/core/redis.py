@@ -1,15 +1,191 @@
-from typing import AsyncGenerator
-from redis.asyncio import Redis, ConnectionPool
-from functools import lru_cache
+"""
+Clientes de Redis por tipo de carga.
+
+Cada carga tiene su propio cliente (y opcionalmente su propia instancia o clúster de Redis) con
+límites, timeouts y política de reintentos independientes:
+
+- sessions: sesiones, índices por usuario y épocas de tokens. Debe ir en una instancia con
+  `maxmemory-policy noeviction`: perder una de estas claves cierra sesiones o deshace revocaciones.
+- cache: lista negra de tokens de acceso y canal de revocaciones. Consultas muy frecuentes y
+  pequeñas; admite una instancia con desalojo si se acepta que, bajo presión de memoria, una
+  revocación pueda perderse antes de que caduque el token de acceso.
+- ephemeral: códigos de un solo uso, estados de OAuth y contadores de intentos (ráfagas, TTL corto).
+- queues: cola de expiración de usuarios, locks e historial de tareas programadas.
+
+La configuración se lee de `REDIS_{CARGA}_{OPCIÓN}` (por ejemplo `REDIS_CACHE_URL` o
+`REDIS_SESSIONS_MODE`) con los valores generales `REDIS_{OPCIÓN}` por defecto. Cada carga puede
+usar un nodo único (`standalone`), un maestro descubierto por Sentinel (`sentinel`) o un
+Redis Cluster (`cluster`); las claves que se usan juntas comparten hash tag (ver
+`app.core.redis_keys`), así que los scripts Lua y los pipelines funcionan igual en los tres modos.
+"""
+
+from contextlib import asynccontextmanager
+from enum import Enum
+from typing import Any, AsyncGenerator, AsyncIterator, Union
+
+from redis.asyncio import BlockingConnectionPool, Redis
+from redis.asyncio.cluster import RedisCluster
+from redis.asyncio.connection import parse_url
+from redis.asyncio.retry import Retry
+from redis.asyncio.sentinel import Sentinel
+from redis.backoff import ExponentialBackoff
+from redis.exceptions import ConnectionError, TimeoutError
+
 from app.core.config import settings
+from app.core.utils.metrics import metrics
+
+RedisClient = Union[Redis, RedisCluster]
+
+
+class RedisWorkload(str, Enum):
+    SESSIONS = "sessions"
+    CACHE = "cache"
+    EPHEMERAL = "ephemeral"
+    QUEUES = "queues"
+
+    def __str__(self) -> str:
+        return self.value
+
+
+redis_pool_connections = metrics.gauge("zentora_redis_pool_connections", "Conexiones de cada pool de Redis por estado")
+
+_clients: dict[RedisWorkload, RedisClient] = {}
+
+
+def _connection_options(workload: RedisWorkload, config: dict[str, Any]) -> dict[str, Any]:
+    return {
+        "decode_responses": True,
+        "socket_timeout": config["socket_timeout"],
+        "socket_connect_timeout": config["connect_timeout"],
+        "socket_keepalive": True,
+        "health_check_interval": config["health_check_interval"],
+        "retry": Retry(
+            ExponentialBackoff(cap=config["retry_backoff_cap"], base=config["retry_backoff_base"]),
+            config["retry_attempts"],
+        ),
+        "retry_on_error": [ConnectionError, TimeoutError],
+        "client_name": f"zentora-{workload}",
+    }
+
+
+def _parse_sentinels(value: str) -> list[tuple[str, int]]:
+    sentinels = []
+    for address in filter(None, (item.strip() for item in value.split(","))):
+        host, _, port = address.rpartition(":")
+        sentinels.append((host, int(port)))
+    if not sentinels:
+        raise ValueError("REDIS_SENTINELS debe contener al menos un host:puerto")
+    return sentinels
+
+
+def _build_client(workload: RedisWorkload) -> RedisClient:
+    config = settings.redis_workload_config(str(workload))
+    options = _connection_options(workload, config)
+    mode = config["mode"]
+
+    if mode == "standalone":
+        # Cuando el pool se agota, las peticiones esperan en lugar de fallar
+        pool = BlockingConnectionPool.from_url(
+            config["url"], max_connections=config["max_connections"], timeout=config["pool_timeout"], **options
+        )
+        return Redis.from_pool(pool)
+
+    if mode == "sentinel":
+        # Usuario, contraseña y base de datos del maestro se toman de la URL de la carga
+        credentials = {k: v for k, v in parse_url(config["url"]).items() if k in ("username", "password", "db")}
+        sentinel = Sentinel(
+            _parse_sentinels(config["sentinels"]),
+            sentinel_kwargs={"socket_timeout": config["socket_timeout"]},
+        )
+        return sentinel.master_for(
+            config["sentinel_service"], max_connections=config["max_connections"], **credentials, **options
+        )
+
+    if mode == "cluster":
+        # max_connections es por nodo; los comandos se enrutan al nodo dueño del slot de cada clave
+        return RedisCluster.from_url(config["url"], max_connections=config["max_connections"], **options)
 
+    raise ValueError(f"Modo de Redis desconocido para {workload}: {mode}")
 
-@lru_cache()
-def get_redis_pool() -> ConnectionPool:
-    return ConnectionPool.from_url(settings.get_redis_url, decode_responses=True)
 
+def get_redis_client(workload: RedisWorkload = RedisWorkload.SESSIONS) -> RedisClient:
+    """
+    Cliente compartido de una carga. Es seguro usarlo desde varias corrutinas a la vez: cada
+    comando toma una conexión del pool y la devuelve al terminar.
+    """
+    client = _clients.get(workload)
+    if client is None:
+        client = _clients[workload] = _build_client(workload)
+    return client
 
-async def get_redis() -> AsyncGenerator[Redis, None]:
-    """Dependency for getting Redis connection."""
-    async with Redis(connection_pool=get_redis_pool()) as redis:
+
+@asynccontextmanager
+async def pubsub_client(workload: RedisWorkload) -> AsyncIterator[Redis]:
+    """
+    Cliente para suscribirse a canales de la carga.
+
+    En Redis Cluster un PUBLISH se difunde a todos los nodos, así que basta con suscribirse a
+    uno cualquiera con un cliente de nodo único, que se cierra al salir.
+    """
+    client = get_redis_client(workload)
+    if not isinstance(client, RedisCluster):
+        yield client
+        return
+
+    await client.initialize()
+    node = client.get_random_node()
+    config = settings.redis_workload_config(str(workload))
+    credentials = {k: v for k, v in parse_url(config["url"]).items() if k in ("username", "password")}
+    options = _connection_options(workload, config)
+    async with Redis(host=node.host, port=node.port, **credentials, **options) as node_client:
+        yield node_client
+
+
+async def _redis_dependency(workload: RedisWorkload) -> AsyncGenerator[RedisClient, None]:
+    yield get_redis_client(workload)
+
+
+async def get_redis() -> AsyncGenerator[RedisClient, None]:
+    """Dependency for getting Redis connection (sesiones)."""
+    async for redis in _redis_dependency(RedisWorkload.SESSIONS):
+        yield redis
+
+
+async def get_cache_redis() -> AsyncGenerator[RedisClient, None]:
+    """Dependencia para la lista negra y la caché."""
+    async for redis in _redis_dependency(RedisWorkload.CACHE):
+        yield redis
+
+
+async def get_ephemeral_redis() -> AsyncGenerator[RedisClient, None]:
+    """Dependencia para códigos de un solo uso y estados de OAuth."""
+    async for redis in _redis_dependency(RedisWorkload.EPHEMERAL):
+        yield redis
+
+
+async def get_queue_redis() -> AsyncGenerator[RedisClient, None]:
+    """Dependencia para colas y tareas programadas."""
+    async for redis in _redis_dependency(RedisWorkload.QUEUES):
         yield redis
+
+
+def _collect_pool_metrics() -> None:
+    for workload, client in list(_clients.items()):
+        # En modo cluster cada nodo tiene su propio pool; solo se exportan los de nodo único
+        pool = getattr(client, "connection_pool", None)
+        if pool is None:
+            continue
+        in_use = len(getattr(pool, "_in_use_connections", ()))
+        idle = len(getattr(pool, "_available_connections", ()))
+        redis_pool_connections.set(in_use, workload=workload, state="in_use")
+        redis_pool_connections.set(idle, workload=workload, state="idle")
+        redis_pool_connections.set(pool.max_connections, workload=workload, state="max")
+
+
+metrics.register_collector(_collect_pool_metrics)
+
+
+async def close_redis_pools() -> None:
+    while _clients:
+        _, client = _clients.popitem()
+        await client.aclose()
@@ -0,0 +1,149 @@
+"""
+Esquema de claves de Redis.
+
+En Redis Cluster un script Lua o un pipeline atómico solo puede tocar claves del mismo slot, y
+el slot se calcula con la parte de la clave entre llaves (hash tag) cuando la hay. Por eso las
+claves que se usan juntas comparten hash tag:
+
+- Todo lo de un usuario se etiqueta con su id: `user_sessions:{<user_id>}`,
+  `session:{<user_id>}:<sid>` y `token_version:{<user_id>}`. Listar, rotar o revocar sus
+  sesiones es un único script en un único nodo, sin repartir la consulta entre slots.
+- Los tokens de un solo uso que limitan intentos se etiquetan con su namespace
+  (`{email_verification}:<código>` y `otp_attempts:{email_verification}:<sujeto>`), porque el
+  script de consumo comprueba el contador y el token a la vez. Son pocos y de vida corta.
+
+Las claves que siempre se usan de una en una (lista negra, códigos temporales y estados de
+OAuth, nonces de códigos firmados, locks de tareas, cola de expiración) no llevan hash tag y se
+reparten libremente entre los nodos.
+
+Para pasar al nuevo esquema una instancia con claves del formato anterior:
+    python -m app.core.redis_keys
+
+Los hashes `refresh_token:<user_id>` de antes de las sesiones por dispositivo no se tocan: el
+endpoint de refresco los convierte en una sesión en su primer uso (ver `adopt_legacy_session`).
+"""
+
+import asyncio
+from uuid import UUID
+
+from redis.asyncio import Redis
+
+USER_SESSIONS_KEY_PREFIX = "user_sessions:"
+SESSION_KEY_PREFIX = "session:"
+TOKEN_VERSION_KEY_PREFIX = "token_version:"
+GLOBAL_EPOCH_KEY = "token_epoch:global"
+OTP_ATTEMPTS_KEY_PREFIX = "otp_attempts:"
+# Refresh token único por usuario de antes de las sesiones por dispositivo; no se migra: se
+# convierte en una sesión la primera vez que se usa y, si no, caduca con su TTL de 7 días
+LEGACY_REFRESH_KEY_PREFIX = "refresh_token:"
+
+
+def hash_tag(value: UUID | str) -> str:
+    return "{" + str(value) + "}"
+
+
+def tag_of(key: str) -> str | None:
+    """Retorna el contenido del hash tag de una clave, o None si no tiene."""
+    start = key.find("{")
+    end = key.find("}", start + 1)
+    if start == -1 or end == -1:
+        return None
+    return key[start + 1 : end]
+
+
+def user_sessions_key(user_id: UUID | str) -> str:
+    return f"{USER_SESSIONS_KEY_PREFIX}{hash_tag(user_id)}"
+
+
+def session_key_prefix(user_id: UUID | str) -> str:
+    return f"{SESSION_KEY_PREFIX}{hash_tag(user_id)}:"
+
+
+def session_key(user_id: UUID | str, sid: str) -> str:
+    return f"{session_key_prefix(user_id)}{sid}"
+
+
+def token_version_key(user_id: UUID | str) -> str:
+    return f"{TOKEN_VERSION_KEY_PREFIX}{hash_tag(user_id)}"
+
+
+def legacy_refresh_key(user_id: UUID | str) -> str:
+    return f"{LEGACY_REFRESH_KEY_PREFIX}{user_id}"
+
+
+def one_time_token_key(namespace: str, token: str, tagged: bool) -> str:
+    return f"{hash_tag(namespace) if tagged else namespace}:{token}"
+
+
+def otp_attempts_key(namespace: str, subject: str) -> str:
+    return f"{OTP_ATTEMPTS_KEY_PREFIX}{hash_tag(namespace)}:{subject}"
+
+
+async def _scan_legacy(redis: Redis, prefix: str):
+    async for key in redis.scan_iter(f"{prefix}*", count=1000):
+        if tag_of(key) is None:
+            yield key
+
+
+async def migrate_legacy_keys(redis: Redis, tagged_namespaces: tuple[str, ...]) -> dict[str, int]:
+    """
+    Renombra las claves del formato anterior (sin hash tag) al esquema actual.
+
+    Es idempotente y conserva los TTL (RENAME los mantiene). Debe ejecutarse contra la instancia
+    antigua, antes de pasar a Redis Cluster: RENAME exige que origen y destino estén en el
+    mismo slot.
+    """
+    migrated = {"sessions": 0, "token_versions": 0, "one_time_tokens": 0}
+
+    async for index_key in _scan_legacy(redis, USER_SESSIONS_KEY_PREFIX):
+        user_id = index_key[len(USER_SESSIONS_KEY_PREFIX) :]
+        for sid in await redis.zrange(index_key, 0, -1):
+            if await redis.exists(f"{SESSION_KEY_PREFIX}{sid}"):
+                await redis.rename(f"{SESSION_KEY_PREFIX}{sid}", session_key(user_id, sid))
+                migrated["sessions"] += 1
+        # Fusiona con el índice nuevo por si el usuario ya inició sesión tras el despliegue
+        await redis.zunionstore(user_sessions_key(user_id), [index_key, user_sessions_key(user_id)], aggregate="MAX")
+        ttl = await redis.ttl(index_key)
+        if ttl > 0:
+            await redis.expire(user_sessions_key(user_id), ttl)
+        await redis.delete(index_key)
+
+    async for version_key in _scan_legacy(redis, TOKEN_VERSION_KEY_PREFIX):
+        user_id = version_key[len(TOKEN_VERSION_KEY_PREFIX) :]
+        # Nunca se baja una versión que ya se haya publicado con el formato nuevo
+        if not await redis.renamenx(version_key, token_version_key(user_id)):
+            legacy, current = await redis.mget(version_key, token_version_key(user_id))
+            if int(legacy or 0) > int(current or 0):
+                await redis.set(token_version_key(user_id), legacy, keepttl=True)
+            await redis.delete(version_key)
+        migrated["token_versions"] += 1
+
+    for namespace in tagged_namespaces:
+        async for token_key in _scan_legacy(redis, f"{namespace}:"):
+            token = token_key[len(namespace) + 1 :]
+            await redis.renamenx(token_key, one_time_token_key(namespace, token, tagged=True))
+            await redis.delete(token_key)
+            migrated["one_time_tokens"] += 1
+        async for attempts_key in _scan_legacy(redis, f"{OTP_ATTEMPTS_KEY_PREFIX}{namespace}:"):
+            await redis.delete(attempts_key)
+
+    return migrated
+
+
+async def _main() -> None:
+    from app.core.auth.one_time_tokens import TAGGED_NAMESPACES
+    from app.core.redis import RedisWorkload, close_redis_pools, get_redis_client
+
+    try:
+        sessions = await migrate_legacy_keys(get_redis_client(RedisWorkload.SESSIONS), ())
+        ephemeral = await migrate_legacy_keys(get_redis_client(RedisWorkload.EPHEMERAL), TAGGED_NAMESPACES)
+    finally:
+        await close_redis_pools()
+    print(
+        f"Sesiones: {sessions['sessions']}, versiones de token: {sessions['token_versions']}, "
+        f"tokens de un solo uso: {ephemeral['one_time_tokens']}"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
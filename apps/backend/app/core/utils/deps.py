@@ -1,21 +1,26 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from redis.asyncio import Redis
-from app.core.redis import get_redis
+from app.core.auth.denylist import is_token_denied
+from app.core.auth.security import decode_token
+from app.core.auth.token_epochs import token_epochs_valid
+from app.core.redis import get_cache_redis, get_redis
 
 security = HTTPBearer()
 
 
 async def verify_token_not_blacklisted(
-    credentials: HTTPAuthorizationCredentials = Depends(security), redis: Redis = Depends(get_redis)
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    redis: Redis = Depends(get_redis),
+    cache_redis: Redis = Depends(get_cache_redis),
 ) -> str:
     """
-    Verifica que el token de acceso no esté en la lista negra.
+    Verifica que el token de acceso no esté en la lista negra ni haya sido emitido antes de
+    una revocación masiva (del usuario o global).
     """
     token = credentials.credentials
-    is_blacklisted = await redis.get(f"blacklisted_token:{token}")
-
-    if is_blacklisted:
+    payload = decode_token(token)
+    if await is_token_denied(cache_redis, token) or (payload and not await token_epochs_valid(redis, payload)):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Token inválido o expirado",
@@ -23,3 +28,18 @@ async def verify_token_not_blacklisted(
         )
 
     return token
+
+
+async def require_admin(token: str = Depends(verify_token_not_blacklisted)) -> dict:
+    """Exige un token de acceso válido con rol de administrador y retorna su payload."""
+    payload = decode_token(token)
+    if not payload or "sub" not in payload or "role" not in payload:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token inválido o mal formado")
+
+    if payload["role"].lower() != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="No tienes permisos suficientes para realizar esta acción",
+        )
+
+    return payload
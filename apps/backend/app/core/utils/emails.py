@@ -0,0 +1,8 @@
+def normalize_email(email: str) -> str:
+    """
+    Forma canónica de un email: sin espacios alrededor y en minúsculas.
+
+    Es la forma en que se guardan los emails en users y la que se compara contra el índice
+    funcional `lower(email)`, de modo que `Foo@Example.com` y `foo@example.com` son la misma cuenta.
+    """
+    return email.strip().lower()
@@ -26,3 +26,13 @@ class AuthProvider(str, Enum):
 
     def __str__(self) -> str:
         return self.value
+
+
+class OutboxEventType(str, Enum):
+    USER_REGISTERED = "user.registered"
+    PASSWORD_CHANGED = "password.changed"
+    ACCOUNT_DELETED = "account.deleted"
+    SESSION_REVOKED = "session.revoked"
+
+    def __str__(self) -> str:
+        return self.value
@@ -0,0 +1,129 @@
+import asyncio
+import time
+from contextlib import contextmanager
+from enum import Enum
+from typing import Iterator
+
+
+class TokenBucket:
+    """
+    Limitador de tasa del lado del cliente basado en un token bucket.
+
+    Los tokens se recargan de forma continua a `rate` tokens por segundo hasta un máximo
+    de `capacity`. `acquire` espera (sin bloquear el event loop) hasta que haya tokens.
+    """
+
+    def __init__(self, rate: float, capacity: int):
+        if rate <= 0 or capacity <= 0:
+            raise ValueError("rate y capacity deben ser mayores que cero")
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    async def acquire(self, tokens: int = 1) -> None:
+        """Consume `tokens` del bucket, esperando lo necesario para respetar la tasa."""
+        if tokens > self.capacity:
+            raise ValueError("No se pueden solicitar más tokens que la capacidad del bucket")
+
+        async with self._lock:
+            self._refill()
+            while self._tokens < tokens:
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= tokens
+
+    def penalize(self, seconds: float) -> None:
+        """Vacía el bucket durante `seconds` (por ejemplo, al recibir un Retry-After del proveedor)."""
+        self._tokens = min(self._tokens, -seconds * self.rate)
+        self._updated_at = time.monotonic()
+
+
+class CircuitState(str, Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __str__(self) -> str:
+        return self.value
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker para dependencias externas.
+
+    Tras `failure_threshold` fallos consecutivos el circuito se abre y rechaza las llamadas
+    durante `reset_timeout` segundos. Después deja pasar una única llamada de prueba
+    (half-open): si tiene éxito se cierra, si falla vuelve a abrirse.
+
+    Las llamadas deben hacerse dentro de `guard()`: si la llamada de prueba termina sin registrar
+    resultado (cancelada o con una excepción que no cuenta como fallo), el hueco de prueba se
+    libera al salir. Como última defensa, una prueba sin resultado tras `probe_timeout` segundos
+    (por defecto `reset_timeout`) deja de bloquear la siguiente.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0, probe_timeout: float | None = None):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.probe_timeout = reset_timeout if probe_timeout is None else probe_timeout
+        self._failures = 0
+        self._opened_at: float | None = None
+        self._probe: object | None = None
+        self._probe_started_at = 0.0
+
+    @property
+    def state(self) -> CircuitState:
+        if self._opened_at is None:
+            return CircuitState.CLOSED
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return CircuitState.HALF_OPEN
+        return CircuitState.OPEN
+
+    def _probe_in_flight(self) -> bool:
+        return self._probe is not None and time.monotonic() - self._probe_started_at < self.probe_timeout
+
+    def _acquire(self) -> tuple[bool, object | None]:
+        state = self.state
+        if state == CircuitState.CLOSED:
+            return True, None
+        if state == CircuitState.HALF_OPEN and not self._probe_in_flight():
+            self._probe = object()
+            self._probe_started_at = time.monotonic()
+            return True, self._probe
+        return False, None
+
+    def allow_request(self) -> bool:
+        """Indica si se puede realizar una llamada a la dependencia protegida."""
+        return self._acquire()[0]
+
+    @contextmanager
+    def guard(self) -> Iterator[bool]:
+        """
+        Envuelve una llamada a la dependencia protegida y produce si está permitida.
+
+        Si esta llamada era la de prueba y sale sin `record_success`/`record_failure`, el hueco de
+        prueba se libera para que la siguiente llamada pueda probar de nuevo.
+        """
+        allowed, probe = self._acquire()
+        try:
+            yield allowed
+        finally:
+            if probe is not None and self._probe is probe:
+                self._probe = None
+
+    def record_success(self) -> None:
+        self._failures = 0
+        self._opened_at = None
+        self._probe = None
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        self._probe = None
+        if self._opened_at is not None or self._failures >= self.failure_threshold:
+            self._opened_at = time.monotonic()
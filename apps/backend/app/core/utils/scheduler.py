@@ -1,37 +1,245 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import socket
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, UTC
+from secrets import token_hex
+from typing import Any, Awaitable, Callable
+
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.triggers.base import BaseTrigger
 from apscheduler.triggers.cron import CronTrigger
 from fastapi import FastAPI
-from sqlalchemy.ext.asyncio import AsyncSession
 from redis.asyncio import Redis
+from sqlalchemy import ColumnElement, Text, cast, func, true
 
+from app.core.config import settings
 from app.core.email.email_verification import cleanup_expired_unverified_users
-from app.db.deps import get_db
-from app.core.redis import get_redis
+from app.core.redis import RedisWorkload, get_redis_client
+from app.core.utils.metrics import metrics
+from app.db.base import AsyncSessionLocal
+from app.db.models.user import User as UserModel
+
+logger = logging.getLogger(__name__)
 
 scheduler = AsyncIOScheduler()
 
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+JOB_HISTORY_LENGTH = 100
+
+# Renueva el lease solo si sigue perteneciendo a este worker
+RENEW_LEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+job_runs_total = metrics.counter("zentora_job_runs_total", "Ejecuciones de tareas programadas por estado")
+job_duration_seconds = metrics.histogram("zentora_job_duration_seconds", "Duración de las tareas programadas")
+job_last_success_timestamp = metrics.gauge(
+    "zentora_job_last_success_timestamp", "Momento de la última ejecución correcta de cada tarea"
+)
+
+
+@dataclass(frozen=True)
+class JobShard:
+    """
+    Porción de una tarea: las filas cuya clave cae en el shard `index` de `total` según un hash.
+
+    Se reparte por `hashtext(clave::text) mod total` y no por rangos del espacio de claves: los
+    rangos solo se equilibran si las claves están distribuidas uniformemente, y los UUIDv7 (con el
+    timestamp en los bits altos) caerían todos en el mismo shard. El hash equilibra los shards sea
+    cual sea la distribución de las claves.
+    """
+
+    index: int
+    total: int
+
+    def condition(self, key: ColumnElement) -> ColumnElement[bool]:
+        """Condición SQL que selecciona las filas de este shard según la columna `key`."""
+        if self.total <= 1:
+            return true()
+        # hashtext devuelve un int4 con signo: la máscara lo deja en [0, 2^31) antes del módulo
+        bucket = func.hashtext(cast(key, Text)).op("&")(0x7FFFFFFF) % self.total
+        return bucket == self.index
+
+
+JobFunc = Callable[[JobShard], Awaitable[Any]]
+
+
+def scheduled_fire_time(trigger: BaseTrigger, now: datetime, window_seconds: int) -> datetime:
+    """
+    Hora programada del disparo en curso: el último disparo del trigger que no es posterior a `now`.
+
+    APScheduler no pasa esa hora a la tarea, así que se recalcula desde el trigger mirando hacia
+    atrás como mucho `window_seconds`. Todos los workers obtienen la misma hora aunque ejecuten el
+    disparo con retraso. Si no hay ningún disparo en la ventana, retorna `now`.
+    """
+    fire_time = trigger.get_next_fire_time(None, now - timedelta(seconds=window_seconds))
+    if fire_time is None or fire_time > now:
+        return now
+    while True:
+        following = trigger.get_next_fire_time(fire_time, fire_time + timedelta(microseconds=1))
+        if following is None or following > now:
+            return fire_time
+        fire_time = following
+
+
+@dataclass
+class ScheduledJob:
+    job_id: str
+    func: JobFunc
+    trigger: BaseTrigger
+    shards: int = 1
+    lease_seconds: int = 300
+    # Retraso máximo con el que un disparo se reconoce como la ejecución programada, y tiempo que
+    # se conserva su lock para que ningún otro worker la repita
+    dedupe_seconds: int = 600
+
+
+class JobRunner:
+    """
+    Ejecuta tareas periódicas de forma segura en un clúster de workers y réplicas.
 
-async def cleanup_users_job():
-    """Tarea programada para limpiar usuarios no verificados."""
-    # Obtener conexiones de DB y Redis
-    async for db in get_db():
-        async for redis in get_redis():
+    APScheduler sigue actuando como reloj en cada worker, pero cada disparo debe reclamar
+    un lock por ejecución (`job_lock:{job}:{slot}:{shard}`) con SET NX en Redis antes de
+    trabajar. Así cada shard de cada ejecución corre exactamente en un worker, y las tareas
+    con varios shards se reparten entre todos los workers que reciben el disparo. El lock
+    es un lease que se renueva mientras la tarea sigue viva; si el worker muere, expira.
+    """
+
+    def __init__(self):
+        self.jobs: dict[str, ScheduledJob] = {}
+
+    def register(
+        self,
+        job_id: str,
+        func: JobFunc,
+        trigger: BaseTrigger,
+        shards: int = 1,
+        lease_seconds: int = 300,
+        dedupe_seconds: int = 600,
+    ) -> ScheduledJob:
+        job = ScheduledJob(job_id, func, trigger, shards, lease_seconds, dedupe_seconds)
+        self.jobs[job_id] = job
+        scheduler.add_job(self.run, trigger, args=[job_id], id=job_id, replace_existing=True)
+        return job
+
+    async def run(self, job_id: str, scheduled_at: datetime | None = None) -> None:
+        """
+        Intenta ejecutar todos los shards libres de la ejecución programada para `scheduled_at`.
+
+        Sin `scheduled_at` se toma la hora programada del disparo en curso según el trigger. La
+        ejecución se identifica por esa hora y no por la de llegada, para que un disparo tardío en
+        otro worker reclame los mismos locks.
+        """
+        job = self.jobs[job_id]
+        if scheduled_at is None:
+            scheduled_at = scheduled_fire_time(job.trigger, datetime.now(UTC), job.dedupe_seconds)
+        slot = int(scheduled_at.timestamp())
+        shard_indexes = list(range(job.shards))
+        # Orden aleatorio para que los workers no compitan siempre por el mismo shard
+        random.shuffle(shard_indexes)
+
+        redis = get_redis_client(RedisWorkload.QUEUES)
+        for index in shard_indexes:
+            await self._run_shard(redis, job, slot, JobShard(index, job.shards))
+
+    async def _run_shard(self, redis: Redis, job: ScheduledJob, slot: int, shard: JobShard) -> None:
+        lock_key = f"job_lock:{job.job_id}:{slot}:{shard.index}"
+        token = f"{WORKER_ID}:{token_hex(4)}"
+        lease_ms = job.lease_seconds * 1000
+
+        if not await redis.set(lock_key, token, nx=True, px=lease_ms):
+            job_runs_total.inc(job=job.job_id, status="skipped")
+            return
+
+        renewer = asyncio.create_task(self._renew_lease(redis, lock_key, token, lease_ms))
+        started_at = datetime.now(UTC)
+        started = time.monotonic()
+        status, error, result = "success", None, None
+        try:
+            result = await job.func(shard)
+        except Exception as e:
+            status, error = "failure", str(e)
+            logger.error(f"Error en la tarea {job.job_id} (shard {shard.index}/{shard.total}): {error}")
+        finally:
+            renewer.cancel()
+
+        duration = time.monotonic() - started
+        job_runs_total.inc(job=job.job_id, status=status)
+        job_duration_seconds.observe(duration, job=job.job_id)
+        if status == "success":
+            job_last_success_timestamp.set(time.time(), job=job.job_id)
+
+        # Mantener el lock hasta el fin de la ventana para que ningún otro worker repita esta ejecución
+        await redis.pexpire(lock_key, job.dedupe_seconds * 1000)
+        await self._record_history(
+            redis,
+            job.job_id,
+            {
+                "slot": slot,
+                "shard": shard.index,
+                "shards": shard.total,
+                "worker": WORKER_ID,
+                "started_at": started_at.isoformat(),
+                "duration_seconds": round(duration, 3),
+                "status": status,
+                "result": result if isinstance(result, (int, float, str)) else None,
+                "error": error,
+            },
+        )
+
+    async def _renew_lease(self, redis: Redis, lock_key: str, token: str, lease_ms: int) -> None:
+        while True:
+            await asyncio.sleep(lease_ms / 3000)
             try:
-                count = await cleanup_expired_unverified_users(db, redis)
-                print(f"Tarea programada: Se eliminaron {count} usuarios no verificados")
+                if not await redis.eval(RENEW_LEASE_SCRIPT, 1, lock_key, token, lease_ms):
+                    logger.warning(f"Se perdió el lease de {lock_key}")
+                    return
             except Exception as e:
-                print(f"Error en tarea programada de limpieza: {e}")
-            finally:
-                await db.close()
-                await redis.close()
+                logger.warning(f"No se pudo renovar el lease de {lock_key}: {str(e)}")
+
+    async def _record_history(self, redis: Redis, job_id: str, entry: dict[str, Any]) -> None:
+        key = f"job_history:{job_id}"
+        async with redis.pipeline(transaction=False) as pipe:
+            pipe.lpush(key, json.dumps(entry))
+            pipe.ltrim(key, 0, JOB_HISTORY_LENGTH - 1)
+            await pipe.execute()
+
+
+async def get_job_history(redis: Redis, job_id: str, limit: int = 20) -> list[dict[str, Any]]:
+    """Retorna las últimas ejecuciones registradas de una tarea, de la más reciente a la más antigua."""
+    entries = await redis.lrange(f"job_history:{job_id}", 0, limit - 1)
+    return [json.loads(entry) for entry in entries]
+
+
+job_runner = JobRunner()
+
+
+async def cleanup_users_job(shard: JobShard) -> int:
+    """Tarea programada para limpiar los usuarios no verificados del shard (hash del id)."""
+    async with AsyncSessionLocal() as db:
+        redis = get_redis_client(RedisWorkload.QUEUES)
+        count = await cleanup_expired_unverified_users(db, redis, shard_condition=shard.condition(UserModel.id))
+    logger.info(f"Tarea programada: Se eliminaron {count} usuarios no verificados (shard {shard.index})")
+    return count
 
 
 def init_scheduler(app: FastAPI):
-    """Inicializa el scheduler y añade las tareas programadas."""
+    """Inicializa el scheduler y registra las tareas periódicas en el runner distribuido."""
 
-    # Añadir tarea de limpieza para ejecutar cada día a las 00:00
-    scheduler.add_job(
-        cleanup_users_job, CronTrigger(hour=0, minute=0), id="cleanup_unverified_users", replace_existing=True
+    # Barrido de reconciliación diario a las 00:00, repartido en shards entre los workers
+    job_runner.register(
+        "cleanup_unverified_users",
+        cleanup_users_job,
+        CronTrigger(hour=0, minute=0),
+        shards=settings.CLEANUP_UNVERIFIED_SHARDS,
     )
 
     # Eventos de inicio y apagado
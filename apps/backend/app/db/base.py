@@ -3,18 +3,80 @@ Database configuration and session management.
 All models should be imported here for Alembic to detect them.
 """
 
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine.interfaces import CacheStats
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.orm import Session, sessionmaker
 
 from app.core.config import settings
+from app.core.utils.metrics import metrics
 from app.db.base_class import Base  # noqa: F401
 from app.db.models.user import User  # noqa: F401
+from app.db.models.outbox import OutboxEvent  # noqa: F401
 
 # Create async engine
-engine = create_async_engine(settings.async_database_url, echo=settings.DEBUG, future=True)
+engine = create_async_engine(
+    settings.async_database_url,
+    echo=settings.DEBUG,
+    future=True,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    query_cache_size=settings.DB_COMPILED_CACHE_SIZE,
+    connect_args={"prepared_statement_cache_size": settings.DB_PREPARED_STATEMENT_CACHE_SIZE},
+)
 
 # Create async session factory
 AsyncSessionLocal = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False, autoflush=False)
 
-# Create the base class for models
-Base = declarative_base()
+sql_compile_cache_total = metrics.counter(
+    "zentora_sql_compile_cache_total",
+    "Sentencias ejecutadas según el resultado de la caché de compilación de SQLAlchemy (hit, miss, ...)",
+)
+sql_compile_cache_entries = metrics.gauge(
+    "zentora_sql_compile_cache_entries", "Sentencias compiladas en la caché del engine"
+)
+db_connection_hold_seconds = metrics.histogram(
+    "zentora_db_connection_hold_seconds",
+    "Tiempo que una sesión retiene su conexión (de la primera sentencia al commit/rollback), por ruta",
+)
+db_pool_connections = metrics.gauge("zentora_db_pool_connections", "Conexiones del pool de Postgres por estado")
+
+
+@event.listens_for(engine.sync_engine, "before_cursor_execute")
+def _count_compile_cache(conn, cursor, statement, parameters, context, executemany):
+    cache_hit = getattr(context, "cache_hit", None)
+    if isinstance(cache_hit, CacheStats):
+        sql_compile_cache_total.inc(result=cache_hit.name.lower())
+
+
+@event.listens_for(Session, "after_begin")
+def _start_connection_hold(session, transaction, connection):
+    session.info.setdefault("connection_acquired_at", time.monotonic())
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _end_connection_hold(session, transaction):
+    # Al terminar la transacción raíz la sesión devuelve la conexión al pool
+    if transaction.parent is not None:
+        return
+    acquired_at = session.info.pop("connection_acquired_at", None)
+    if acquired_at is not None:
+        route = session.info.get("route", "background")
+        db_connection_hold_seconds.observe(time.monotonic() - acquired_at, route=route)
+
+
+def _collect_db_metrics() -> None:
+    cache = engine.sync_engine._compiled_cache
+    sql_compile_cache_entries.set(len(cache) if cache is not None else 0)
+
+    pool = engine.sync_engine.pool
+    if hasattr(pool, "checkedout"):
+        db_pool_connections.set(pool.checkedout(), state="in_use")
+        db_pool_connections.set(pool.checkedin(), state="idle")
+        db_pool_connections.set(pool.size() + settings.DB_MAX_OVERFLOW, state="max")
+
+
+metrics.register_collector(_collect_db_metrics)
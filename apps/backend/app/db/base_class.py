@@ -1,4 +1,5 @@
-from typing import Any
+from operator import attrgetter
+from typing import Any, Callable
 from sqlalchemy.orm import DeclarativeBase, declared_attr
 
 
@@ -12,7 +13,18 @@ class Base(DeclarativeBase):
 
     def dict(self) -> dict[str, Any]:
         """Convert model to dictionary."""
-        return {
-            column.name: getattr(self, column.name)
-            for column in self.__table__.columns
-        }
+        names, getter = self._dict_columns()
+        return {name: value for name, value in zip(names, getter(self))}
+
+    @classmethod
+    def _dict_columns(cls) -> tuple[tuple[str, ...], Callable[[Any], tuple]]:
+        """Column names and a single attrgetter for them, computed once per model."""
+        cached = cls.__dict__.get("_dict_columns_cache")
+        if cached is None:
+            names = tuple(column.name for column in cls.__table__.columns)
+            fetch = attrgetter(*names)
+            # attrgetter with one name returns the bare value instead of a tuple
+            getter = fetch if len(names) > 1 else lambda obj: (fetch(obj),)
+            cached = (names, getter)
+            cls._dict_columns_cache = cached
+        return cached
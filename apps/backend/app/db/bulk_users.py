@@ -0,0 +1,447 @@
+"""
+Importación y exportación masiva de usuarios con COPY.
+
+Importación (CSV con cabecera o NDJSON): las filas se validan y se agrupan en lotes; las contraseñas
+en claro se hashean en paralelo en un pool de procesos (bcrypt es CPU puro) y las que ya vienen en
+bcrypt (`password_hash`) se guardan tal cual. Cada lote se copia con COPY a una tabla temporal y de
+ahí pasa a users con un único INSERT ... ON CONFLICT sobre lower(email):
+
+- `--on-conflict skip`: las cuentas existentes no se tocan.
+- `--on-conflict update`: se actualizan nombre, bio, avatar, provider_id y contraseña cuando la
+  fila los trae. Rol, estado, verificación y proveedor de una cuenta existente no cambian.
+
+Antes del INSERT se retiran del lote las filas cuyo (provider, provider_id) ya está vinculado a otra
+cuenta, o a otra fila anterior del mismo lote: violarían ux_users_provider_provider_id y abortarían
+la importación. Esas filas van al fichero de rechazos.
+
+Las cuentas importadas no pasan por /register: no se envían correos de verificación y, si no se
+indica otra cosa, entran verificadas y activas (una cuenta no verificada la borraría el barrido de
+limpieza a las 24 horas).
+
+Exportación: COPY ... TO STDOUT por tramos de (created_at, id), escritos directamente al fichero
+sin cargar la tabla en memoria. Sin `--include-password-hashes` no se exportan los hashes.
+
+Ambas operaciones guardan un checkpoint tras cada lote confirmado y, si se relanzan con el mismo
+fichero, continúan desde él.
+
+Uso:
+    python -m app.db.bulk_users import partner.csv --on-conflict skip --workers 8
+    python -m app.db.bulk_users export users.ndjson --format ndjson
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import logging
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from itertools import islice
+from pathlib import Path
+from typing import Any, Iterator
+from uuid import UUID
+
+import asyncpg
+from pydantic import TypeAdapter, ValidationError
+
+from app.core.auth.security import get_password_hash
+from app.core.config import settings
+from app.core.utils.enums import AuthProvider, UserRole, UserStatus
+from app.core.utils.ids import uuid7
+from app.schemas.user import NormalizedEmail
+
+logger = logging.getLogger(__name__)
+
+BCRYPT_HASH = re.compile(r"^\$2[aby]\$\d{2}\$[./A-Za-z0-9]{53}$")
+TRUE_VALUES = {"1", "true", "t", "yes", "y", "si", "sí"}
+
+STAGING_TABLE = "users_import"
+IMPORT_COLUMNS = (
+    "id", "email", "password", "full_name", "role", "bio", "avatar_url",
+    "is_verified", "status", "provider", "provider_id", "created_at",
+)
+EXPORT_COLUMNS = (
+    "id", "email", "full_name", "role", "bio", "avatar_url", "is_verified",
+    "status", "provider", "provider_id", "last_login_at", "created_at", "updated_at",
+)
+
+INSERT_SQL = f"""
+INSERT INTO users ({", ".join(IMPORT_COLUMNS)}, updated_at)
+SELECT id, email, password, full_name, role, bio, avatar_url, is_verified, status, provider, provider_id,
+       coalesce(created_at, CURRENT_TIMESTAMP), CURRENT_TIMESTAMP
+FROM {STAGING_TABLE}
+ON CONFLICT ((lower(email))) {{action}}
+RETURNING (xmax = 0) AS inserted
+"""
+# Filas que escribirían un (provider, provider_id) ya usado. Con `update` una cuenta existente
+# conserva su proveedor, así que el par a comprobar es el de la cuenta; con `skip` no se escribe nada
+PROVIDER_CONFLICTS_SQL = f"""
+WITH target AS (
+    SELECT staged.id, staged.provider_id, existing.id AS existing_id,
+           CASE WHEN existing.id IS NULL THEN staged.provider ELSE existing.provider END AS provider
+    FROM {STAGING_TABLE} AS staged
+    LEFT JOIN users AS existing ON lower(existing.email) = lower(staged.email)
+    WHERE staged.provider_id IS NOT NULL AND (existing.id IS NULL OR $1)
+), conflicts AS (
+    SELECT target.id FROM target
+    WHERE EXISTS (
+        SELECT 1 FROM users
+        WHERE users.provider = target.provider AND users.provider_id = target.provider_id
+          AND users.id IS DISTINCT FROM target.existing_id
+    ) OR EXISTS (
+        SELECT 1 FROM target AS earlier
+        WHERE earlier.provider = target.provider AND earlier.provider_id = target.provider_id
+          AND earlier.id < target.id
+    )
+)
+DELETE FROM {STAGING_TABLE} AS staged USING conflicts
+WHERE staged.id = conflicts.id
+RETURNING staged.email, staged.provider, staged.provider_id
+"""
+ON_CONFLICT_ACTIONS = {
+    "skip": "DO NOTHING",
+    "update": """DO UPDATE SET
+        full_name = coalesce(EXCLUDED.full_name, users.full_name),
+        bio = coalesce(EXCLUDED.bio, users.bio),
+        avatar_url = coalesce(EXCLUDED.avatar_url, users.avatar_url),
+        provider_id = coalesce(EXCLUDED.provider_id, users.provider_id),
+        password = coalesce(EXCLUDED.password, users.password),
+        updated_at = CURRENT_TIMESTAMP""",
+}
+
+_email_adapter = TypeAdapter(NormalizedEmail)
+
+
+@dataclass
+class ImportCheckpoint:
+    source: str
+    rows_read: int = 0
+    inserted: int = 0
+    updated: int = 0
+    skipped: int = 0
+    rejected: int = 0
+    completed: bool = False
+
+
+@dataclass
+class ExportCheckpoint:
+    destination: str
+    offset: int = 0
+    rows: int = 0
+    last_created_at: str | None = None
+    last_id: str | None = None
+    completed: bool = False
+
+
+def _load_checkpoint(path: Path, cls, **identity):
+    if not path.exists():
+        return cls(**identity)
+    checkpoint = cls(**json.loads(path.read_text()))
+    for name, value in identity.items():
+        if getattr(checkpoint, name) != value:
+            raise SystemExit(f"El checkpoint {path} corresponde a otro fichero ({getattr(checkpoint, name)})")
+    return checkpoint
+
+
+def _save_checkpoint(path: Path, checkpoint) -> None:
+    # Escritura atómica: un corte a mitad nunca deja un checkpoint a medias
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_text(json.dumps(asdict(checkpoint)))
+    os.replace(tmp, path)
+
+
+async def _connect() -> asyncpg.Connection:
+    return await asyncpg.connect(settings.sync_database_url)
+
+
+def _read_rows(path: Path, fmt: str) -> Iterator[dict[str, Any]]:
+    with path.open(newline="", encoding="utf-8") as f:
+        if fmt == "csv":
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def _text(row: dict[str, Any], name: str) -> str | None:
+    value = row.get(name)
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def _default_status(is_verified: bool) -> UserStatus:
+    return UserStatus.ACTIVE if is_verified else UserStatus.INACTIVE
+
+
+def _prepare(row: dict[str, Any]) -> tuple[dict[str, Any] | None, str | None]:
+    """Valida una fila de entrada; retorna (registro, None) o (None, motivo del rechazo)."""
+    try:
+        email = _email_adapter.validate_python(_text(row, "email") or "")
+    except ValidationError:
+        return None, "email inválido"
+
+    password_hash = _text(row, "password_hash")
+    if password_hash and not BCRYPT_HASH.match(password_hash):
+        return None, "password_hash no es un hash bcrypt"
+
+    verified = _text(row, "is_verified")
+    is_verified = True if verified is None else verified.lower() in TRUE_VALUES
+    status, created_at = _text(row, "status"), _text(row, "created_at")
+    try:
+        record = {
+            "id": uuid7(),
+            "email": email,
+            "password": password_hash,
+            "plain_password": None if password_hash else _text(row, "password"),
+            "full_name": _text(row, "full_name"),
+            "role": UserRole((_text(row, "role") or UserRole.USER.value).upper()).value,
+            "bio": _text(row, "bio"),
+            "avatar_url": _text(row, "avatar_url"),
+            "is_verified": is_verified,
+            "status": UserStatus(status.lower() if status else _default_status(is_verified)).value,
+            "provider": AuthProvider((_text(row, "provider") or AuthProvider.LOCAL.value).lower()).value,
+            "provider_id": _text(row, "provider_id"),
+            "created_at": datetime.fromisoformat(created_at) if created_at else None,
+        }
+    except ValueError as e:
+        return None, str(e)
+    return record, None
+
+
+def _hash_password(password: str) -> str | None:
+    # Se ejecuta en los procesos del pool. Una contraseña que bcrypt no acepta rechaza solo su fila
+    try:
+        return get_password_hash(password)
+    except ValueError:
+        return None
+
+
+async def _hash_passwords(pool: ProcessPoolExecutor, workers: int, records: list[dict[str, Any]]) -> None:
+    pending = [record for record in records if record["plain_password"]]
+    if not pending:
+        return
+    passwords = [record["plain_password"] for record in pending]
+    chunksize = max(1, len(pending) // (workers * 4))
+    # pool.map bloquea hasta tener todos los hashes: se espera en un hilo para no bloquear el bucle
+    hashes = await asyncio.to_thread(lambda: list(pool.map(_hash_password, passwords, chunksize=chunksize)))
+    for record, hashed in zip(pending, hashes):
+        record["password"] = hashed
+        if hashed is None:
+            record["rejected"] = "contraseña no válida para bcrypt"
+
+
+async def _write_batch(connection: asyncpg.Connection, records: list[dict[str, Any]], on_conflict: str):
+    """
+    Copia el lote a la tabla temporal y lo pasa a users.
+
+    Retorna (insertados, actualizados, filas retiradas por un provider_id ya vinculado a otra cuenta).
+    """
+    # Dentro de un lote, una cuenta repetida solo puede aparecer una vez en el ON CONFLICT
+    unique = {record["email"]: record for record in records}
+    async with connection.transaction():
+        await connection.copy_records_to_table(
+            STAGING_TABLE,
+            records=[tuple(record[column] for column in IMPORT_COLUMNS) for record in unique.values()],
+            columns=IMPORT_COLUMNS,
+        )
+        conflicts = await connection.fetch(PROVIDER_CONFLICTS_SQL, on_conflict == "update")
+        results = await connection.fetch(INSERT_SQL.format(action=ON_CONFLICT_ACTIONS[on_conflict]))
+    inserted = sum(1 for row in results if row["inserted"])
+    return inserted, len(results) - inserted, [dict(row) for row in conflicts]
+
+
+async def import_users(
+    path: Path,
+    fmt: str,
+    on_conflict: str = "skip",
+    batch_size: int = 5000,
+    workers: int | None = None,
+    checkpoint_path: Path | None = None,
+) -> ImportCheckpoint:
+    checkpoint_path = checkpoint_path or path.with_name(path.name + ".checkpoint.json")
+    checkpoint = _load_checkpoint(checkpoint_path, ImportCheckpoint, source=str(path.resolve()))
+    if checkpoint.completed:
+        logger.info(f"La importación de {path} ya se completó según {checkpoint_path}")
+        return checkpoint
+    if checkpoint.rows_read:
+        logger.info(f"Reanudando la importación de {path} tras {checkpoint.rows_read} filas")
+
+    workers = workers or os.cpu_count() or 1
+    rejects_path = path.with_name(path.name + ".rejects.ndjson")
+    rows = islice(_read_rows(path, fmt), checkpoint.rows_read, None)
+    connection = await _connect()
+    started, rows_at_start = time.monotonic(), checkpoint.rows_read
+    try:
+        await connection.execute(
+            f"CREATE TEMP TABLE IF NOT EXISTS {STAGING_TABLE} (LIKE users INCLUDING DEFAULTS) ON COMMIT DELETE ROWS"
+        )
+        with ProcessPoolExecutor(max_workers=workers) as pool, rejects_path.open("a", encoding="utf-8") as rejects:
+            while batch := list(islice(rows, batch_size)):
+                batch_started = time.monotonic()
+                records = []
+                for line, row in enumerate(batch, start=checkpoint.rows_read + 1):
+                    record, reason = _prepare(row)
+                    if record is None:
+                        rejects.write(json.dumps({"line": line, "reason": reason, "row": row}, default=str) + "\n")
+                        checkpoint.rejected += 1
+                    else:
+                        records.append(record)
+
+                await _hash_passwords(pool, workers, records)
+                for record in [r for r in records if r.get("rejected")]:
+                    rejects.write(json.dumps({"reason": record["rejected"], "email": record["email"]}) + "\n")
+                    checkpoint.rejected += 1
+                records = [r for r in records if not r.get("rejected")]
+
+                if records:
+                    inserted, updated, conflicts = await _write_batch(connection, records, on_conflict)
+                    for conflict in conflicts:
+                        reason = f"provider_id ya vinculado a otra cuenta de {conflict['provider']}"
+                        rejects.write(json.dumps({"reason": reason, **conflict}) + "\n")
+                    checkpoint.inserted += inserted
+                    checkpoint.updated += updated
+                    checkpoint.rejected += len(conflicts)
+                    checkpoint.skipped += len(records) - inserted - updated - len(conflicts)
+                checkpoint.rows_read += len(batch)
+                rejects.flush()
+                _save_checkpoint(checkpoint_path, checkpoint)
+
+                elapsed = time.monotonic() - started
+                logger.info(
+                    f"{checkpoint.rows_read} filas: {len(batch) / (time.monotonic() - batch_started):.0f} filas/s "
+                    f"en el lote, {(checkpoint.rows_read - rows_at_start) / elapsed:.0f} filas/s en total"
+                )
+    finally:
+        await connection.close()
+
+    checkpoint.completed = True
+    _save_checkpoint(checkpoint_path, checkpoint)
+    return checkpoint
+
+
+def _export_query(fmt: str, include_password_hashes: bool, after: bool, until: bool) -> str:
+    """COPY de un tramo: filas posteriores al cursor (si lo hay) y hasta el límite del tramo (si lo hay)."""
+    columns = EXPORT_COLUMNS + (("password",) if include_password_hashes else ())
+    conditions = ["created_at IS NOT NULL"]
+    if after:
+        conditions.append("(created_at, id) > ($1, $2)")
+    if until:
+        conditions.append(f"(created_at, id) <= (${3 if after else 1}, ${4 if after else 2})")
+    select = f"SELECT {', '.join(columns)} FROM users WHERE {' AND '.join(conditions)} ORDER BY created_at, id"
+    if fmt == "ndjson":
+        return f"SELECT row_to_json(chunk) FROM ({select}) AS chunk"
+    return select
+
+
+async def _chunk_end(connection: asyncpg.Connection, cursor: tuple | None, chunk_size: int):
+    """Última fila del tramo que empieza tras `cursor`, buscada por el índice (created_at, id)."""
+    where = "created_at IS NOT NULL" + (" AND (created_at, id) > ($2, $3)" if cursor else "")
+    return await connection.fetchrow(
+        f"SELECT created_at, id FROM users WHERE {where} ORDER BY created_at, id OFFSET $1 LIMIT 1",
+        chunk_size - 1,
+        *(cursor or ()),
+    )
+
+
+async def export_users(
+    path: Path,
+    fmt: str,
+    chunk_size: int = 50_000,
+    include_password_hashes: bool = False,
+    checkpoint_path: Path | None = None,
+) -> ExportCheckpoint:
+    checkpoint_path = checkpoint_path or path.with_name(path.name + ".checkpoint.json")
+    checkpoint = _load_checkpoint(checkpoint_path, ExportCheckpoint, destination=str(path.resolve()))
+    if checkpoint.completed:
+        logger.info(f"La exportación a {path} ya se completó según {checkpoint_path}")
+        return checkpoint
+
+    # Lo escrito después del último checkpoint se descarta y se vuelve a exportar
+    with path.open("ab") as f:
+        f.truncate(checkpoint.offset)
+    cursor = None
+    if checkpoint.last_id:
+        cursor = (datetime.fromisoformat(checkpoint.last_created_at), UUID(checkpoint.last_id))
+        logger.info(f"Reanudando la exportación a {path} tras {checkpoint.rows} filas")
+
+    # NDJSON: CSV de una sola columna con comillas y separador que nunca aparecen en el JSON
+    copy_options = {"format": "csv"}
+    if fmt == "ndjson":
+        copy_options.update(quote="\x01", delimiter="\x02")
+
+    connection = await _connect()
+    started, rows_at_start = time.monotonic(), checkpoint.rows
+    try:
+        while not checkpoint.completed:
+            end = await _chunk_end(connection, cursor, chunk_size)
+            query = _export_query(fmt, include_password_hashes, after=cursor is not None, until=end is not None)
+            args = (*(cursor or ()), *((end["created_at"], end["id"]) if end else ()))
+
+            with path.open("ab") as f:
+                status = await connection.copy_from_query(
+                    query, *args, output=f, header=fmt == "csv" and checkpoint.offset == 0, **copy_options
+                )
+                checkpoint.offset = f.tell()
+
+            checkpoint.rows += int(status.split()[-1])
+            if end:
+                cursor = (end["created_at"], end["id"])
+                checkpoint.last_created_at, checkpoint.last_id = cursor[0].isoformat(), str(cursor[1])
+            else:
+                checkpoint.completed = True
+            _save_checkpoint(checkpoint_path, checkpoint)
+
+            elapsed = time.monotonic() - started
+            throughput = (checkpoint.rows - rows_at_start) / elapsed
+            logger.info(f"{checkpoint.rows} filas exportadas, {throughput:.0f} filas/s")
+    finally:
+        await connection.close()
+    return checkpoint
+
+
+async def _main(args: argparse.Namespace) -> None:
+    path = Path(args.file)
+    fmt = args.format or ("ndjson" if path.suffix in (".ndjson", ".jsonl") else "csv")
+    checkpoint_path = Path(args.checkpoint) if args.checkpoint else None
+    started = time.monotonic()
+
+    if args.command == "import":
+        result = await import_users(path, fmt, args.on_conflict, args.batch_size, args.workers, checkpoint_path)
+        print(
+            f"Importación: {result.rows_read} filas leídas, {result.inserted} creadas, {result.updated} "
+            f"actualizadas, {result.skipped} existentes sin cambios, {result.rejected} rechazadas"
+        )
+    else:
+        result = await export_users(path, fmt, args.chunk_size, args.include_password_hashes, checkpoint_path)
+        print(f"Exportación: {result.rows} filas en {path} ({result.offset} bytes)")
+    print(f"Tiempo: {time.monotonic() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = subparsers.add_parser("import", help="Importa usuarios desde CSV o NDJSON")
+    import_parser.add_argument("file")
+    import_parser.add_argument("--on-conflict", choices=sorted(ON_CONFLICT_ACTIONS), default="skip")
+    import_parser.add_argument("--batch-size", type=int, default=5000, help="Filas por lote (y por checkpoint)")
+    import_parser.add_argument("--workers", type=int, default=None, help="Procesos para bcrypt (por defecto, CPUs)")
+
+    export_parser = subparsers.add_parser("export", help="Exporta users a CSV o NDJSON")
+    export_parser.add_argument("file")
+    export_parser.add_argument("--chunk-size", type=int, default=50_000, help="Filas por tramo (y por checkpoint)")
+    export_parser.add_argument("--include-password-hashes", action="store_true")
+
+    for subparser in (import_parser, export_parser):
+        subparser.add_argument("--format", choices=["csv", "ndjson"], help="Por defecto, según la extensión")
+        subparser.add_argument("--checkpoint", default=None, help="Por defecto, <fichero>.checkpoint.json")
+
+    asyncio.run(_main(parser.parse_args()))
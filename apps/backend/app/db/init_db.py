@@ -1,6 +1,7 @@
 import asyncio
 import logging
 
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db.base import Base, engine
@@ -12,6 +13,8 @@ async def init_db() -> None:
     try:
         # Create database tables
         async with engine.begin() as conn:
+            # The users search indexes use gin_trgm_ops, which needs pg_trgm (same as migration 0005)
+            await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
             await conn.run_sync(Base.metadata.create_all)
 
         logger.info("Database tables created successfully")
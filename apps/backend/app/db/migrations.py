@@ -0,0 +1,27 @@
+"""
+Utilidades compartidas por las migraciones de Alembic que crean índices con CONCURRENTLY.
+
+Viven aquí y no en el directorio `alembic/`: ese directorio no es un paquete importable (su nombre
+coincide con el de la librería), y `env.py` ya importa `app` para cargar los modelos.
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+
+def is_offline() -> bool:
+    """Indica si la migración se ejecuta con --sql: sin conexión, solo se emiten las sentencias."""
+    return op.get_context().as_sql
+
+
+def drop_if_invalid(name: str) -> None:
+    """Borra el índice `name` si quedó inválido tras un CREATE INDEX CONCURRENTLY interrumpido."""
+    invalid = op.get_bind().execute(
+        sa.text(
+            "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+            "WHERE c.relname = :name AND NOT i.indisvalid"
+        ),
+        {"name": name},
+    ).scalar()
+    if invalid:
+        op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
@@ -2,8 +2,10 @@
 Models module initialization.
 """
 from .user import User  # noqa
+from .outbox import OutboxEvent  # noqa
 
 __all__ = [
     "User",
+    "OutboxEvent",
     "UserRole",
 ]
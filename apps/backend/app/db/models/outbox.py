@@ -0,0 +1,36 @@
+from sqlalchemy import BigInteger, Column, DateTime, Index, Integer, String, text
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.dialects.postgresql import UUID as PGUUID
+from app.db.base_class import Base
+
+
+class OutboxEvent(Base):
+    """
+    Evento de dominio pendiente de publicar (patrón transactional outbox).
+
+    Se inserta en la misma transacción que el cambio del usuario, de modo que el evento
+    existe si y solo si el cambio se confirmó. El relay lo entrega después a los consumidores.
+    """
+
+    __tablename__ = "outbox_events"
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    event_type = Column(String, nullable=False)
+    aggregate_id = Column(PGUUID(as_uuid=True), nullable=True)
+    payload = Column(JSONB, nullable=False, server_default=text("'{}'::jsonb"))
+    attempts = Column(Integer, nullable=False, default=0, server_default=text("0"))
+    last_error = Column(String, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=text("CURRENT_TIMESTAMP"))
+    available_at = Column(DateTime(timezone=True), nullable=False, server_default=text("CURRENT_TIMESTAMP"))
+    processed_at = Column(DateTime(timezone=True), nullable=True)
+    failed_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        # Solo los eventos pendientes interesan al relay: el índice parcial se mantiene pequeño
+        Index(
+            "ix_outbox_events_pending",
+            "available_at",
+            "id",
+            postgresql_where=text("processed_at IS NULL AND failed_at IS NULL"),
+        ),
+    )
@@ -1,16 +1,20 @@
 from datetime import datetime
-from uuid import UUID, uuid4
-from sqlalchemy import Column, String, DateTime, Enum, Boolean, text
+from uuid import UUID
+from sqlalchemy import Column, String, DateTime, Enum, Boolean, Index, Integer, func, text
 from sqlalchemy.dialects.postgresql import UUID as PGUUID
 from app.db.base_class import Base
+from app.core.utils.emails import normalize_email
+from app.core.utils.ids import uuid7
 from app.core.utils.enums import UserRole, UserStatus, AuthProvider
 
 
 class User(Base):
     __tablename__ = "users"
 
-    id = Column(PGUUID(as_uuid=True), primary_key=True, default=uuid4)
-    email = Column(String, unique=True, index=True, nullable=False)
+    # UUIDv7: ordenado por tiempo, las inserciones van al final del índice de la clave primaria
+    id = Column(PGUUID(as_uuid=True), primary_key=True, default=uuid7)
+    # Unicidad sin distinguir mayúsculas: índice ux_users_email_lower sobre lower(email)
+    email = Column(String, nullable=False)
     password = Column(String, nullable=True)  # Nullable para login social
     full_name = Column(String)
     role = Column(Enum(UserRole, values_callable=lambda x: [e.value for e in x]), default=UserRole.USER)
@@ -21,9 +25,50 @@ class User(Base):
     provider = Column(Enum(AuthProvider, values_callable=lambda x: [e.value for e in x]), default=AuthProvider.LOCAL)
     provider_id = Column(String, nullable=True)
     last_login_at = Column(DateTime(timezone=True), nullable=True)
+    # Se incrementa para revocar de una vez todos los tokens emitidos al usuario
+    token_version = Column(Integer, nullable=False, default=0, server_default=text("0"))
     created_at = Column(DateTime(timezone=True), server_default=text("CURRENT_TIMESTAMP"))
     updated_at = Column(
         DateTime(timezone=True),
         server_default=text("CURRENT_TIMESTAMP"),
         onupdate=text("CURRENT_TIMESTAMP"),
     )
+
+    # Creados por las migraciones 0002 a 0005 (CONCURRENTLY); declarados aquí para que autogenerate
+    # no intente eliminarlos
+    __table_args__ = (
+        Index("ux_users_email_lower", func.lower(email), unique=True),
+        Index(
+            "ux_users_provider_provider_id",
+            "provider",
+            "provider_id",
+            unique=True,
+            postgresql_where=text("provider_id IS NOT NULL"),
+        ),
+        Index("ix_users_unverified_created_at", "created_at", postgresql_where=text("is_verified = false")),
+        Index("ix_users_email_trgm", "email", postgresql_using="gin", postgresql_ops={"email": "gin_trgm_ops"}),
+        Index(
+            "ix_users_full_name_trgm",
+            "full_name",
+            postgresql_using="gin",
+            postgresql_ops={"full_name": "gin_trgm_ops"},
+        ),
+        Index(
+            "ix_users_created_at_id",
+            "created_at",
+            "id",
+            postgresql_include=["status", "email", "full_name", "role", "provider", "is_verified"],
+        ),
+        Index(
+            "ix_users_status_created_at_id",
+            "status",
+            "created_at",
+            "id",
+            postgresql_include=["email", "full_name", "role", "provider", "is_verified"],
+        ),
+    )
+
+    @classmethod
+    def email_matches(cls, email: str):
+        """Condición de búsqueda por email que usa el índice ux_users_email_lower."""
+        return func.lower(cls.email) == normalize_email(email)
@@ -0,0 +1,106 @@
+"""
+Consultas de usuario más frecuentes, construidas una sola vez al importar el módulo.
+
+Antes cada handler construía su `select(UserModel).where(...)` en cada petición: SQLAlchemy tenía
+que rehacer el árbol de la expresión y su clave de caché aunque el SQL compilado saliera de la caché.
+Aquí las sentencias son constantes con parámetros nombrados (`bindparam`), así que:
+
+- la construcción de la expresión desaparece del camino de la petición;
+- el SQL generado es siempre el mismo texto, de modo que la caché de sentencias preparadas de
+  asyncpg (DB_PREPARED_STATEMENT_CACHE_SIZE por conexión) reutiliza el mismo prepared statement
+  en todas las peticiones que usan esa conexión.
+
+La tasa de aciertos de la caché de compilación se exporta en
+`zentora_sql_compile_cache_total` (ver app.db.base).
+
+Las rutas de autenticación que solo leen el usuario usan `get_user_record_by_*`: consultas Core
+sobre la conexión de la sesión que devuelven un `UserRecord` (una tupla con nombre) en lugar de una
+instancia ORM, sin mapa de identidad, instrumentación de atributos ni seguimiento de expiración.
+Las rutas que modifican el usuario siguen usando `get_user_by_*`.
+"""
+
+from datetime import datetime
+from typing import NamedTuple
+from uuid import UUID
+
+from sqlalchemy import bindparam, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.utils.emails import normalize_email
+from app.core.utils.enums import AuthProvider, UserRole, UserStatus
+from app.db.models.user import User as UserModel
+
+USER_BY_ID = select(UserModel).where(UserModel.id == bindparam("user_id"))
+
+# Misma expresión que User.email_matches, con el email ya normalizado como parámetro
+USER_BY_EMAIL = select(UserModel).where(func.lower(UserModel.email) == bindparam("email"))
+
+USER_BY_PROVIDER_ID = select(UserModel).where(
+    UserModel.provider == bindparam("provider"),
+    UserModel.provider_id == bindparam("provider_id"),
+)
+
+
+async def get_user_by_id(db: AsyncSession, user_id: UUID | str) -> UserModel | None:
+    """Usuario por id, o None si no existe."""
+    result = await db.execute(USER_BY_ID, {"user_id": user_id})
+    return result.scalar_one_or_none()
+
+
+async def get_user_by_email(db: AsyncSession, email: str) -> UserModel | None:
+    """Usuario por email (sin distinguir mayúsculas), o None si no existe."""
+    result = await db.execute(USER_BY_EMAIL, {"email": normalize_email(email)})
+    return result.scalar_one_or_none()
+
+
+async def get_user_by_provider_id(db: AsyncSession, provider: AuthProvider, provider_id: str) -> UserModel | None:
+    """Usuario vinculado a una cuenta de un proveedor social, o None si no existe."""
+    result = await db.execute(USER_BY_PROVIDER_ID, {"provider": provider, "provider_id": str(provider_id)})
+    return result.scalar_one_or_none()
+
+
+class UserRecord(NamedTuple):
+    """Vista de solo lectura de un usuario para las rutas de autenticación."""
+
+    id: UUID
+    email: str
+    password: str | None
+    full_name: str | None
+    role: UserRole
+    bio: str | None
+    avatar_url: str | None
+    is_verified: bool
+    status: UserStatus
+    provider: AuthProvider
+    last_login_at: datetime | None
+    token_version: int
+    created_at: datetime
+    updated_at: datetime
+
+    def __repr__(self) -> str:
+        # Sin el hash de la contraseña, por si el registro acaba en un log
+        return f"UserRecord(id={self.id!r}, email={self.email!r})"
+
+
+# Columnas en el orden de los campos de UserRecord: cada fila se convierte con UserRecord._make
+_RECORD_COLUMNS = [UserModel.__table__.c[name] for name in UserRecord._fields]
+
+USER_RECORD_BY_ID = select(*_RECORD_COLUMNS).where(UserModel.__table__.c.id == bindparam("user_id"))
+USER_RECORD_BY_EMAIL = select(*_RECORD_COLUMNS).where(func.lower(UserModel.__table__.c.email) == bindparam("email"))
+
+
+async def _fetch_record(db: AsyncSession, statement, params: dict) -> UserRecord | None:
+    # Ejecutar sobre la conexión de la sesión (misma transacción) y no por la capa ORM
+    connection = await db.connection()
+    row = (await connection.execute(statement, params)).first()
+    return UserRecord._make(row) if row is not None else None
+
+
+async def get_user_record_by_id(db: AsyncSession, user_id: UUID | str) -> UserRecord | None:
+    """UserRecord por id, o None si no existe."""
+    return await _fetch_record(db, USER_RECORD_BY_ID, {"user_id": user_id})
+
+
+async def get_user_record_by_email(db: AsyncSession, email: str) -> UserRecord | None:
+    """UserRecord por email (sin distinguir mayúsculas), o None si no existe."""
+    return await _fetch_record(db, USER_RECORD_BY_EMAIL, {"email": normalize_email(email)})
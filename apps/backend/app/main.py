@@ -1,5 +1,6 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 import logging
 import sys
 
@@ -13,6 +14,13 @@ logging.basicConfig(
 from app.api.v1.api import api_router
 from app.core.config.config import settings
 from app.core.utils.scheduler import init_scheduler
+from app.core.events.outbox import init_outbox_relay
+from app.core.email.email_verification import init_unverified_expiry_worker
+from app.core.auth.denylist import init_denylist_listener
+from app.core.auth.activity import init_activity_flusher
+from app.core.utils.metrics import metrics
+from app.core.email.router import get_email_router
+from app.core.redis import close_redis_pools
 
 app = FastAPI(title=settings.PROJECT_NAME, version=settings.VERSION, openapi_url=f"{settings.API_V1_STR}/openapi.json")
 
@@ -31,12 +39,40 @@ app.include_router(api_router, prefix=settings.API_V1_STR)
 # Inicializar el scheduler
 init_scheduler(app)
 
+# Inicializar el relay del outbox
+init_outbox_relay(app)
+
+# Inicializar el worker de expiración de usuarios no verificados
+init_unverified_expiry_worker(app)
+
+# Inicializar el listener de revocaciones de tokens
+init_denylist_listener(app)
+
+# Inicializar el volcado de la actividad diferida de los usuarios
+init_activity_flusher(app)
+
+
+@app.on_event("shutdown")
+async def close_email_transports():
+    await get_email_router().aclose()
+
+
+@app.on_event("shutdown")
+async def close_redis_connections():
+    # Después de parar los workers que todavía usan los pools
+    await close_redis_pools()
+
 
 @app.get("/health")
 async def health_check():
     return {"status": "ok"}
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    return metrics.render()
+
+
 @app.get("/")
 async def root():
     return {"message": "Welcome to ZENTORA API"}
@@ -0,0 +1,57 @@
+from datetime import datetime
+from uuid import UUID
+
+from pydantic import BaseModel
+
+from app.core.utils.enums import AuthProvider, UserRole, UserStatus
+
+
+class KeyspacePrefixStats(BaseModel):
+    keys: int
+    bytes: int
+    without_ttl: int
+    ttl_histogram: dict[str, int]
+    largest_key: str | None = None
+    largest_key_bytes: int = 0
+
+
+class KeyspaceReport(BaseModel):
+    workload: str
+    sample_rate: float
+    scanned_keys: int
+    sampled_keys: int
+    complete: bool
+    duration_seconds: float
+    prefixes: dict[str, KeyspacePrefixStats]
+
+
+class AdminUser(BaseModel):
+    """Fila del directorio de usuarios: solo columnas incluidas en los índices de listado."""
+
+    id: UUID
+    email: str
+    full_name: str | None = None
+    role: UserRole | None = None
+    status: UserStatus | None = None
+    provider: AuthProvider | None = None
+    is_verified: bool | None = None
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class AdminUserPage(BaseModel):
+    items: list[AdminUser]
+    # Cursor opaco para pedir la página siguiente; None en la última
+    next_cursor: str | None = None
+
+
+class AdminUserSearchResult(AdminUser):
+    # Similitud por trigramas con el texto buscado (0 a 1)
+    score: float
+
+
+class AdminUserSearchPage(BaseModel):
+    items: list[AdminUserSearchResult]
+    next_cursor: str | None = None
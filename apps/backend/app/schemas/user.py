@@ -1,13 +1,17 @@
 from datetime import datetime
-from typing import Optional
+from typing import Annotated, Optional
 from uuid import UUID
-from pydantic import BaseModel, EmailStr, Field
+from pydantic import AfterValidator, BaseModel, EmailStr, Field
+from app.core.utils.emails import normalize_email
 from app.core.utils.enums import UserRole, UserStatus, AuthProvider
 
+# Email validado y normalizado (minúsculas) tal como se guarda y se busca en users
+NormalizedEmail = Annotated[EmailStr, AfterValidator(normalize_email)]
+
 
 class UserBase(BaseModel):
     full_name: str
-    email: EmailStr
+    email: NormalizedEmail
     role: UserRole = UserRole.USER
     bio: Optional[str] = None
     avatar_url: Optional[str] = None
@@ -18,7 +22,7 @@ class UserBase(BaseModel):
 
 
 class UserCreate(BaseModel):
-    email: EmailStr
+    email: NormalizedEmail
     password: str
     full_name: str
     role: UserRole = UserRole.USER
@@ -28,7 +32,7 @@ class UserCreate(BaseModel):
 
 class UserUpdate(UserBase):
     full_name: Optional[str] = None
-    email: Optional[EmailStr] = None
+    email: Optional[NormalizedEmail] = None
     password: Optional[str] = None
 
 
@@ -50,16 +54,16 @@ class UserInDB(UserInDBBase):
 
 
 class EmailRequest(BaseModel):
-    email: EmailStr
+    email: NormalizedEmail
 
 
 class UserLogin(BaseModel):
-    email: EmailStr
+    email: NormalizedEmail
     password: str
 
 
 class PasswordResetRequest(BaseModel):
-    email: EmailStr
+    email: NormalizedEmail
 
 
 class PasswordResetVerify(BaseModel):
@@ -83,10 +87,12 @@ class RevokeAllSessions(BaseModel):
 
 
 class ActiveSession(BaseModel):
+    sid: str | None = None
     user_id: UUID
     email: str
     full_name: str
     role: str
+    device: str | None = None
     created_at: datetime
     status: UserStatus
 
@@ -96,6 +102,22 @@ class ActiveSessionsList(BaseModel):
     sessions: list[ActiveSession]
 
 
+class DeviceSession(BaseModel):
+    """Sesión del usuario en uno de sus dispositivos."""
+
+    sid: str
+    device: str | None = None
+    ip_address: str | None = None
+    created_at: datetime
+    last_used_at: datetime
+    current: bool = False
+
+
+class DeviceSessionsList(BaseModel):
+    total: int
+    sessions: list[DeviceSession]
+
+
 class SocialLoginRequest(BaseModel):
     provider: AuthProvider
     access_token: str
@@ -103,7 +125,7 @@ class SocialLoginRequest(BaseModel):
 
 class SocialProfile(BaseModel):
     provider_id: str
-    email: EmailStr
+    email: NormalizedEmail
     full_name: str | None = None
     avatar_url: str | None = None
     provider: AuthProvider
@@ -112,7 +134,7 @@ class SocialProfile(BaseModel):
 class ReactivateAccount(BaseModel):
     """Esquema para reactivar una cuenta eliminada."""
 
-    email: EmailStr
+    email: NormalizedEmail
     password: str = Field(..., min_length=8, description="Contraseña del usuario")
 
 
@@ -0,0 +1,115 @@
+"""
+Cuenta las sentencias SQL y mide la latencia de /auth/register y /auth/login.
+
+Llama a la aplicación en proceso (httpx + ASGITransport, sin servidor ni workers en segundo plano)
+contra la base de datos y el Redis configurados, y cuenta las sentencias que cada petición envía a
+Postgres con el evento `before_cursor_execute` del engine. Falla si el registro o el login
+ejecutan más sentencias de las esperadas:
+
+- registro: 1 (INSERT ... ON CONFLICT DO NOTHING RETURNING encadenado con el evento del outbox);
+- login: 1 (SELECT del usuario; el estado y last_login_at se escriben en diferido desde Redis).
+
+Los usuarios de prueba usan el dominio bench-auth.example y se borran al terminar, junto con sus
+eventos del outbox (las sesiones que crea el login caducan solas en Redis). Conviene apuntarlo a
+una base de datos de pruebas.
+
+Uso:
+    python -m benchmarks.auth_round_trips --count 200
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from uuid import uuid4
+
+import httpx
+from sqlalchemy import delete, event, select, update
+
+from app.core.redis import close_redis_pools
+from app.db.base import AsyncSessionLocal, engine
+from app.db.models.outbox import OutboxEvent
+from app.db.models.user import User as UserModel
+from app.main import app
+
+DOMAIN = "bench-auth.example"
+PASSWORD = "benchmark-password"
+EXPECTED_STATEMENTS = {"register": 1, "login": 1}
+
+
+class StatementCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, *args, **kwargs):
+        self.count += 1
+
+
+async def timed(counter: StatementCounter, call) -> tuple[float, int]:
+    """Latencia (ms) y sentencias SQL de una petición."""
+    counter.count = 0
+    started = time.perf_counter()
+    response = await call()
+    elapsed = (time.perf_counter() - started) * 1000
+    response.raise_for_status()
+    return elapsed, counter.count
+
+
+async def cleanup() -> None:
+    async with AsyncSessionLocal() as db:
+        ids = select(UserModel.id).where(UserModel.email.like(f"%@{DOMAIN}"))
+        await db.execute(delete(OutboxEvent).where(OutboxEvent.aggregate_id.in_(ids)))
+        await db.execute(delete(UserModel).where(UserModel.email.like(f"%@{DOMAIN}")))
+        await db.commit()
+
+
+def report(name: str, samples: list[tuple[float, int]]) -> bool:
+    latencies = [ms for ms, _ in samples]
+    statements = max(count for _, count in samples)
+    ok = statements <= EXPECTED_STATEMENTS[name]
+    p99 = statistics.quantiles(latencies, n=100)[98] if len(latencies) > 1 else latencies[0]
+    print(
+        f"{name:<10}{statistics.median(latencies):>10.1f}{p99:>10.1f}{statements:>12}"
+        f"{EXPECTED_STATEMENTS[name]:>10}  {'OK' if ok else 'FALLO'}"
+    )
+    return ok
+
+
+async def main(count: int) -> bool:
+    counter = StatementCounter()
+    event.listen(engine.sync_engine, "before_cursor_execute", counter)
+    emails = [f"{uuid4().hex[:12]}@{DOMAIN}" for _ in range(count)]
+
+    transport = httpx.ASGITransport(app=app, client=("203.0.113.7", 50000))
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            register = []
+            for email in emails:
+                body = {"email": email, "password": PASSWORD, "full_name": "Usuario de Prueba"}
+                register.append(await timed(counter, lambda: client.post("/api/v1/auth/register", json=body)))
+
+            # El login exige cuentas verificadas
+            async with AsyncSessionLocal() as db:
+                await db.execute(update(UserModel).where(UserModel.email.like(f"%@{DOMAIN}")).values(is_verified=True))
+                await db.commit()
+
+            login = []
+            for email in emails:
+                body = {"email": email, "password": PASSWORD}
+                login.append(await timed(counter, lambda: client.post("/api/v1/auth/login", json=body)))
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", counter)
+        await cleanup()
+        await close_redis_pools()
+        await engine.dispose()
+
+    print(f"{'ruta':<10}{'p50 ms':>10}{'p99 ms':>10}{'sentencias':>12}{'esperadas':>10}")
+    return all([report("register", register), report("login", login)])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=200, help="Usuarios registrados y logins")
+    args = parser.parse_args()
+    sys.exit(0 if asyncio.run(main(args.count)) else 1)
@@ -0,0 +1,110 @@
+"""
+Captura los planes de ejecución (EXPLAIN) de las consultas más frecuentes sobre users.
+
+Los planes se guardan en `benchmarks/plans/<etiqueta>/<consulta>.txt` para poder compararlos
+antes y después de una migración de índices y conservarlos junto a ella:
+
+    alembic downgrade 0001_baseline
+    python -m benchmarks.explain_hot_queries --label before --analyze
+    alembic upgrade head
+    python -m benchmarks.explain_hot_queries --label after --analyze
+    python -m benchmarks.explain_hot_queries --compare before after
+
+Solo tiene sentido contra una base de datos con un volumen de datos realista: con pocas filas
+Postgres prefiere un seq scan aunque exista el índice. Con --analyze las consultas se ejecutan de
+verdad, siempre dentro de una transacción que se deshace al terminar (incluido el DELETE).
+"""
+
+import argparse
+import re
+from datetime import datetime, UTC
+from pathlib import Path
+from uuid import UUID
+
+from sqlalchemy import create_engine, delete, func, select, text
+from sqlalchemy.dialects import postgresql
+
+from app.api.v1.endpoints.admin import directory_filters, directory_query
+from app.core.config import settings
+from app.core.email.email_verification import VERIFICATION_WINDOW
+from app.core.utils.enums import AuthProvider, UserStatus
+from app.db.models.user import User as UserModel
+
+PLANS_DIR = Path(__file__).parent / "plans"
+
+
+def hot_queries() -> dict[str, object]:
+    """Consultas representativas, construidas igual que en la aplicación."""
+    return {
+        "login_by_email": select(UserModel).where(UserModel.email_matches("user@example.com")),
+        "oauth_by_provider_id": select(UserModel).where(
+            UserModel.provider == AuthProvider.GITHUB, UserModel.provider_id == "123456"
+        ),
+        "unverified_cleanup": delete(UserModel)
+        .where(UserModel.is_verified == False, UserModel.created_at <= datetime.now(UTC) - VERIFICATION_WINDOW)
+        .returning(UserModel.id),
+        "count_by_status": select(func.count()).select_from(UserModel).where(UserModel.status == UserStatus.SUSPENDED),
+        "admin_directory_page": directory_query(
+            directory_filters(status=UserStatus.ACTIVE), (datetime(2024, 1, 1, tzinfo=UTC), UUID(int=0)), 51
+        ),
+    }
+
+
+def compile_sql(statement) -> str:
+    return str(statement.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+
+
+def capture(label: str, analyze: bool) -> None:
+    options = "ANALYZE, BUFFERS, " if analyze else ""
+    output = PLANS_DIR / label
+    output.mkdir(parents=True, exist_ok=True)
+
+    engine = create_engine(settings.sync_database_url)
+    with engine.connect() as connection:
+        revision = connection.execute(text("SELECT version_num FROM alembic_version")).scalar()
+        for name, statement in hot_queries().items():
+            sql = compile_sql(statement)
+            transaction = connection.begin()
+            try:
+                rows = connection.execute(text(f"EXPLAIN ({options}FORMAT TEXT) {sql}")).scalars().all()
+            finally:
+                transaction.rollback()
+
+            plan = "\n".join(rows)
+            header = f"-- revisión: {revision}\n-- capturado: {datetime.now(UTC).isoformat()}\n{sql};\n\n"
+            (output / f"{name}.txt").write_text(header + plan + "\n")
+            print(f"{name}: {rows[0]}")
+    engine.dispose()
+
+
+def _summary(path: Path) -> str:
+    if not path.exists():
+        return "(sin capturar)"
+    plan_lines = [line for line in path.read_text().splitlines() if line and not line.startswith("--")]
+    top = next((line for line in plan_lines if "cost=" in line), "")
+    node = top.split("(")[0].strip(" ->")
+    timing = re.search(r"Execution Time: ([\d.]+ ms)", path.read_text())
+    return f"{node} {timing.group(1) if timing else ''}".strip()
+
+
+def compare(before: str, after: str) -> None:
+    print(f"{'consulta':<24}{before:<50}{after}")
+    for name in hot_queries():
+        before_plan = _summary(PLANS_DIR / before / f"{name}.txt")
+        after_plan = _summary(PLANS_DIR / after / f"{name}.txt")
+        print(f"{name:<24}{before_plan:<50}{after_plan}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--label", help="Carpeta donde guardar los planes (por ejemplo, before o after)")
+    parser.add_argument("--analyze", action="store_true", help="EXPLAIN ANALYZE dentro de una transacción deshecha")
+    parser.add_argument("--compare", nargs=2, metavar=("ANTES", "DESPUÉS"), help="Compara dos capturas guardadas")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+    elif args.label:
+        capture(args.label, args.analyze)
+    else:
+        parser.error("Indica --label para capturar o --compare para comparar")
@@ -0,0 +1,82 @@
+"""
+Compara el CPU por consulta de las búsquedas de usuario construidas en línea con las sentencias
+precompiladas de app.db.queries.
+
+Para cada forma ejecuta N búsquedas por id y por email contra la base de datos configurada, con una
+sola sesión, y mide el tiempo de CPU del proceso (`time.process_time`) por consulta, que es lo que
+cuesta construir la expresión, generar su clave de caché, compilar o recuperar el SQL y procesar el
+resultado. Informa también de la tasa de aciertos de la caché de compilación durante cada forma.
+Usa el primer usuario de la tabla, que debe existir; no modifica datos.
+
+Uso:
+    python -m benchmarks.query_cache --count 5000
+"""
+
+import argparse
+import asyncio
+import time
+
+from sqlalchemy import select
+
+from app.db.base import AsyncSessionLocal, engine, sql_compile_cache_total
+from app.db.models.user import User as UserModel
+from app.db.queries import get_user_by_email, get_user_by_id
+
+
+async def inline_lookup(db, user: UserModel) -> None:
+    result = await db.execute(select(UserModel).where(UserModel.id == user.id))
+    result.scalar_one_or_none()
+    result = await db.execute(select(UserModel).where(UserModel.email_matches(user.email)))
+    result.scalar_one_or_none()
+
+
+async def cached_lookup(db, user: UserModel) -> None:
+    await get_user_by_id(db, user.id)
+    await get_user_by_email(db, user.email)
+
+
+def cache_counts() -> tuple[float, float]:
+    return sql_compile_cache_total.value(result="cache_hit"), sql_compile_cache_total.value(result="cache_miss")
+
+
+async def measure(name: str, lookup, user: UserModel, count: int) -> None:
+    async with AsyncSessionLocal() as db:
+        # Calentar la conexión y las cachés antes de medir
+        for _ in range(10):
+            await lookup(db, user)
+            db.expunge_all()
+
+        hits, misses = cache_counts()
+        cpu = time.process_time()
+        wall = time.perf_counter()
+        for _ in range(count):
+            await lookup(db, user)
+            db.expunge_all()
+        cpu = time.process_time() - cpu
+        wall = time.perf_counter() - wall
+        hits, misses = cache_counts()[0] - hits, cache_counts()[1] - misses
+
+    queries = count * 2
+    hit_rate = hits / (hits + misses) * 100 if hits + misses else 0.0
+    print(f"{name:<10}{cpu / queries * 1e6:>14.1f}{wall / queries * 1e6:>14.1f}{hit_rate:>12.1f}%")
+
+
+async def main(count: int) -> None:
+    try:
+        async with AsyncSessionLocal() as db:
+            user = (await db.execute(select(UserModel).limit(1))).scalar_one_or_none()
+        if user is None:
+            raise SystemExit("La tabla users está vacía")
+
+        print(f"{'forma':<10}{'CPU µs/cons':>14}{'total µs/cons':>14}{'aciertos':>13}")
+        await measure("en línea", inline_lookup, user, count)
+        await measure("cacheada", cached_lookup, user, count)
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=5000, help="Búsquedas (por id y por email) por forma")
+    args = parser.parse_args()
+    asyncio.run(main(args.count))
@@ -0,0 +1,119 @@
+"""
+Compara el formato anterior de las sesiones (campos con nombre completo y fechas ISO) con el
+formato compacto.
+
+Mide el coste de codificar y decodificar una sesión en Python y, escribiendo N sesiones de cada
+formato en el Redis de sesiones, los bytes por sesión (MEMORY USAGE) y la codificación interna
+del hash (OBJECT ENCODING). Las claves de prueba usan el prefijo `bench_session:` y se borran al
+terminar; conviene apuntarlo a una base de datos de pruebas (REDIS_DB).
+
+Uso:
+    python -m benchmarks.session_encoding --count 10000
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from collections import Counter
+from datetime import datetime, UTC
+from secrets import token_urlsafe
+from typing import Any, Callable
+from uuid import uuid4
+
+from redis.asyncio import Redis
+
+from app.core.auth.sessions import decode_session, encode_session
+from app.core.redis import RedisWorkload, close_redis_pools, get_redis_client
+
+USER_AGENT = (
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/124.0.0.0 Safari/537.36"
+)
+
+
+def legacy_session(user_id: str, sid: str, now: float) -> dict[str, Any]:
+    now_iso = datetime.fromtimestamp(now, UTC).isoformat()
+    return {
+        "sid": sid,
+        "user_id": user_id,
+        "email": f"{user_id[:8]}@example.com",
+        "full_name": "Usuario de Prueba",
+        "role": "user",
+        "status": "active",
+        "jti": token_urlsafe(12),
+        "device": USER_AGENT[:200],
+        "ip_address": "203.0.113.7",
+        "created_at": now_iso,
+        "last_used_at": now_iso,
+    }
+
+
+def compact_session(user_id: str, sid: str, now: float) -> dict[str, Any]:
+    return encode_session(
+        f"{user_id[:8]}@example.com",
+        "Usuario de Prueba",
+        "user",
+        "active",
+        token_urlsafe(12),
+        USER_AGENT,
+        "203.0.113.7",
+        int(now),
+        int(now),
+    )
+
+
+def per_call_us(func: Callable[[], Any], repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - started) / repeat * 1e6
+
+
+async def measure(redis: Redis, name: str, build: Callable[[str, str, float], dict[str, Any]], count: int):
+    user_id, sid, now = str(uuid4()), token_urlsafe(16), time.time()
+    raw = {k: str(v) for k, v in build(user_id, sid, now).items()}
+
+    sizes, encodings = [], Counter()
+    for i in range(count):
+        key = f"bench_session:{name}:{i}"
+        await redis.hset(key, mapping=build(str(uuid4()), token_urlsafe(16), now))
+        sizes.append(await redis.memory_usage(key))
+        encodings[await redis.object("encoding", key)] += 1
+
+    return {
+        "encode_us": per_call_us(lambda: build(user_id, sid, now), 10000),
+        "decode_us": per_call_us(lambda: decode_session(user_id, sid, raw), 10000),
+        "bytes_p50": statistics.median(sizes),
+        "bytes_max": max(sizes),
+        "encoding": ", ".join(f"{enc}={n}" for enc, n in encodings.items()),
+    }
+
+
+async def cleanup(redis: Redis) -> None:
+    async for key in redis.scan_iter("bench_session:*", count=1000):
+        await redis.delete(key)
+
+
+async def main(count: int) -> None:
+    redis = get_redis_client(RedisWorkload.SESSIONS)
+    results = {}
+    try:
+        await cleanup(redis)
+        results["anterior"] = await measure(redis, "legacy", legacy_session, count)
+        results["compacto"] = await measure(redis, "compact", compact_session, count)
+    finally:
+        await cleanup(redis)
+        await close_redis_pools()
+
+    columns = ["encode_us", "decode_us", "bytes_p50", "bytes_max"]
+    print(f"{'formato':<10}" + "".join(f"{c:>12}" for c in columns) + "  codificación")
+    for name, row in results.items():
+        print(f"{name:<10}" + "".join(f"{row[c]:>12.1f}" for c in columns) + f"  {row['encoding']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=10000, help="Número de sesiones por formato")
+    args = parser.parse_args()
+    asyncio.run(main(args.count))
@@ -0,0 +1,83 @@
+"""
+Compara los códigos de verificación almacenados en Redis con los códigos firmados sin estado.
+
+Mide, para N códigos, la memoria que ocupan en Redis tras emitirlos y tras consumirlos, y la
+latencia de verificación (p50/p99). Usa el Redis configurado en la aplicación y limpia las
+claves que crea al terminar; conviene apuntarlo a una base de datos de pruebas (REDIS_DB).
+
+Uso:
+    python -m benchmarks.stateless_codes --count 20000
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from redis.asyncio import Redis
+
+from app.core.config import settings
+from app.core.email.email_verification import generate_verification_token, verify_email_token
+from app.core.redis import RedisWorkload, close_redis_pools, get_redis_client
+
+
+async def used_memory(redis: Redis) -> int:
+    info = await redis.info("memory")
+    return int(info["used_memory"])
+
+
+async def run_mode(redis: Redis, stateless: bool, count: int) -> dict[str, float]:
+    settings.STATELESS_CODES_ENABLED = stateless
+    emails = [f"bench-{i}@example.com" for i in range(count)]
+
+    baseline = await used_memory(redis)
+    started = time.perf_counter()
+    codes = [await generate_verification_token(redis, email) for email in emails]
+    issue_seconds = time.perf_counter() - started
+    after_issue = await used_memory(redis)
+
+    latencies = []
+    for code in codes:
+        t0 = time.perf_counter()
+        await verify_email_token(redis, code)
+        latencies.append(time.perf_counter() - t0)
+    after_verify = await used_memory(redis)
+
+    latencies.sort()
+    return {
+        "issue_us": issue_seconds / count * 1e6,
+        "verify_p50_us": statistics.median(latencies) * 1e6,
+        "verify_p99_us": latencies[int(len(latencies) * 0.99) - 1] * 1e6,
+        "memory_after_issue_kb": (after_issue - baseline) / 1024,
+        "memory_after_verify_kb": (after_verify - baseline) / 1024,
+    }
+
+
+async def cleanup(redis: Redis) -> None:
+    for pattern in ("{email_verification}:*", "used_code:email_verification:*"):
+        async for key in redis.scan_iter(pattern, count=1000):
+            await redis.delete(key)
+
+
+async def main(count: int) -> None:
+    redis = get_redis_client(RedisWorkload.EPHEMERAL)
+    results = {}
+    try:
+        for name, stateless in (("redis", False), ("stateless", True)):
+            await cleanup(redis)
+            results[name] = await run_mode(redis, stateless, count)
+    finally:
+        await cleanup(redis)
+        await close_redis_pools()
+
+    columns = list(next(iter(results.values())).keys())
+    print(f"{'modo':<10}" + "".join(f"{c:>24}" for c in columns))
+    for name, row in results.items():
+        print(f"{name:<10}" + "".join(f"{row[c]:>24.1f}" for c in columns))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=10000, help="Número de códigos por modo")
+    args = parser.parse_args()
+    asyncio.run(main(args.count))
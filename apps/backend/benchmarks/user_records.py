@@ -0,0 +1,98 @@
+"""
+Compara la búsqueda de usuario por la capa ORM (instancia de User) con la ruta de solo lectura que
+devuelve un UserRecord (app.db.queries).
+
+Para cada ruta ejecuta N búsquedas por email del primer usuario de la tabla, con una sola sesión, y
+mide la latencia por búsqueda y, en una segunda pasada con tracemalloc, los bloques y bytes
+reservados por búsqueda (lo que queda vivo hasta el final de la petición: la instancia ORM con su
+estado de instrumentación frente a la tupla). Incluye también el coste de `User.dict()`. No
+modifica datos; la tabla users no puede estar vacía.
+
+Uso:
+    python -m benchmarks.user_records --count 5000
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+import tracemalloc
+
+from sqlalchemy import select
+
+from app.db.base import AsyncSessionLocal, engine
+from app.db.models.user import User as UserModel
+from app.db.queries import get_user_by_email, get_user_record_by_email
+
+
+async def orm_lookup(db, email: str):
+    user = await get_user_by_email(db, email)
+    # Sin esto el mapa de identidad devolvería la misma instancia en cada iteración
+    db.expunge_all()
+    return user
+
+
+async def record_lookup(db, email: str):
+    return await get_user_record_by_email(db, email)
+
+
+async def latencies(lookup, email: str, count: int) -> list[float]:
+    samples = []
+    async with AsyncSessionLocal() as db:
+        for _ in range(10):
+            await lookup(db, email)
+        for _ in range(count):
+            started = time.perf_counter()
+            await lookup(db, email)
+            samples.append((time.perf_counter() - started) * 1e6)
+    return samples
+
+
+async def allocations(lookup, email: str, count: int) -> tuple[float, float]:
+    """Bloques y bytes reservados por búsqueda que siguen vivos mientras se conserva el resultado."""
+    async with AsyncSessionLocal() as db:
+        await lookup(db, email)
+        kept = []
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        for _ in range(count):
+            kept.append(await lookup(db, email))
+        after = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+    stats = after.compare_to(before, "filename")
+    blocks = sum(stat.count_diff for stat in stats)
+    size = sum(stat.size_diff for stat in stats)
+    return blocks / count, size / count
+
+
+def dict_cost(user: UserModel, count: int) -> float:
+    started = time.perf_counter()
+    for _ in range(count):
+        user.dict()
+    return (time.perf_counter() - started) / count * 1e6
+
+
+async def main(count: int) -> None:
+    try:
+        async with AsyncSessionLocal() as db:
+            user = (await db.execute(select(UserModel).limit(1))).scalar_one_or_none()
+        if user is None:
+            raise SystemExit("La tabla users está vacía")
+
+        print(f"{'ruta':<10}{'p50 µs':>10}{'p99 µs':>10}{'bloques':>10}{'bytes':>10}")
+        for name, lookup in (("orm", orm_lookup), ("record", record_lookup)):
+            samples = await latencies(lookup, user.email, count)
+            blocks, size = await allocations(lookup, user.email, min(count, 1000))
+            p99 = statistics.quantiles(samples, n=100)[98] if len(samples) > 1 else samples[0]
+            print(f"{name:<10}{statistics.median(samples):>10.1f}{p99:>10.1f}{blocks:>10.1f}{size:>10.0f}")
+
+        print(f"User.dict(): {dict_cost(user, count * 10):.2f} µs por llamada")
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=5000, help="Búsquedas por ruta")
+    args = parser.parse_args()
+    asyncio.run(main(args.count))
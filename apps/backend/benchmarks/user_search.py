@@ -0,0 +1,135 @@
+"""
+Mide la latencia de la búsqueda de usuarios (/admin/users/search) sobre un conjunto sintético.
+
+Crea el esquema `bench_search` con una copia vacía de `users`, la llena con N usuarios generados
+en SQL (nombres y dominios combinados) y ejecuta la misma consulta que el endpoint
+(`search_query`) con `search_path = bench_search, public`, de dos formas:
+
+- indexada: con los índices GIN de trigramas de la migración 0005;
+- secuencial: con los bitmap scans desactivados, que es lo que costaba el ILIKE sin índices.
+
+Informa de p50/p99 por texto buscado. El esquema se borra al terminar. Requiere haber aplicado
+las migraciones (para copiar la tabla users) y la extensión pg_trgm.
+
+Uso:
+    python -m benchmarks.user_search --users 3000000 --repeat 20
+"""
+
+import argparse
+import statistics
+import time
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Connection
+
+from app.api.v1.endpoints.admin import search_query
+from app.core.config import settings
+
+SCHEMA = "bench_search"
+QUERIES = ("gar", "martin", "lopez.12", "ana@", "outlook", "fernandez garcia")
+
+FIRST_NAMES = (
+    "Ana", "Lucía", "María", "Paula", "Sofía", "Carmen", "Laura", "Marta", "Elena", "Julia",
+    "Hugo", "Martín", "Pablo", "Daniel", "Álvaro", "Diego", "Javier", "Sergio", "Adrián", "Mateo",
+)
+LAST_NAMES = (
+    "García", "Fernández", "González", "Rodríguez", "López", "Martínez", "Sánchez", "Pérez", "Gómez",
+    "Martín", "Jiménez", "Ruiz", "Hernández", "Díaz", "Moreno", "Muñoz", "Álvarez", "Romero", "Alonso",
+    "Gutiérrez", "Navarro", "Torres", "Domínguez", "Vázquez", "Ramos",
+)
+DOMAINS = ("gmail.com", "outlook.com", "yahoo.es", "empresa.es", "universidad.edu")
+
+SEED_SQL = f"""
+INSERT INTO {SCHEMA}.users (id, email, full_name, role, is_verified, status, provider, token_version, created_at)
+SELECT
+    gen_random_uuid(),
+    lower(unaccent_first || '.' || unaccent_last || g || '@' || domain),
+    first_name || ' ' || last_name,
+    'USER', true, 'active', 'local', 0,
+    now() - g * interval '1 second'
+FROM generate_series(:start, :stop) AS g,
+LATERAL (
+    SELECT
+        (:first_names)[1 + (g * 7919) % cardinality(:first_names)] AS first_name,
+        (:last_names)[1 + (g * 104729) % cardinality(:last_names)] AS last_name,
+        (:domains)[1 + g % cardinality(:domains)] AS domain
+) AS picked,
+LATERAL (
+    SELECT
+        translate(first_name, 'ÁÉÍÓÚáéíóúñ', 'AEIOUaeioun') AS unaccent_first,
+        translate(last_name, 'ÁÉÍÓÚáéíóúñ', 'AEIOUaeioun') AS unaccent_last
+) AS plain
+"""
+
+INDEXES = (
+    f"CREATE INDEX ON {SCHEMA}.users USING gin (email gin_trgm_ops)",
+    f"CREATE INDEX ON {SCHEMA}.users USING gin (full_name gin_trgm_ops)",
+)
+
+
+def seed(connection: Connection, users: int, chunk: int = 500_000) -> None:
+    connection.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    connection.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+    connection.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+    connection.execute(text(f"CREATE TABLE {SCHEMA}.users (LIKE public.users INCLUDING DEFAULTS)"))
+    connection.commit()
+
+    params = {"first_names": list(FIRST_NAMES), "last_names": list(LAST_NAMES), "domains": list(DOMAINS)}
+    started = time.perf_counter()
+    for start in range(1, users + 1, chunk):
+        connection.execute(text(SEED_SQL), {**params, "start": start, "stop": min(start + chunk - 1, users)})
+        connection.commit()
+    for statement in INDEXES:
+        connection.execute(text(statement))
+    connection.execute(text(f"ANALYZE {SCHEMA}.users"))
+    connection.commit()
+    print(f"{users} usuarios generados e indexados en {time.perf_counter() - started:.1f}s")
+
+
+def measure(connection: Connection, q: str, repeat: int, sequential: bool) -> list[float]:
+    latencies = []
+    for _ in range(repeat):
+        transaction = connection.begin()
+        try:
+            connection.execute(text(f"SET LOCAL search_path = {SCHEMA}, public"))
+            if sequential:
+                connection.execute(text("SET LOCAL enable_bitmapscan = off"))
+            started = time.perf_counter()
+            connection.execute(search_query(q, None, 21)).all()
+            latencies.append((time.perf_counter() - started) * 1000)
+        finally:
+            transaction.rollback()
+    return latencies
+
+
+def percentile(values: list[float], p: float) -> float:
+    return statistics.quantiles(values, n=100)[int(p) - 1] if len(values) > 1 else values[0]
+
+
+def main(users: int, repeat: int, skip_sequential: bool) -> None:
+    engine = create_engine(settings.sync_database_url)
+    with engine.connect() as connection:
+        try:
+            seed(connection, users)
+            print(f"{'búsqueda':<20}{'idx p50':>10}{'idx p99':>10}{'seq p50':>10}{'seq p99':>10}  (ms)")
+            for q in QUERIES:
+                indexed = measure(connection, q, repeat, sequential=False)
+                row = f"{q:<20}{statistics.median(indexed):>10.1f}{percentile(indexed, 99):>10.1f}"
+                if not skip_sequential:
+                    sequential = measure(connection, q, max(3, repeat // 5), sequential=True)
+                    row += f"{statistics.median(sequential):>10.1f}{percentile(sequential, 99):>10.1f}"
+                print(row)
+        finally:
+            connection.rollback()
+            connection.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+            connection.commit()
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=3_000_000, help="Usuarios sintéticos")
+    parser.add_argument("--repeat", type=int, default=20, help="Repeticiones por búsqueda con índices")
+    parser.add_argument("--skip-sequential", action="store_true", help="No medir el recorrido secuencial")
+    args = parser.parse_args()
+    main(args.users, args.repeat, args.skip_sequential)
@@ -0,0 +1,88 @@
+"""
+Compara uuid4 con UUIDv7 como clave primaria de una tabla con la forma de users.
+
+Para cada generador inserta N filas en lotes en una tabla de prueba (`bench_ids_uuid4`,
+`bench_ids_uuid7`) y mide el throughput de inserción y el tamaño final de la tabla y del índice de la
+clave primaria. Si la extensión pgstattuple está disponible, informa también de la densidad de las
+hojas del índice, que es donde se nota la fragmentación de las inserciones aleatorias. Las tablas se
+borran al terminar; conviene apuntarlo a una base de datos de pruebas.
+
+Uso:
+    python -m benchmarks.uuid_keys --count 1000000 --batch-size 1000
+"""
+
+import argparse
+import time
+from typing import Callable
+from uuid import UUID, uuid4
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Connection
+
+from app.core.config import settings
+from app.core.utils.ids import uuid7
+
+GENERATORS: dict[str, Callable[[], UUID]] = {"uuid4": uuid4, "uuid7": uuid7}
+
+
+def run(connection: Connection, name: str, generate: Callable[[], UUID], count: int, batch_size: int) -> dict:
+    table = f"bench_ids_{name}"
+    connection.execute(text(f"DROP TABLE IF EXISTS {table}"))
+    connection.execute(
+        text(
+            f"CREATE TABLE {table} (id uuid PRIMARY KEY, email varchar NOT NULL, "
+            "created_at timestamptz NOT NULL DEFAULT CURRENT_TIMESTAMP)"
+        )
+    )
+    connection.commit()
+
+    insert = text(f"INSERT INTO {table} (id, email) VALUES (:id, :email)")
+    started = time.perf_counter()
+    for offset in range(0, count, batch_size):
+        batch = range(offset, min(offset + batch_size, count))
+        rows = [{"id": generate(), "email": f"bench-{i}@example.com"} for i in batch]
+        connection.execute(insert, rows)
+        connection.commit()
+    seconds = time.perf_counter() - started
+
+    sizes = connection.execute(text(f"SELECT pg_relation_size('{table}'), pg_relation_size('{table}_pkey')")).one()
+    result = {
+        "rows_per_s": count / seconds,
+        "table_mb": sizes[0] / 2**20,
+        "pkey_mb": sizes[1] / 2**20,
+        "leaf_density": None,
+    }
+    try:
+        result["leaf_density"] = connection.execute(
+            text(f"SELECT avg_leaf_density FROM pgstatindex('{table}_pkey')")
+        ).scalar()
+    except Exception:
+        connection.rollback()
+    return result
+
+
+def main(count: int, batch_size: int) -> None:
+    engine = create_engine(settings.sync_database_url)
+    results = {}
+    with engine.connect() as connection:
+        try:
+            for name, generate in GENERATORS.items():
+                results[name] = run(connection, name, generate, count, batch_size)
+        finally:
+            for name in GENERATORS:
+                connection.execute(text(f"DROP TABLE IF EXISTS bench_ids_{name}"))
+            connection.commit()
+    engine.dispose()
+
+    print(f"{'generador':<10}{'filas/s':>12}{'tabla MB':>12}{'pkey MB':>12}{'densidad hojas':>16}")
+    for name, row in results.items():
+        density = f"{row['leaf_density']:.1f}%" if row["leaf_density"] is not None else "n/d"
+        print(f"{name:<10}{row['rows_per_s']:>12.0f}{row['table_mb']:>12.1f}{row['pkey_mb']:>12.1f}{density:>16}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=1_000_000, help="Filas por generador")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Filas por INSERT")
+    args = parser.parse_args()
+    main(args.count, args.batch_size)
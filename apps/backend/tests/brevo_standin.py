@@ -0,0 +1,69 @@
+"""
+Sustituto local de la API transaccional de Brevo para desarrollo y pruebas.
+
+Acepta las mismas peticiones que `POST /v3/smtp/email` (incluido `messageVersions`) y
+permite simular latencia, errores y rate limiting mediante variables de entorno:
+
+    BREVO_STANDIN_LATENCY_MS=50 BREVO_STANDIN_FAILURE_RATE=0.1 \\
+        uvicorn tests.brevo_standin:app --port 8025
+
+y en el backend: BREVO_API_URL=http://localhost:8025/v3
+"""
+
+import asyncio
+import os
+import random
+from typing import Any
+from uuid import uuid4
+
+from fastapi import FastAPI, Header
+from fastapi.responses import JSONResponse
+
+LATENCY_MS = float(os.getenv("BREVO_STANDIN_LATENCY_MS", "0"))
+FAILURE_RATE = float(os.getenv("BREVO_STANDIN_FAILURE_RATE", "0"))
+RATE_LIMIT_RATE = float(os.getenv("BREVO_STANDIN_RATE_LIMIT_RATE", "0"))
+
+app = FastAPI(title="Brevo stand-in")
+
+sent_messages: list[dict[str, Any]] = []
+
+
+@app.post("/v3/smtp/email")
+async def send_transac_email(payload: dict[str, Any], api_key: str | None = Header(None, alias="api-key")):
+    if not api_key:
+        return JSONResponse(content={"code": "unauthorized", "message": "Key not found"}, status_code=401)
+
+    if LATENCY_MS:
+        await asyncio.sleep(LATENCY_MS / 1000)
+
+    if RATE_LIMIT_RATE and random.random() < RATE_LIMIT_RATE:
+        return JSONResponse(
+            content={"code": "too_many_requests", "message": "Rate limit exceeded"},
+            status_code=429,
+            headers={"Retry-After": "1"},
+        )
+
+    if FAILURE_RATE and random.random() < FAILURE_RATE:
+        return JSONResponse(content={"code": "internal_error", "message": "Simulated outage"}, status_code=503)
+
+    versions = payload.get("messageVersions")
+    if versions:
+        message_ids = [f"<{uuid4()}@standin.brevo>" for _ in versions]
+        sent_messages.extend({**payload, **version, "messageId": mid} for version, mid in zip(versions, message_ids))
+        return JSONResponse(content={"messageIds": message_ids}, status_code=201)
+
+    message_id = f"<{uuid4()}@standin.brevo>"
+    sent_messages.append({**payload, "messageId": message_id})
+    return JSONResponse(content={"messageId": message_id}, status_code=201)
+
+
+@app.get("/v3/_standin/messages")
+async def list_sent_messages():
+    """Lista los correos recibidos por el sustituto (solo para inspección en pruebas)."""
+    return {"total": len(sent_messages), "messages": sent_messages}
+
+
+@app.delete("/v3/_standin/messages")
+async def clear_sent_messages():
+    sent_messages.clear()
+    return {"total": 0}
@@ -0,0 +1,98 @@
+"""
+Fixtures comunes de los tests.
+
+Los tests que usan la base de datos necesitan un Postgres de pruebas en TEST_DATABASE_URL: el esquema
+public se borra y se recrea al empezar, y las tablas se vacían antes de cada test. Sin esa variable
+se omiten. Redis se sustituye por fakeredis en todas las cargas.
+"""
+
+import os
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+if TEST_DATABASE_URL:
+    # Antes de importar la aplicación: app.db.base crea el engine con DATABASE_URL al importarse
+    os.environ["DATABASE_URL"] = TEST_DATABASE_URL
+
+import fakeredis
+import httpx
+import pytest
+from sqlalchemy import MetaData, create_engine, text
+from sqlalchemy.exc import DBAPIError
+
+from app.core.config import settings
+from app.core import redis as redis_module
+from app.core.redis import RedisWorkload, get_cache_redis, get_ephemeral_redis, get_queue_redis, get_redis
+from app.db.base import Base, engine
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+def _create_schema(connection) -> None:
+    """Crea las tablas de los modelos; sin pg_trgm en el servidor, omite los índices de búsqueda."""
+    connection.execute(text("DROP SCHEMA IF EXISTS public CASCADE"))
+    connection.execute(text("CREATE SCHEMA public"))
+    try:
+        with connection.begin_nested():
+            connection.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    except DBAPIError:
+        metadata = MetaData()
+        for table in Base.metadata.sorted_tables:
+            copy = table.to_metadata(metadata)
+            for index in list(copy.indexes):
+                if "gin_trgm_ops" in index.dialect_options["postgresql"]["ops"].values():
+                    copy.indexes.discard(index)
+        metadata.create_all(connection)
+    else:
+        Base.metadata.create_all(connection)
+
+
+@pytest.fixture(scope="session")
+def sync_engine():
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL no está configurada")
+    sync_engine = create_engine(settings.sync_database_url)
+    with sync_engine.begin() as connection:
+        _create_schema(connection)
+    yield sync_engine
+    sync_engine.dispose()
+
+
+@pytest.fixture
+async def clean_db(sync_engine):
+    """Base de datos vacía para el test; el engine de la aplicación se libera al terminar."""
+    with sync_engine.begin() as connection:
+        tables = ", ".join(table.name for table in Base.metadata.sorted_tables)
+        connection.execute(text(f"TRUNCATE {tables} RESTART IDENTITY CASCADE"))
+    yield sync_engine
+    # Las conexiones asyncpg pertenecen al event loop de este test
+    await engine.dispose()
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    """Un único fakeredis para todas las cargas, también para los clientes de get_redis_client."""
+    fake = fakeredis.FakeAsyncRedis(decode_responses=True)
+    for workload in RedisWorkload:
+        monkeypatch.setitem(redis_module._clients, workload, fake)
+    return fake
+
+
+@pytest.fixture
+async def client(clean_db, fake_redis):
+    """Cliente HTTP de la aplicación en proceso, sin workers en segundo plano."""
+    from app.main import app
+
+    async def override():
+        return fake_redis
+
+    for dependency in (get_redis, get_cache_redis, get_ephemeral_redis, get_queue_redis):
+        app.dependency_overrides[dependency] = override
+
+    transport = httpx.ASGITransport(app=app, client=("203.0.113.7", 50000))
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
+
+    app.dependency_overrides.clear()
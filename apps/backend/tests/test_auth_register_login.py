@@ -0,0 +1,137 @@
+"""Registro y login: sentencias por petición, evento del outbox y mensajes de error del login."""
+
+import pytest
+from sqlalchemy import event, text
+
+from app.core.auth.activity import ACTIVITY_KEY
+from app.core.auth.security import get_password_hash
+from app.db.base import engine
+
+pytestmark = pytest.mark.anyio
+
+PASSWORD = "correct-horse-battery"
+
+
+class StatementCounter:
+    def __init__(self):
+        self.statements: list[str] = []
+
+    def __call__(self, conn, cursor, statement, *args):
+        self.statements.append(statement)
+
+    def __enter__(self):
+        event.listen(engine.sync_engine, "before_cursor_execute", self)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(engine.sync_engine, "before_cursor_execute", self)
+
+
+def _query(sync_engine, sql: str, **params):
+    with sync_engine.connect() as connection:
+        return connection.execute(text(sql), params).all()
+
+
+def _insert_user(sync_engine, email: str, **overrides) -> None:
+    values = {
+        "email": email,
+        "password": get_password_hash(PASSWORD),
+        "full_name": "Usuario de Prueba",
+        "role": "USER",
+        "is_verified": True,
+        "status": "inactive",
+        "provider": "local",
+        **overrides,
+    }
+    with sync_engine.begin() as connection:
+        connection.execute(
+            text(
+                "INSERT INTO users (id, email, password, full_name, role, is_verified, status, provider) "
+                "VALUES (gen_random_uuid(), :email, :password, :full_name, CAST(:role AS userrole), :is_verified, "
+                "CAST(:status AS userstatus), CAST(:provider AS authprovider))"
+            ),
+            values,
+        )
+
+
+async def test_register_creates_user_and_outbox_event_in_one_statement(client, clean_db):
+    body = {"email": "Ana@Example.com", "password": PASSWORD, "full_name": "Ana"}
+
+    with StatementCounter() as counter:
+        response = await client.post("/api/v1/auth/register", json=body)
+
+    assert response.status_code == 201, response.text
+    user = response.json()["user"]
+    assert user["email"] == "ana@example.com"
+    assert user["is_verified"] is False
+    assert len(counter.statements) == 1
+
+    events = _query(clean_db, "SELECT event_type, aggregate_id::text, attempts, payload FROM outbox_events")
+    assert len(events) == 1
+    event_type, aggregate_id, attempts, payload = events[0]
+    assert (event_type, aggregate_id, attempts) == ("user.registered", user["id"], 0)
+    assert payload == {"email": "ana@example.com", "full_name": "Ana", "provider": "local", "is_verified": False}
+
+
+async def test_register_duplicate_email_returns_400_without_event(client, clean_db):
+    body = {"email": "ana@example.com", "password": PASSWORD, "full_name": "Ana"}
+    assert (await client.post("/api/v1/auth/register", json=body)).status_code == 201
+
+    response = await client.post("/api/v1/auth/register", json={**body, "email": "ANA@example.com"})
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "El correo electrónico ya está registrado"
+    assert _query(clean_db, "SELECT count(*) FROM users")[0][0] == 1
+    assert _query(clean_db, "SELECT count(*) FROM outbox_events")[0][0] == 1
+
+
+async def test_login_fast_path_runs_one_statement_and_buffers_activity(client, clean_db, fake_redis):
+    _insert_user(clean_db, "ana@example.com")
+
+    with StatementCounter() as counter:
+        response = await client.post("/api/v1/auth/login", json={"email": "Ana@example.com", "password": PASSWORD})
+
+    assert response.status_code == 200, response.text
+    data = response.json()
+    assert data["access_token"]
+    assert data["user"]["status"] == "active"
+    assert len(counter.statements) == 1
+    assert counter.statements[0].lstrip().upper().startswith("SELECT")
+
+    # El estado y last_login_at quedan pendientes del volcado, no se escriben en la petición
+    user_id = data["user"]["id"]
+    assert await fake_redis.hget(ACTIVITY_KEY, f"{user_id}:s") == "active"
+    assert await fake_redis.hget(ACTIVITY_KEY, f"{user_id}:t") is not None
+    assert _query(clean_db, "SELECT status::text FROM users")[0][0] == "inactive"
+
+
+@pytest.mark.parametrize(
+    ("overrides", "password", "status_code", "detail"),
+    [
+        ({}, "wrong-password", 400, "Email o contraseña incorrectos"),
+        ({"is_verified": False}, PASSWORD, 400, "Por favor, verifica tu correo electrónico antes de iniciar sesión"),
+        ({"status": "suspended"}, PASSWORD, 403, "Esta cuenta está suspendida"),
+        ({"status": "deleted"}, PASSWORD, 403, "Esta cuenta ha sido eliminada"),
+        (
+            {"provider": "github", "password": ""},
+            PASSWORD,
+            400,
+            "Esta cuenta fue registrada usando github. Por favor, use ese método para iniciar sesión",
+        ),
+    ],
+)
+async def test_login_rejections(client, clean_db, fake_redis, overrides, password, status_code, detail):
+    _insert_user(clean_db, "ana@example.com", **overrides)
+
+    response = await client.post("/api/v1/auth/login", json={"email": "ana@example.com", "password": password})
+
+    assert response.status_code == status_code
+    assert response.json()["detail"] == detail
+    assert await fake_redis.exists(ACTIVITY_KEY) == 0
+
+
+async def test_login_unknown_email(client, clean_db):
+    response = await client.post("/api/v1/auth/login", json={"email": "nadie@example.com", "password": PASSWORD})
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Email o contraseña incorrectos"
@@ -0,0 +1,118 @@
+"""BrevoTransport contra el sustituto local de la API de Brevo."""
+
+import asyncio
+
+import httpx
+import pytest
+
+from app.core.email.brevo import BrevoTransport
+from app.core.email.transport import CircuitOpenError, EmailDeliveryError, EmailMessage
+from app.core.utils.resilience import CircuitBreaker, CircuitState
+from tests import brevo_standin
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture(autouse=True)
+def clear_standin():
+    brevo_standin.sent_messages.clear()
+    yield
+    brevo_standin.sent_messages.clear()
+
+
+def _transport(api_key: str = "test-key", **kwargs) -> BrevoTransport:
+    return BrevoTransport(
+        api_key=api_key,
+        sender_email="noreply@example.com",
+        sender_name="Zentora",
+        base_url="http://brevo-standin/v3",
+        rate_per_second=1000,
+        burst=1000,
+        http_transport=httpx.ASGITransport(app=brevo_standin.app),
+        **kwargs,
+    )
+
+
+def _message(i: int = 0) -> EmailMessage:
+    return EmailMessage(email_to=f"user{i}@example.com", subject=f"Hola {i}", html_content=f"<p>{i}</p>")
+
+
+async def test_send_returns_message_id():
+    transport = _transport()
+
+    message_id = await transport.send(_message())
+
+    assert message_id.endswith("@standin.brevo>")
+    (sent,) = brevo_standin.sent_messages
+    assert sent["to"] == [{"email": "user0@example.com"}]
+    assert sent["sender"] == {"name": "Zentora", "email": "noreply@example.com"}
+    await transport.aclose()
+
+
+async def test_send_batch_uses_message_versions():
+    transport = _transport(batch_size=2)
+    requests = []
+    original_post = transport._client.post
+
+    async def counting_post(*args, **kwargs):
+        requests.append(kwargs["json"])
+        return await original_post(*args, **kwargs)
+
+    transport._client.post = counting_post
+
+    message_ids = await transport.send_batch([_message(i) for i in range(5)])
+
+    # 5 correos en lotes de 2: dos llamadas con messageVersions y una simple
+    assert len(message_ids) == 5
+    assert [len(r.get("messageVersions", [r])) for r in requests] == [2, 2, 1]
+    assert [m["to"][0]["email"] for m in brevo_standin.sent_messages] == [f"user{i}@example.com" for i in range(5)]
+    await transport.aclose()
+
+
+async def test_client_error_is_not_retryable_and_does_not_open_circuit():
+    transport = _transport(api_key="", breaker=CircuitBreaker(failure_threshold=1))
+
+    with pytest.raises(EmailDeliveryError) as exc_info:
+        await transport.send(_message())
+
+    assert exc_info.value.status_code == 401
+    assert not exc_info.value.retryable
+    assert transport.breaker.state == CircuitState.CLOSED
+    await transport.aclose()
+
+
+async def test_outage_opens_circuit(monkeypatch):
+    monkeypatch.setattr(brevo_standin, "FAILURE_RATE", 1.0)
+    transport = _transport(max_retries=0, breaker=CircuitBreaker(failure_threshold=2, reset_timeout=60))
+
+    for _ in range(2):
+        with pytest.raises(EmailDeliveryError) as exc_info:
+            await transport.send(_message())
+        assert exc_info.value.status_code == 503
+
+    with pytest.raises(CircuitOpenError):
+        await transport.send(_message())
+    assert brevo_standin.sent_messages == []
+    await transport.aclose()
+
+
+async def test_cancelled_probe_does_not_leave_circuit_stuck(monkeypatch):
+    transport = _transport(max_retries=0, breaker=CircuitBreaker(failure_threshold=1, reset_timeout=0))
+    monkeypatch.setattr(brevo_standin, "FAILURE_RATE", 1.0)
+    with pytest.raises(EmailDeliveryError):
+        await transport.send(_message())
+    assert transport.breaker.state == CircuitState.HALF_OPEN
+
+    # La prueba se cancela mientras Brevo tarda en responder
+    monkeypatch.setattr(brevo_standin, "FAILURE_RATE", 0.0)
+    monkeypatch.setattr(brevo_standin, "LATENCY_MS", 60_000.0)
+    probe = asyncio.create_task(transport.send(_message(1)))
+    await asyncio.sleep(0.05)
+    probe.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await probe
+
+    monkeypatch.setattr(brevo_standin, "LATENCY_MS", 0.0)
+    assert await transport.send(_message(2))
+    assert transport.breaker.state == CircuitState.CLOSED
+    await transport.aclose()
@@ -0,0 +1,84 @@
+"""Importación masiva: cuentas cuyo provider_id ya está vinculado a otra cuenta."""
+
+import json
+
+import pytest
+from sqlalchemy import text
+
+from app.db.bulk_users import import_users
+
+pytestmark = pytest.mark.anyio
+
+
+def _write_ndjson(path, rows: list[dict]) -> None:
+    path.write_text("".join(json.dumps(row) + "\n" for row in rows))
+
+
+def _users(sync_engine) -> dict[str, tuple]:
+    with sync_engine.connect() as connection:
+        rows = connection.execute(text("SELECT email, provider::text, provider_id FROM users")).all()
+    return {email: (provider, provider_id) for email, provider, provider_id in rows}
+
+
+@pytest.fixture
+def existing_github_user(clean_db):
+    with clean_db.begin() as connection:
+        connection.execute(
+            text(
+                "INSERT INTO users (id, email, role, is_verified, status, provider, provider_id) VALUES "
+                "(gen_random_uuid(), 'gh@example.com', 'USER', true, 'active', 'github', '42'), "
+                "(gen_random_uuid(), 'local@example.com', 'USER', true, 'active', 'local', NULL)"
+            )
+        )
+    return clean_db
+
+
+@pytest.mark.parametrize("on_conflict", ["skip", "update"])
+async def test_import_rejects_provider_id_conflicts_instead_of_aborting(existing_github_user, tmp_path, on_conflict):
+    source = tmp_path / "partner.ndjson"
+    _write_ndjson(
+        source,
+        [
+            {"email": "nueva@example.com", "provider": "github", "provider_id": "42"},
+            {"email": "a@example.com", "provider": "github", "provider_id": "77"},
+            {"email": "b@example.com", "provider": "github", "provider_id": "77"},
+            {"email": "ok@example.com", "provider": "google", "provider_id": "42"},
+            # La cuenta existente no cambia de proveedor: con update quedaría como ('local', '99')
+            {"email": "local@example.com", "provider": "github", "provider_id": "99"},
+        ],
+    )
+
+    result = await import_users(source, "ndjson", on_conflict=on_conflict, workers=1)
+
+    users = _users(existing_github_user)
+    assert users["gh@example.com"] == ("github", "42")
+    assert users["a@example.com"] == ("github", "77")
+    assert users["ok@example.com"] == ("google", "42")
+    assert "nueva@example.com" not in users and "b@example.com" not in users
+    assert result.completed
+    assert (result.inserted, result.rejected) == (2, 2)
+
+    rejects = [json.loads(line) for line in (tmp_path / "partner.ndjson.rejects.ndjson").read_text().splitlines()]
+    assert sorted(reject["email"] for reject in rejects) == ["b@example.com", "nueva@example.com"]
+    assert all(reject["reason"].startswith("provider_id ya vinculado") for reject in rejects)
+
+    if on_conflict == "update":
+        assert users["local@example.com"] == ("local", "99")
+        assert result.updated == 1
+    else:
+        assert users["local@example.com"] == ("local", None)
+        assert result.skipped == 1
+
+
+async def test_import_update_rejects_provider_id_taken_by_other_account(existing_github_user, tmp_path):
+    with existing_github_user.begin() as connection:
+        connection.execute(
+            text("UPDATE users SET provider = 'github', provider_id = NULL WHERE email = 'local@example.com'")
+        )
+    source = tmp_path / "partner.ndjson"
+    _write_ndjson(source, [{"email": "local@example.com", "provider_id": "42"}])
+
+    result = await import_users(source, "ndjson", on_conflict="update", workers=1)
+
+    assert (result.updated, result.rejected) == (0, 1)
+    assert _users(existing_github_user)["local@example.com"] == ("github", None)
@@ -0,0 +1,249 @@
+"""Pool del transporte SMTP contra un sumidero aiosmtpd y failover por EWMA del router de correo."""
+
+import socket
+
+import aiosmtplib
+import httpx
+import pytest
+from aiosmtpd.controller import Controller
+
+from app.core.email.brevo import BrevoTransport
+from app.core.email.router import EmailRouter
+from app.core.email.smtp import SMTPTransport
+from app.core.email.transport import EmailDeliveryError, EmailMessage
+from app.core.utils.resilience import CircuitBreaker, CircuitState
+from tests import brevo_standin
+
+pytestmark = pytest.mark.anyio
+
+
+class SinkHandler:
+    """Guarda cada mensaje recibido junto con la dirección del cliente (una por conexión)."""
+
+    def __init__(self):
+        self.messages: list[tuple[tuple, list[str]]] = []
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address.startswith("rechazado"):
+            return "550 Buzón inexistente"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append((session.peer, list(envelope.rcpt_tos)))
+        return "250 Message accepted for delivery"
+
+    @property
+    def connections(self) -> int:
+        return len({peer for peer, _ in self.messages})
+
+    @property
+    def recipients(self) -> list[str]:
+        return [rcpt for _, rcpts in self.messages for rcpt in rcpts]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def smtp_sink():
+    handler = SinkHandler()
+    controller = Controller(handler, hostname="127.0.0.1", port=_free_port())
+    controller.start()
+    handler.port = controller.port
+    yield handler
+    controller.stop()
+
+
+def _smtp(port: int, **kwargs) -> SMTPTransport:
+    return SMTPTransport(
+        hostname="127.0.0.1",
+        port=port,
+        sender_email="noreply@example.com",
+        sender_name="Zentora",
+        start_tls=False,
+        timeout=5,
+        **kwargs,
+    )
+
+
+def _message(i: int = 0, prefix: str = "user") -> EmailMessage:
+    return EmailMessage(email_to=f"{prefix}{i}@example.com", subject=f"Hola {i}", html_content=f"<p>{i}</p>")
+
+
+async def test_smtp_reuses_one_session_for_consecutive_sends(smtp_sink):
+    transport = _smtp(smtp_sink.port)
+
+    for i in range(5):
+        assert await transport.send(_message(i)) == f"user{i}@example.com"
+
+    assert smtp_sink.recipients == [f"user{i}@example.com" for i in range(5)]
+    assert smtp_sink.connections == 1
+    await transport.aclose()
+
+
+async def test_smtp_rotates_session_after_max_messages(smtp_sink):
+    transport = _smtp(smtp_sink.port, max_messages_per_connection=2)
+
+    for i in range(5):
+        await transport.send(_message(i))
+
+    assert len(smtp_sink.recipients) == 5
+    assert smtp_sink.connections == 3
+    await transport.aclose()
+
+
+async def test_smtp_batch_is_spread_over_the_pool(smtp_sink):
+    transport = _smtp(smtp_sink.port, pool_size=2)
+
+    sent = await transport.send_batch([_message(i) for i in range(8)])
+
+    assert sorted(sent) == sorted(f"user{i}@example.com" for i in range(8))
+    assert smtp_sink.connections == 2
+    await transport.aclose()
+
+
+async def test_smtp_permanent_rejection_does_not_open_circuit(smtp_sink):
+    transport = _smtp(smtp_sink.port, breaker=CircuitBreaker(failure_threshold=1))
+
+    with pytest.raises(EmailDeliveryError) as exc_info:
+        await transport.send(_message(prefix="rechazado"))
+
+    assert exc_info.value.status_code == 550
+    assert not exc_info.value.retryable
+    assert transport.breaker.state == CircuitState.CLOSED
+    # La sesión sigue siendo válida para el siguiente correo
+    await transport.send(_message())
+    assert smtp_sink.connections == 1
+    await transport.aclose()
+
+
+async def test_smtp_unreachable_server_is_retryable_and_opens_circuit():
+    transport = _smtp(_free_port(), breaker=CircuitBreaker(failure_threshold=1, reset_timeout=60))
+
+    with pytest.raises(EmailDeliveryError) as exc_info:
+        await transport.send(_message())
+
+    assert exc_info.value.retryable
+    assert transport.breaker.state == CircuitState.OPEN
+
+
+async def test_smtp_failed_connects_do_not_grow_the_pool():
+    transport = _smtp(_free_port(), pool_size=2, breaker=CircuitBreaker(failure_threshold=100))
+
+    for _ in range(5):
+        with pytest.raises(EmailDeliveryError):
+            await transport.send(_message())
+
+    assert transport._slots._value == 2
+
+
+async def test_smtp_disconnect_resends_only_undelivered_messages(smtp_sink, monkeypatch):
+    transport = _smtp(smtp_sink.port, pool_size=1)
+    original_send_message = aiosmtplib.SMTP.send_message
+    calls = 0
+
+    async def drop_on_third_message(client, message, *args, **kwargs):
+        nonlocal calls
+        calls += 1
+        if calls == 3:
+            client.close()
+            raise aiosmtplib.SMTPServerDisconnected("Conexión cerrada por el servidor")
+        return await original_send_message(client, message, *args, **kwargs)
+
+    monkeypatch.setattr(aiosmtplib.SMTP, "send_message", drop_on_third_message)
+
+    sent = await transport.send_batch([_message(i) for i in range(5)])
+
+    assert sent == [f"user{i}@example.com" for i in range(5)]
+    assert smtp_sink.recipients == sent
+    assert smtp_sink.connections == 2
+    await transport.aclose()
+
+
+class FakeTransport:
+    def __init__(self, name: str, error: EmailDeliveryError | None = None):
+        self.name = name
+        self.breaker = CircuitBreaker()
+        self.error = error
+        self.sent: list[str] = []
+
+    async def send(self, message: EmailMessage) -> str | None:
+        if self.error:
+            raise self.error
+        self.sent.append(message.email_to)
+        return f"{self.name}:{message.email_to}"
+
+    async def send_batch(self, messages):
+        return [await self.send(message) for message in messages]
+
+    async def aclose(self) -> None:
+        pass
+
+
+async def test_router_fails_over_and_demotes_unhealthy_transport():
+    primary = FakeTransport("primary", EmailDeliveryError("503", retryable=True))
+    secondary = FakeTransport("secondary")
+    router = EmailRouter([primary, secondary], max_error_rate=0.5)
+
+    assert await router.send(_message()) == "secondary:user0@example.com"
+    assert router.stats["primary"].error_rate == pytest.approx(0.2)
+    assert router.candidates()[0] is primary
+
+    # Con alpha=0.2 la EWMA supera 0.5 al cuarto fallo consecutivo: el primario pasa al final
+    for i in range(1, 4):
+        await router.send(_message(i))
+    assert router.stats["primary"].error_rate > 0.5
+    assert [t.name for t in router.candidates()] == ["secondary", "primary"]
+
+    # Las estadísticas caducan sin tráfico y el primario vuelve a probarse
+    router.stats_ttl = 0
+    router.stats["primary"].updated_at -= 1
+    assert router.candidates()[0] is primary
+
+
+async def test_router_demotes_slow_transport():
+    primary = FakeTransport("primary")
+    secondary = FakeTransport("secondary")
+    router = EmailRouter([primary, secondary], max_latency=1.0)
+
+    router.stats["primary"].record(elapsed=2.0, failed=False)
+
+    assert [t.name for t in router.candidates()] == ["secondary", "primary"]
+
+
+async def test_router_does_not_fail_over_on_permanent_error():
+    primary = FakeTransport("primary", EmailDeliveryError("400", retryable=False))
+    secondary = FakeTransport("secondary")
+    router = EmailRouter([primary, secondary])
+
+    with pytest.raises(EmailDeliveryError):
+        await router.send(_message())
+
+    assert secondary.sent == []
+
+
+async def test_router_fails_over_from_brevo_outage_to_smtp_sink(smtp_sink, monkeypatch):
+    monkeypatch.setattr(brevo_standin, "FAILURE_RATE", 1.0)
+    brevo = BrevoTransport(
+        api_key="test-key",
+        sender_email="noreply@example.com",
+        sender_name="Zentora",
+        base_url="http://brevo-standin/v3",
+        rate_per_second=1000,
+        burst=1000,
+        max_retries=0,
+        http_transport=httpx.ASGITransport(app=brevo_standin.app),
+    )
+    smtp = _smtp(smtp_sink.port)
+    router = EmailRouter([brevo, smtp])
+
+    sent = await router.send_batch([_message(i) for i in range(3)])
+
+    assert sorted(sent) == [f"user{i}@example.com" for i in range(3)]
+    assert sorted(smtp_sink.recipients) == sent
+    assert router.stats["brevo"].error_rate > 0
+    await router.aclose()
@@ -0,0 +1,44 @@
+"""UUIDv7: formato, orden y reparto en shards."""
+
+from collections import Counter
+from datetime import datetime, timedelta, UTC
+from uuid import uuid4
+
+from sqlalchemy import column, select, values
+from sqlalchemy.dialects.postgresql import UUID as PGUUID
+
+from app.core.utils.ids import uuid7, uuid7_datetime
+from app.core.utils.scheduler import JobShard
+
+
+def test_uuid7_version_variant_and_timestamp():
+    before = datetime.now(UTC)
+    value = uuid7()
+
+    assert value.version == 7
+    assert value.variant == "specified in RFC 4122"
+    assert before - timedelta(milliseconds=1) <= uuid7_datetime(value) <= datetime.now(UTC)
+    assert uuid7_datetime(uuid4()) is None
+
+
+def test_uuid7_is_strictly_increasing():
+    ids = [uuid7() for _ in range(20_000)]
+
+    assert ids == sorted(ids)
+    assert len(set(ids)) == len(ids)
+
+
+def test_uuid7_ids_spread_over_every_shard(sync_engine):
+    """Los shards por hash reparten ids que comparten los bits altos (lo que rompía los rangos)."""
+    shards = 8
+    ids = values(column("id", PGUUID(as_uuid=True)), name="ids").data([(uuid7(),) for _ in range(4000)])
+    bucket = select(*(JobShard(index, shards).condition(ids.c.id) for index in range(shards)))
+
+    with sync_engine.connect() as connection:
+        rows = connection.execute(bucket.select_from(ids)).all()
+
+    # Cada id pertenece a un único shard
+    assert all(sum(row) == 1 for row in rows)
+    counts = Counter(row.index(True) for row in rows)
+    assert sorted(counts) == list(range(shards))
+    assert max(counts.values()) < 4000 / shards * 1.5
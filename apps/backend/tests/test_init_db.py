@@ -0,0 +1,34 @@
+"""init_db crea las tablas desde cero, incluidos los índices trigram."""
+
+import pytest
+from sqlalchemy import text
+
+from app.db.base import engine
+from app.db.init_db import init_db
+from tests.conftest import _create_schema
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_init_db_creates_trigram_indexes_on_empty_schema(sync_engine):
+    with sync_engine.connect() as connection:
+        available = connection.execute(
+            text("SELECT count(*) FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        ).scalar_one()
+    if not available:
+        pytest.skip("pg_trgm no está disponible en el servidor de pruebas")
+
+    with sync_engine.begin() as connection:
+        connection.execute(text("DROP SCHEMA public CASCADE"))
+        connection.execute(text("CREATE SCHEMA public"))
+    try:
+        await init_db()
+        with sync_engine.connect() as connection:
+            indexes = connection.execute(
+                text("SELECT indexname FROM pg_indexes WHERE tablename = 'users' AND indexname LIKE '%trgm'")
+            ).scalars()
+            assert sorted(indexes) == ["ix_users_email_trgm", "ix_users_full_name_trgm"]
+    finally:
+        await engine.dispose()
+        with sync_engine.begin() as connection:
+            _create_schema(connection)
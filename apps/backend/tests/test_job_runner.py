@@ -0,0 +1,43 @@
+"""Runner de tareas programadas: un disparo tardío cuenta como la misma ejecución."""
+
+from datetime import datetime, UTC
+
+import pytest
+from apscheduler.triggers.cron import CronTrigger
+
+from app.core.utils.scheduler import JobRunner, ScheduledJob, scheduled_fire_time
+
+pytestmark = pytest.mark.anyio
+
+TRIGGER = CronTrigger(minute=9, second=59, timezone=UTC)
+
+
+def test_late_fire_across_a_window_boundary_keeps_the_scheduled_time():
+    on_time = datetime(2026, 1, 1, 0, 9, 59, 200000, tzinfo=UTC)
+    late = datetime(2026, 1, 1, 0, 10, 0, 300000, tzinfo=UTC)
+
+    # time.time() // 600 daría dos ventanas distintas a estos dos disparos
+    assert scheduled_fire_time(TRIGGER, on_time, 600) == datetime(2026, 1, 1, 0, 9, 59, tzinfo=UTC)
+    assert scheduled_fire_time(TRIGGER, late, 600) == datetime(2026, 1, 1, 0, 9, 59, tzinfo=UTC)
+
+
+def test_without_a_fire_in_the_window_returns_now():
+    now = datetime(2026, 1, 1, 0, 30, tzinfo=UTC)
+
+    assert scheduled_fire_time(TRIGGER, now, 600) == now
+
+
+async def test_same_scheduled_time_runs_once(fake_redis):
+    runs = []
+
+    async def job(shard):
+        runs.append(shard.index)
+
+    runner = JobRunner()
+    runner.jobs["prueba"] = ScheduledJob("prueba", job, TRIGGER, shards=2)
+    scheduled_at = datetime(2026, 1, 1, 0, 9, 59, tzinfo=UTC)
+
+    await runner.run("prueba", scheduled_at)
+    await runner.run("prueba", scheduled_at)
+
+    assert sorted(runs) == [0, 1]
@@ -0,0 +1,60 @@
+"""Auditoría del keyspace de Redis: ritmo de SCAN, agregados por prefijo y límite de claves."""
+
+import fakeredis
+import pytest
+
+from app.core import keyspace_audit
+from app.core.keyspace_audit import NO_TTL, audit_keyspace
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def redis():
+    redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+    async with redis.pipeline(transaction=False) as pipe:
+        for i in range(1000):
+            pipe.set(f"session:{i}", "x" * 10, ex=3600)
+        for i in range(200):
+            pipe.set(f"cache:{i}", "y")
+        await pipe.execute()
+    yield redis
+    await redis.aclose()
+
+
+@pytest.fixture
+def pauses(monkeypatch):
+    pauses = []
+
+    async def sleep(seconds):
+        pauses.append(seconds)
+
+    monkeypatch.setattr(keyspace_audit.asyncio, "sleep", sleep)
+    return pauses
+
+
+async def test_pauses_per_scan_page_even_with_low_sample_rate(redis, pauses):
+    report = await audit_keyspace(redis, sample_rate=0.001, batch_size=100, pause_seconds=0.5)
+
+    assert report.scanned_keys == 1200
+    assert report.complete
+    # Una pausa entre cada par de páginas de SCAN, aunque casi ninguna clave se muestree
+    assert len(pauses) >= 1200 // 100 - 1
+    assert set(pauses) == {0.5}
+
+
+async def test_full_sample_aggregates_by_prefix(redis, pauses):
+    report = await audit_keyspace(redis, batch_size=100)
+
+    assert report.sampled_keys == 1200
+    sessions, cache = report.prefixes["session"], report.prefixes["cache"]
+    assert (sessions.keys, sessions.without_ttl, sessions.ttl_histogram) == (1000, 0, {"1h": 1000})
+    assert (cache.keys, cache.without_ttl, cache.ttl_histogram) == (200, 200, {NO_TTL: 200})
+
+
+async def test_max_keys_stops_scan_and_marks_report_incomplete(redis, pauses):
+    report = await audit_keyspace(redis, batch_size=100, max_keys=250)
+
+    assert report.scanned_keys == 250
+    assert report.sampled_keys == 250
+    assert not report.complete
@@ -0,0 +1,122 @@
+"""Relay del outbox: ninguna conexión abierta durante la entrega, éxito, reintento con backoff y fin del lease."""
+
+import asyncio
+from datetime import datetime, UTC
+
+import pytest
+from sqlalchemy import insert, select
+
+from app.core.config import settings
+from app.core.events import outbox
+from app.core.events.outbox import claim_outbox_batch, relay_outbox_batch
+from app.core.utils.enums import OutboxEventType
+from app.db.base import AsyncSessionLocal, engine
+from app.db.models.outbox import OutboxEvent
+
+pytestmark = pytest.mark.anyio
+
+
+def _insert_events(sync_engine, count: int) -> None:
+    with sync_engine.begin() as connection:
+        connection.execute(
+            insert(OutboxEvent),
+            [{"event_type": OutboxEventType.USER_REGISTERED.value, "payload": {"n": i}} for i in range(count)],
+        )
+
+
+def _events(sync_engine) -> list:
+    with sync_engine.connect() as connection:
+        return connection.execute(select(OutboxEvent.__table__).order_by(OutboxEvent.id)).all()
+
+
+async def test_relay_delivers_without_holding_a_connection(clean_db, fake_redis, monkeypatch):
+    _insert_events(clean_db, 3)
+    checked_out = []
+
+    async def consumer(event, redis):
+        checked_out.append(engine.sync_engine.pool.checkedout())
+
+    monkeypatch.setitem(outbox._consumers, OutboxEventType.USER_REGISTERED.value, [consumer])
+
+    assert await relay_outbox_batch(fake_redis, batch_size=10) == 3
+
+    assert checked_out == [0, 0, 0]
+    rows = _events(clean_db)
+    assert all(row.processed_at is not None and row.attempts == 0 for row in rows)
+    assert await relay_outbox_batch(fake_redis, batch_size=10) == 0
+
+
+async def test_relay_failure_sets_backoff_and_keeps_event_pending(clean_db, fake_redis, monkeypatch):
+    _insert_events(clean_db, 2)
+
+    async def consumer(event, redis):
+        if event.payload["n"] == 1:
+            raise RuntimeError("smtp caído")
+
+    monkeypatch.setitem(outbox._consumers, OutboxEventType.USER_REGISTERED.value, [consumer])
+    started = datetime.now(UTC)
+
+    assert await relay_outbox_batch(fake_redis, batch_size=10) == 2
+
+    delivered, failed = _events(clean_db)
+    assert delivered.processed_at is not None
+    assert failed.processed_at is None and failed.failed_at is None
+    assert failed.attempts == 1
+    assert failed.last_error == "smtp caído"
+    assert failed.available_at > started
+
+
+async def test_relay_discards_event_after_max_attempts(clean_db, fake_redis, monkeypatch):
+    with clean_db.begin() as connection:
+        connection.execute(
+            insert(OutboxEvent),
+            [{"event_type": OutboxEventType.USER_REGISTERED.value, "attempts": settings.OUTBOX_MAX_ATTEMPTS - 1}],
+        )
+
+    async def consumer(event, redis):
+        raise RuntimeError("sin destinatario")
+
+    monkeypatch.setitem(outbox._consumers, OutboxEventType.USER_REGISTERED.value, [consumer])
+
+    await relay_outbox_batch(fake_redis, batch_size=10)
+
+    (event,) = _events(clean_db)
+    assert event.failed_at is not None
+    assert event.attempts == settings.OUTBOX_MAX_ATTEMPTS
+
+
+async def test_claimed_events_are_leased_to_one_relay(clean_db):
+    _insert_events(clean_db, 5)
+
+    async with AsyncSessionLocal() as db:
+        first = await claim_outbox_batch(db, batch_size=3)
+    async with AsyncSessionLocal() as db:
+        second = await claim_outbox_batch(db, batch_size=10)
+
+    # Mientras dura el lease, otro relay solo ve los eventos que nadie ha reclamado
+    assert len(first) == 3
+    assert len(second) == 2
+    assert not {event.id for event in first} & {event.id for event in second}
+    assert all(event.available_at > datetime.now(UTC) for event in first + second)
+
+
+async def test_relay_releases_remaining_events_near_lease_end(clean_db, fake_redis, monkeypatch):
+    _insert_events(clean_db, 3)
+    delivered = []
+
+    async def consumer(event, redis):
+        delivered.append(event.payload["n"])
+        await asyncio.sleep(0.2)
+
+    monkeypatch.setitem(outbox._consumers, OutboxEventType.USER_REGISTERED.value, [consumer])
+    # Al relay le quedan 0,1 s antes del margen final del lease: la primera entrega ya lo agota
+    monkeypatch.setattr(settings, "OUTBOX_LEASE_MARGIN_SECONDS", settings.OUTBOX_CLAIM_LEASE_SECONDS - 0.1)
+
+    assert await relay_outbox_batch(fake_redis, batch_size=10) == 1
+
+    assert delivered == [0]
+    rows = _events(clean_db)
+    assert rows[0].processed_at is not None
+    # Los eventos liberados vuelven a estar disponibles ya y sin intento contado
+    assert all(row.processed_at is None and row.attempts == 0 for row in rows[1:])
+    assert all(row.available_at <= datetime.now(UTC) for row in rows[1:])
@@ -0,0 +1,35 @@
+"""Perfil: la actualización devuelve la fila escrita sin volver a leerla."""
+
+import pytest
+
+from tests.test_auth_register_login import PASSWORD, StatementCounter, _insert_user, _query
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_update_profile_runs_one_statement(client, clean_db, fake_redis):
+    _insert_user(clean_db, "ana@example.com")
+    response = await client.post("/api/v1/auth/login", json={"email": "ana@example.com", "password": PASSWORD})
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    with StatementCounter() as counter:
+        response = await client.patch("/api/v1/auth/me/update", json={"bio": "Hola"}, headers=headers)
+
+    assert response.status_code == 200, response.text
+    user = response.json()["user"]
+    assert (user["email"], user["full_name"], user["bio"]) == ("ana@example.com", "Usuario de Prueba", "Hola")
+    assert user["updated_at"]
+    assert len(counter.statements) == 1
+    assert counter.statements[0].lstrip().upper().startswith("UPDATE")
+    assert _query(clean_db, "SELECT bio FROM users")[0][0] == "Hola"
+
+
+async def test_update_profile_without_changes_is_rejected(client, clean_db, fake_redis):
+    _insert_user(clean_db, "ana@example.com")
+    response = await client.post("/api/v1/auth/login", json={"email": "ana@example.com", "password": PASSWORD})
+
+    response = await client.patch(
+        "/api/v1/auth/me/update", json={}, headers={"Authorization": f"Bearer {response.json()['access_token']}"}
+    )
+
+    assert response.status_code == 400
@@ -0,0 +1,147 @@
+"""Circuit breaker y token bucket del cliente."""
+
+import asyncio
+import time
+
+import pytest
+
+from app.core.utils import resilience
+from app.core.utils.resilience import CircuitBreaker, CircuitState, TokenBucket
+
+pytestmark = pytest.mark.anyio
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(resilience.time, "monotonic", clock)
+    return clock
+
+
+def _open(breaker: CircuitBreaker) -> None:
+    for _ in range(breaker.failure_threshold):
+        with breaker.guard() as allowed:
+            assert allowed
+            breaker.record_failure()
+
+
+def test_opens_after_threshold_and_rejects_until_reset(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30)
+    _open(breaker)
+
+    assert breaker.state == CircuitState.OPEN
+    assert not breaker.allow_request()
+
+    clock.now += 30
+    assert breaker.state == CircuitState.HALF_OPEN
+
+
+def test_success_resets_consecutive_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=2)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+
+    assert breaker.state == CircuitState.CLOSED
+
+
+def test_half_open_allows_a_single_probe(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    _open(breaker)
+    clock.now += 30
+
+    with breaker.guard() as probe:
+        with breaker.guard() as concurrent:
+            assert probe
+            assert not concurrent
+        breaker.record_success()
+
+    assert breaker.state == CircuitState.CLOSED
+    assert breaker.allow_request()
+
+
+def test_failed_probe_reopens(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    _open(breaker)
+    clock.now += 30
+
+    with breaker.guard() as probe:
+        assert probe
+        breaker.record_failure()
+
+    assert breaker.state == CircuitState.OPEN
+
+
+async def test_cancelled_probe_releases_the_slot(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    _open(breaker)
+    clock.now += 30
+    started = asyncio.Event()
+
+    async def probe():
+        with breaker.guard() as allowed:
+            assert allowed
+            started.set()
+            await asyncio.sleep(3600)
+
+    task = asyncio.create_task(probe())
+    await started.wait()
+    assert not breaker.allow_request()
+
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    # Sigue half-open, pero la siguiente llamada puede volver a probar
+    assert breaker.state == CircuitState.HALF_OPEN
+    with breaker.guard() as allowed:
+        assert allowed
+
+
+def test_unreported_probe_expires_after_probe_timeout(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30, probe_timeout=10)
+    _open(breaker)
+    clock.now += 30
+
+    assert breaker.allow_request()
+    assert not breaker.allow_request()
+
+    clock.now += 10
+    assert breaker.allow_request()
+
+
+def test_stale_guard_does_not_release_a_newer_probe(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30, probe_timeout=10)
+    _open(breaker)
+    clock.now += 30
+
+    with breaker.guard() as first:
+        assert first
+        clock.now += 10
+        assert breaker.allow_request()
+    # Al salir, la prueba caducada no libera la que la sustituyó
+    assert not breaker.allow_request()
+
+
+async def test_token_bucket_waits_for_refill():
+    bucket = TokenBucket(rate=100, capacity=2)
+    started = time.monotonic()
+
+    for _ in range(4):
+        await bucket.acquire()
+
+    # Dos tokens del burst y dos recargados a 100/s
+    assert time.monotonic() - started >= 0.015
+
+
+def test_token_bucket_rejects_invalid_arguments():
+    with pytest.raises(ValueError):
+        TokenBucket(rate=0, capacity=1)
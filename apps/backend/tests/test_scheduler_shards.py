@@ -0,0 +1,54 @@
+"""Reparto en shards del barrido de usuarios no verificados."""
+
+from datetime import datetime, timedelta, UTC
+
+import pytest
+from sqlalchemy import insert, select
+
+from app.core.email.email_verification import VERIFICATION_WINDOW, cleanup_expired_unverified_users
+from app.core.utils.ids import uuid7
+from app.core.utils.scheduler import JobShard
+from app.db.base import AsyncSessionLocal
+from app.db.models.user import User as UserModel
+
+pytestmark = pytest.mark.anyio
+
+SHARDS = 8
+
+
+def _users(count: int, is_verified: bool) -> list[dict]:
+    created_at = datetime.now(UTC) - VERIFICATION_WINDOW - timedelta(hours=1)
+    return [
+        {
+            "id": uuid7(),
+            "email": f"{'v' if is_verified else 'u'}{i}@shards.example",
+            "is_verified": is_verified,
+            "created_at": created_at,
+        }
+        for i in range(count)
+    ]
+
+
+def test_single_shard_selects_everything():
+    assert str(JobShard(0, 1).condition(UserModel.id)) == "true"
+
+
+async def test_cleanup_shards_partition_uuid7_users(clean_db, fake_redis):
+    expired = _users(400, is_verified=False)
+    with clean_db.begin() as connection:
+        connection.execute(insert(UserModel), expired + _users(20, is_verified=True))
+
+    deleted = []
+    for index in range(SHARDS):
+        async with AsyncSessionLocal() as db:
+            condition = JobShard(index, SHARDS).condition(UserModel.id)
+            deleted.append(await cleanup_expired_unverified_users(db, fake_redis, shard_condition=condition))
+
+    # Cada usuario cae en exactamente un shard y ningún shard se queda con casi todo
+    assert sum(deleted) == len(expired)
+    assert min(deleted) > 0
+    assert max(deleted) < len(expired) / SHARDS * 2
+
+    with clean_db.connect() as connection:
+        remaining = connection.execute(select(UserModel.is_verified)).scalars().all()
+    assert remaining == [True] * 20
@@ -0,0 +1,66 @@
+"""Sesiones por dispositivo: refresh tokens anteriores a ellas y cierre de sesión de otro usuario."""
+
+import pytest
+
+from app.core.auth.security import create_refresh_token, decode_token
+from app.core.redis_keys import legacy_refresh_key
+from tests.test_auth_register_login import PASSWORD, _insert_user, _query
+
+pytestmark = pytest.mark.anyio
+
+
+async def _legacy_refresh_token(redis, user_id: str) -> str:
+    token = create_refresh_token({"sub": user_id, "type": "refresh"})
+    await redis.hset(
+        legacy_refresh_key(user_id),
+        mapping={
+            "refresh_token": token,
+            "user_id": user_id,
+            "email": "ana@example.com",
+            "full_name": "Usuario de Prueba",
+            "role": "USER",
+            "status": "active",
+        },
+    )
+    return token
+
+
+async def test_legacy_refresh_token_becomes_a_session_once(client, clean_db, fake_redis):
+    _insert_user(clean_db, "ana@example.com")
+    user_id = str(_query(clean_db, "SELECT id FROM users")[0][0])
+    token = await _legacy_refresh_token(fake_redis, user_id)
+
+    response = await client.post("/api/v1/auth/refresh", params={"token": token})
+
+    assert response.status_code == 200, response.text
+    access = decode_token(response.json()["access_token"])
+    assert access["sub"] == user_id
+    assert access["sid"]
+    assert await fake_redis.exists(legacy_refresh_key(user_id)) == 0
+
+    # El token anterior solo sirve una vez
+    client.cookies.clear()
+    assert (await client.post("/api/v1/auth/refresh", params={"token": token})).status_code == 400
+
+
+async def test_legacy_refresh_token_without_stored_hash_is_rejected(client, clean_db, fake_redis):
+    token = create_refresh_token({"sub": "8b0c3a52-8c1d-4c7e-9a55-0d6f3e1b2a11", "type": "refresh"})
+
+    response = await client.post("/api/v1/auth/refresh", params={"token": token})
+
+    assert response.status_code == 400
+
+
+async def test_logout_of_another_user_is_forbidden(client, clean_db, fake_redis):
+    _insert_user(clean_db, "ana@example.com")
+    _insert_user(clean_db, "beto@example.com")
+    response = await client.post("/api/v1/auth/login", json={"email": "ana@example.com", "password": PASSWORD})
+    assert response.status_code == 200, response.text
+    other_id = _query(clean_db, "SELECT id FROM users WHERE email = 'beto@example.com'")[0][0]
+
+    response = await client.post(
+        f"/api/v1/auth/logout/{other_id}",
+        headers={"Authorization": f"Bearer {response.json()['access_token']}"},
+    )
+
+    assert response.status_code == 403
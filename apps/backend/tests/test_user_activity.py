@@ -0,0 +1,60 @@
+"""Actividad diferida: el volcado no sustituye un estado escrito directamente después."""
+
+import pytest
+from sqlalchemy import text
+
+from app.core.auth.activity import ACTIVITY_KEY, flush_user_activity
+from tests.test_auth_register_login import PASSWORD, _insert_user, _query
+
+pytestmark = pytest.mark.anyio
+
+
+async def _login(client) -> dict:
+    response = await client.post("/api/v1/auth/login", json={"email": "ana@example.com", "password": PASSWORD})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+async def test_flush_applies_buffered_login(client, clean_db, fake_redis):
+    _insert_user(clean_db, "ana@example.com")
+    await _login(client)
+
+    assert await flush_user_activity(fake_redis) == 1
+
+    status, last_login_at = _query(clean_db, "SELECT status::text, last_login_at FROM users")[0]
+    assert status == "active"
+    assert last_login_at is not None
+    assert await fake_redis.exists(ACTIVITY_KEY) == 0
+
+
+async def test_revoke_all_after_login_wins_over_buffered_status(client, clean_db, fake_redis):
+    _insert_user(clean_db, "ana@example.com")
+    data = await _login(client)
+
+    response = await client.request(
+        "DELETE",
+        "/api/v1/auth/revoke",
+        json={"current_password": PASSWORD},
+        headers={"Authorization": f"Bearer {data['access_token']}"},
+    )
+    assert response.status_code == 200, response.text
+    await flush_user_activity(fake_redis)
+
+    # El login sí queda registrado, pero el estado es el de la revocación, que fue posterior
+    status, last_login_at = _query(clean_db, "SELECT status::text, last_login_at FROM users")[0]
+    assert status == "inactive"
+    assert last_login_at is not None
+
+
+async def test_reactivate_discards_buffered_status(client, clean_db, fake_redis):
+    _insert_user(clean_db, "ana@example.com", status="deleted")
+    await fake_redis.hset(ACTIVITY_KEY, mapping={f"{_query(clean_db, 'SELECT id FROM users')[0][0]}:s": "inactive"})
+
+    response = await client.post("/api/v1/auth/reactivate", json={"email": "ana@example.com", "password": PASSWORD})
+    assert response.status_code == 200, response.text
+    user = response.json()["user"]
+    assert user["status"] == "active"
+    assert user["last_login_at"] is not None
+    await flush_user_activity(fake_redis)
+
+    assert _query(clean_db, "SELECT status::text FROM users")[0][0] == "active"